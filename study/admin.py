@@ -1,9 +1,11 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import (
     Course, Topic, Flashcard, StudySession, FlashcardProgress,
     Skill, MultipleChoiceOption, CardTemplate, CourseEnrollment,
-    StudyPreference, TopicScore, CardSuggestion, SpacedRepetitionSettings
+    StudyPreference, TopicScore, CardSuggestion, SpacedRepetitionSettings,
+    TopicReviewCounter, ReviewEvent, ReviewDailyAggregate, ParameterizedVariant,
 )
+from .utils import generate_graph
 
 # Register your models here.
 
@@ -29,6 +31,8 @@ class FlashcardAdmin(admin.ModelAdmin):
     list_filter = ['difficulty', 'star_difficulty', 'question_type', 'uses_latex', 'graph_type', 'diagram_type', 'topic__course', 'created_at']
     search_fields = ['question', 'answer', 'question_template', 'answer_template']
     filter_horizontal = ['skills']
+    readonly_fields = ['parameter_profile']
+    actions = ['render_graphs']
     fieldsets = (
         ('Basic Information', {
             'fields': ('topic', 'difficulty', 'star_difficulty', 'question_type', 'skills', 'template')
@@ -38,7 +42,7 @@ class FlashcardAdmin(admin.ModelAdmin):
             'description': 'Use for standard, multiple choice, and step-by-step cards'
         }),
         ('Parameterized Card', {
-            'fields': ('question_template', 'answer_template', 'parameter_spec'),
+            'fields': ('question_template', 'answer_template', 'parameter_spec', 'parameter_profile'),
             'description': 'Use for parameterized/randomized cards. Templates use {variable} placeholders.',
             'classes': ('collapse',)
         }),
@@ -74,10 +78,23 @@ class FlashcardAdmin(admin.ModelAdmin):
         return question_text[:50] + '...' if len(question_text) > 50 else question_text
     question_preview.short_description = 'Question'
 
+    @admin.action(description='Render graphs of selected flashcards')
+    def render_graphs(self, request, queryset):
+        # generate_graph runs the code in a graph worker process (study/utils/graph_pool.py)
+        rendered = failed = 0
+        for card in queryset.exclude(graph_code=''):
+            if generate_graph(card):
+                rendered += 1
+            else:
+                failed += 1
+        self.message_user(request, f'Rendered {rendered} graph(s).')
+        if failed:
+            self.message_user(request, f'{failed} graph(s) failed; see the server log.', messages.WARNING)
+
 
 @admin.register(StudySession)
 class StudySessionAdmin(admin.ModelAdmin):
-    list_display = ['user', 'topic', 'started_at', 'ended_at', 'cards_studied']
+    list_display = ['user', 'topic', 'started_at', 'ended_at', 'cards_studied', 'review_count']
     list_filter = ['user', 'topic__course', 'started_at']
     readonly_fields = ['started_at']
 
@@ -168,3 +185,32 @@ class SpacedRepetitionSettingsAdmin(admin.ModelAdmin):
     list_filter = ['ease_modifier']
     search_fields = ['user__username']
     ordering = ['-updated_at']
+
+
+@admin.register(TopicReviewCounter)
+class TopicReviewCounterAdmin(admin.ModelAdmin):
+    list_display = ['user', 'topic', 'new_count', 'learning_count', 'learned_count']
+    list_filter = ['topic__course']
+    search_fields = ['user__username', 'topic__name']
+
+
+@admin.register(ReviewEvent)
+class ReviewEventAdmin(admin.ModelAdmin):
+    list_display = ['user', 'flashcard', 'step_index', 'quality', 'previous_interval', 'new_interval', 'reviewed_at']
+    list_filter = ['quality', 'reviewed_at']
+    search_fields = ['user__username']
+    raw_id_fields = ['user', 'flashcard']
+    date_hierarchy = 'reviewed_at'
+
+
+@admin.register(ReviewDailyAggregate)
+class ReviewDailyAggregateAdmin(admin.ModelAdmin):
+    list_display = ['user', 'date', 'review_count', 'correct_count', 'lapse_count']
+    search_fields = ['user__username']
+    date_hierarchy = 'date'
+
+
+@admin.register(ParameterizedVariant)
+class ParameterizedVariantAdmin(admin.ModelAdmin):
+    list_display = ['flashcard', 'question', 'answer', 'created_at']
+    raw_id_fields = ['flashcard']
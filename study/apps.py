@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class StudyConfig(AppConfig):
     name = 'study'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,126 @@
+"""Cached render payloads for the study page.
+
+A card's payload is the list of dicts _build_flashcards_data renders for it
+(one per step for step_by_step cards), minus the viewer-specific vote and SR
+fields. It is cached under the card's id together with the card's
+updated_at; an entry whose updated_at differs from the row's is rebuilt, and
+post_save on Flashcard deletes it (see signals.py). Study views therefore
+load only LIGHT_FIELDS of each card plus the vote annotations, and the
+question bodies, inline SVG and image URLs come from the cache.
+
+Parameterized cards cache their spec and templates instead of a question, so
+each request still generates a fresh question/answer pair.
+"""
+from django.core.cache import cache
+
+from .models import Flashcard
+
+PAYLOAD_CACHE_SECONDS = 24 * 60 * 60
+
+# The columns a view has to load to look up and merge cached payloads.
+LIGHT_FIELDS = ('id', 'topic', 'question_type', 'updated_at')
+
+
+def _cache_key(card_id):
+    return f'card_payload:{card_id}'
+
+
+def build_payload(fc):
+    """The cacheable payload of a fully loaded Flashcard."""
+    base = {
+        'id': fc.id,
+        'hint': fc.hint,
+        'difficulty': fc.difficulty,
+        'question_type': fc.question_type,
+        'uses_latex': fc.uses_latex,
+        'diagram_code': fc.diagram_code,
+        'diagram_type': fc.diagram_type,
+        'code_snippet': fc.code_snippet,
+        'code_language': fc.code_language,
+        'graph_image_url': fc.generated_graph_image.url if fc.generated_graph_image else None,
+        'question_image': fc.question_image.url if fc.question_image else None,
+        'answer_image': fc.answer_image.url if fc.answer_image else None,
+        'teacher_explanation': fc.teacher_explanation,
+    }
+    payload = {'updated_at': fc.updated_at, 'entries': [], 'parameterized': None}
+
+    if fc.question_type == 'step_by_step' and fc.steps:
+        steps = fc.steps
+        for k, step in enumerate(steps):
+            payload['entries'].append(dict(
+                base,
+                step_index=k,
+                step_total=len(steps),
+                question=fc.question,
+                context_steps=steps[:k],
+                answer=step['move'],
+                answer_detail=step.get('detail', ''),
+                is_parameterized=False,
+            ))
+        return payload
+
+    is_parameterized = fc.question_type == 'parameterized' and bool(fc.parameter_spec)
+    payload['entries'].append(dict(
+        base,
+        step_index=-1,
+        step_total=None,
+        question=fc.question,
+        answer=fc.answer,
+        answer_detail='',
+        context_steps=[],
+        is_parameterized=is_parameterized,
+    ))
+    if is_parameterized:
+        payload['parameterized'] = {
+            'spec': fc.parameter_spec,
+            'question_template': fc.question_template,
+            'answer_template': fc.answer_template,
+        }
+    return payload
+
+
+def get_payloads(flashcards):
+    """
+    Payloads for `flashcards`, from the cache where current.
+
+    Args:
+        flashcards: Flashcard instances with at least LIGHT_FIELDS loaded
+
+    Returns:
+        Dict of flashcard id to payload. Cards deleted since they were
+        loaded are missing from it.
+    """
+    keys = {fc.id: _cache_key(fc.id) for fc in flashcards}
+    cached = cache.get_many(list(keys.values()))
+    payloads = {}
+    stale = []
+    for fc in flashcards:
+        payload = cached.get(keys[fc.id])
+        if payload is not None and payload['updated_at'] == fc.updated_at:
+            payloads[fc.id] = payload
+        else:
+            stale.append(fc.id)
+    if stale:
+        fresh = {fc.id: build_payload(fc) for fc in Flashcard.objects.filter(id__in=stale)}
+        cache.set_many({keys[card_id]: payload for card_id, payload in fresh.items()}, PAYLOAD_CACHE_SECONDS)
+        payloads.update(fresh)
+    return payloads
+
+
+def invalidate_payload(card_id):
+    cache.delete(_cache_key(card_id))
+
+
+def entry_keys(flashcards):
+    """
+    (flashcard id, step index) of each study-page entry `flashcards` expand
+    to, in order (one per step for step_by_step cards, step index -1
+    otherwise), reading only the steps of step_by_step cards.
+    """
+    step_ids = [fc.id for fc in flashcards if fc.question_type == 'step_by_step']
+    steps = dict(Flashcard.objects.filter(id__in=step_ids).values_list('id', 'steps')) if step_ids else {}
+    keys = []
+    for fc in flashcards:
+        step_count = len(steps.get(fc.id) or [])
+        keys.extend([(fc.id, k) for k in range(step_count)] if step_count else [(fc.id, -1)])
+    return keys
@@ -0,0 +1,40 @@
+"""System checks for the study app.
+
+Several modules keep state in the default cache that every worker process
+must see: profile bundles (and the signals that drop them) and card
+payloads. With a cache local to each process, a gunicorn worker keeps
+serving its own stale copy after another worker invalidated it.
+settings.py configures Redis or the database cache in production;
+shared_cache_check fails `manage.py check --deploy` (run before every
+deploy) if that has been overridden with a per-process backend.
+"""
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries live in one process's memory (or nowhere).
+PROCESS_LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_backend(alias=DEFAULT_CACHE_ALIAS):
+    """Dotted path of a cache's backend class."""
+    backend = type(caches[alias])
+    return f'{backend.__module__}.{backend.__qualname__}'
+
+
+def cache_is_shared(alias=DEFAULT_CACHE_ALIAS):
+    """Whether a cache's entries are visible to every process (not LocMemCache or DummyCache)."""
+    return cache_backend(alias) not in PROCESS_LOCAL_BACKENDS
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [Error(
+        'The default cache is local to each process.',
+        hint='Set REDIS_URL, or use the database cache (see CACHES in settings.py).',
+        id='study.E001',
+    )]
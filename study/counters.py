@@ -0,0 +1,166 @@
+"""Incremental maintenance of TopicReviewCounter rows.
+
+Every whole-card progress row (step_index=-1) is in exactly one bucket:
+'new' (no next_review_date), 'learning' or 'learned'. Scheduled cards are
+also counted under their due date in due_by_date. Writers snapshot a card's
+state before and after a change and pass the pair to record_transitions();
+readers use get_topic_counters(), which rebuilds any missing row from
+FlashcardProgress.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Flashcard, FlashcardProgress, Topic, TopicReviewCounter
+
+# SM-2 repetitions a card needs before it leaves the 1- and 6-day steps.
+LEARNED_MIN_REPETITIONS = 2
+
+NEW_STATE = ('new', None)
+COUNT_FIELDS = {'new': 'new_count', 'learning': 'learning_count', 'learned': 'learned_count'}
+
+
+def card_state(progress):
+    """Return the (bucket, due_date) of a whole-card progress row, or NEW_STATE for None."""
+    if progress is None or progress.next_review_date is None:
+        return NEW_STATE
+    bucket = 'learning' if progress.sm2_repetitions < LEARNED_MIN_REPETITIONS else 'learned'
+    return bucket, progress.next_review_date
+
+
+def _apply_state(counter, state, sign):
+    bucket, due = state
+    field = COUNT_FIELDS[bucket]
+    setattr(counter, field, getattr(counter, field) + sign)
+    if due is not None:
+        key = due.isoformat()
+        remaining = counter.due_by_date.get(key, 0) + sign
+        if remaining:
+            counter.due_by_date[key] = remaining
+        else:
+            counter.due_by_date.pop(key, None)
+
+
+def build_counters(user, topic_ids):
+    """Compute unsaved TopicReviewCounter rows for user/topics from scratch."""
+    topic_ids = list(topic_ids)
+    counters = {
+        topic_id: TopicReviewCounter(user=user, topic_id=topic_id, due_by_date={})
+        for topic_id in topic_ids
+    }
+    for row in Flashcard.objects.filter(topic_id__in=topic_ids).values('topic_id').annotate(n=Count('id')):
+        counters[row['topic_id']].new_count = row['n']
+
+    scheduled = (
+        FlashcardProgress.objects
+        .filter(user=user, step_index=-1, next_review_date__isnull=False, flashcard__topic_id__in=topic_ids)
+        .values('flashcard__topic_id', 'next_review_date')
+        .annotate(
+            learning=Count('id', filter=Q(sm2_repetitions__lt=LEARNED_MIN_REPETITIONS)),
+            learned=Count('id', filter=Q(sm2_repetitions__gte=LEARNED_MIN_REPETITIONS)),
+        )
+    )
+    for row in scheduled:
+        counter = counters[row['flashcard__topic_id']]
+        counter.new_count -= row['learning'] + row['learned']
+        counter.learning_count += row['learning']
+        counter.learned_count += row['learned']
+        counter.due_by_date[row['next_review_date'].isoformat()] = row['learning'] + row['learned']
+    return list(counters.values())
+
+
+def rebuild_counters(user, topic_ids):
+    """Replace the user's counter rows for these topics with freshly computed ones."""
+    counters = build_counters(user, topic_ids)
+    with transaction.atomic():
+        TopicReviewCounter.objects.filter(user=user, topic_id__in=topic_ids).delete()
+        TopicReviewCounter.objects.bulk_create(counters)
+    return counters
+
+
+def get_topic_counters(user, topic_ids):
+    """Return {topic_id: TopicReviewCounter} in one query, building any missing rows."""
+    topic_ids = set(topic_ids)
+    counters = {c.topic_id: c for c in TopicReviewCounter.objects.filter(user=user, topic_id__in=topic_ids)}
+    missing = topic_ids - counters.keys()
+    if missing:
+        counters.update((c.topic_id, c) for c in rebuild_counters(user, missing))
+    return counters
+
+
+def record_transitions(user, transitions):
+    """Apply card state changes to the user's counters.
+
+    Args:
+        user: Owner of the progress rows
+        transitions: Iterable of (topic_id, state_before, state_after), where
+            states come from card_state(). Call after the progress write so a
+            missing counter row can be rebuilt from the already-updated data.
+    """
+    by_topic = defaultdict(list)
+    for topic_id, before, after in transitions:
+        if before != after:
+            by_topic[topic_id].append((before, after))
+    if not by_topic:
+        return
+
+    with transaction.atomic():
+        counters = {
+            c.topic_id: c
+            for c in TopicReviewCounter.objects.select_for_update().filter(user=user, topic_id__in=by_topic)
+        }
+        for topic_id, changes in by_topic.items():
+            counter = counters.get(topic_id)
+            if counter is None:
+                continue
+            for before, after in changes:
+                _apply_state(counter, before, -1)
+                _apply_state(counter, after, +1)
+        TopicReviewCounter.objects.bulk_update(
+            counters.values(), ['new_count', 'learning_count', 'learned_count', 'due_by_date'],
+        )
+    missing = by_topic.keys() - counters.keys()
+    if missing:
+        rebuild_counters(user, missing)
+
+
+def remove_card(flashcard):
+    """Take a card that is about to be deleted out of every user's counters for its topic."""
+    states = {
+        p.user_id: card_state(p)
+        for p in FlashcardProgress.objects.filter(flashcard=flashcard, step_index=-1)
+    }
+    counters = list(TopicReviewCounter.objects.filter(topic_id=flashcard.topic_id))
+    for counter in counters:
+        _apply_state(counter, states.get(counter.user_id, NEW_STATE), -1)
+    TopicReviewCounter.objects.bulk_update(
+        counters, ['new_count', 'learning_count', 'learned_count', 'due_by_date'],
+    )
+
+
+def due_today_by_course(user, today=None):
+    """
+    Return {course_id: cards due today} from the user's counter rows.
+
+    Rows missing for topics of the user's enrolled courses (never read yet,
+    or dropped by a reschedule) are rebuilt first, as get_topic_counters does.
+    """
+    cutoff = (today or datetime.date.today()).isoformat()
+    rows = {
+        topic_id: (course_id, due_by_date)
+        for topic_id, course_id, due_by_date in TopicReviewCounter.objects.filter(user=user).values_list(
+            'topic_id', 'topic__course_id', 'due_by_date',
+        )
+    }
+    enrolled = Topic.objects.filter(course__enrollments__user=user).values_list('id', 'course_id')
+    missing = {topic_id: course_id for topic_id, course_id in enrolled if topic_id not in rows}
+    if missing:
+        for counter in rebuild_counters(user, missing):
+            rows[counter.topic_id] = (missing[counter.topic_id], counter.due_by_date)
+
+    totals = defaultdict(int)
+    for course_id, due_by_date in rows.values():
+        totals[course_id] += sum(n for day, n in due_by_date.items() if day <= cutoff)
+    return dict(totals)
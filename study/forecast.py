@@ -0,0 +1,135 @@
+"""Review-load forecast and due-date load balancing.
+
+A user's forecast is a histogram of scheduled whole-card progress rows per
+due date, built with one GROUP BY next_review_date query and cached for
+FORECAST_CACHE_SECONDS. The forecast API slices the next FORECAST_DAYS days
+from it. When a user has SpacedRepetitionSettings.load_balance on,
+_apply_sm2 asks least_loaded_interval() for the quietest day close to the
+computed interval. That spreads out the review spikes a bulk import leaves
+behind.
+
+Every rating moves its card in the cached histogram with record_due_change
+(off its old due date, onto the new one), so load balancing sees the current
+counts rather than the ones from when the histogram was built.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import FlashcardProgress
+
+FORECAST_DAYS = 90
+FORECAST_CACHE_SECONDS = 15 * 60
+
+# Intervals shorter than this are never moved; longer ones may shift by
+# LOAD_BALANCE_FUZZ of the interval, and always by at least one day.
+LOAD_BALANCE_MIN_INTERVAL = 4
+LOAD_BALANCE_FUZZ = 0.05
+
+
+def _cache_key(user_id, today):
+    return f'review_forecast:{user_id}:{today.isoformat()}'
+
+
+def due_histogram(user_id, today=None):
+    """
+    Cards due per day for a user, as {'YYYY-MM-DD': count}.
+
+    Overdue cards are counted on today. The dict is cached per user and day;
+    callers must not mutate it.
+    """
+    today = today or datetime.date.today()
+    key = _cache_key(user_id, today)
+    histogram = cache.get(key)
+    if histogram is None:
+        histogram = {}
+        rows = (
+            FlashcardProgress.objects
+            .filter(user_id=user_id, step_index=-1, next_review_date__isnull=False)
+            .values('next_review_date')
+            .annotate(n=Count('id'))
+            .order_by()
+        )
+        for row in rows:
+            day = max(row['next_review_date'], today).isoformat()
+            histogram[day] = histogram.get(day, 0) + row['n']
+        cache.set(key, histogram, FORECAST_CACHE_SECONDS)
+    return histogram
+
+
+def review_forecast(user_id, days=FORECAST_DAYS, today=None):
+    """List of {'date': 'YYYY-MM-DD', 'due': n} for today and the following days - 1 days."""
+    today = today or datetime.date.today()
+    histogram = due_histogram(user_id, today)
+    dates = (today + datetime.timedelta(days=offset) for offset in range(days))
+    return [{'date': day.isoformat(), 'due': histogram.get(day.isoformat(), 0)} for day in dates]
+
+
+def invalidate_forecast(user_ids, today=None):
+    """Drop today's cached histogram for these users (e.g. after a bulk reschedule)."""
+    today = today or datetime.date.today()
+    cache.delete_many([_cache_key(user_id, today) for user_id in user_ids])
+
+
+def record_due_change(user_id, old_due, new_due, today=None):
+    """
+    Move one card from old_due to new_due in the user's cached histogram.
+
+    Either date may be None (a new card, or one reset to new). Does nothing
+    when no histogram is cached; the next read builds it from the database.
+    """
+    if old_due == new_due:
+        return
+    today = today or datetime.date.today()
+    key = _cache_key(user_id, today)
+    histogram = cache.get(key)
+    if histogram is None:
+        return
+    histogram = dict(histogram)
+    for due, change in ((old_due, -1), (new_due, 1)):
+        if due is None:
+            continue
+        day = max(due, today).isoformat()
+        count = histogram.get(day, 0) + change
+        if count > 0:
+            histogram[day] = count
+        else:
+            histogram.pop(day, None)
+    cache.set(key, histogram, FORECAST_CACHE_SECONDS)
+
+
+def least_loaded_interval(user_id, interval, max_interval, review_day=None):
+    """
+    Pick the interval near `interval` whose due date has the fewest cards.
+
+    Candidates lie within LOAD_BALANCE_FUZZ of the interval (at least one day
+    either side), capped at max_interval. Ties go to the candidate closest
+    to the computed interval, then the earlier one. The caller records the
+    card's move with record_due_change, so later cards rated in the same
+    session spread out as well.
+
+    Args:
+        user_id: Owner of the card
+        interval: Interval computed by SM-2
+        max_interval: The user's interval cap
+        review_day: Day the review happened on (defaults to today)
+
+    Returns:
+        The interval to schedule with
+    """
+    if interval < LOAD_BALANCE_MIN_INTERVAL:
+        return interval
+    today = datetime.date.today()
+    review_day = review_day or today
+    spread = max(1, round(interval * LOAD_BALANCE_FUZZ))
+    candidates = range(max(1, interval - spread), min(max_interval, interval + spread) + 1)
+    if not candidates:
+        return interval
+
+    histogram = due_histogram(user_id, today)
+
+    def load(days):
+        return histogram.get((review_day + datetime.timedelta(days=days)).isoformat(), 0)
+
+    return min(candidates, key=lambda days: (load(days), abs(days - interval), days))
@@ -4,6 +4,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Course, Topic, Flashcard, Skill
+from .spec_profile import profile_spec, spec_problems
 
 
 class CustomRegistrationForm(UserCreationForm):
@@ -103,6 +104,9 @@ class FlashcardForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        # Set by clean() for parameterized cards
+        self.spec_profile = None
+        self.spec_warnings = []
         if user:
             self.fields['topic'].queryset = Topic.objects.filter(course__created_by=user)
         # Pre-populate steps_json from existing instance
@@ -149,12 +153,26 @@ class FlashcardForm(forms.ModelForm):
                     "Parameterized cards require a parameter specification (JSON format)."
                 )
 
+            if isinstance(parameter_spec, str):
+                try:
+                    parameter_spec = json.loads(parameter_spec)
+                except json.JSONDecodeError as e:
+                    raise forms.ValidationError(
+                        f"Parameter specification must be valid JSON: {str(e)}"
+                    )
+            if not isinstance(parameter_spec, dict):
+                raise forms.ValidationError("Parameter specification must be a JSON object.")
+
             try:
-                json.loads(parameter_spec)
-            except json.JSONDecodeError as e:
-                raise forms.ValidationError(
-                    f"Parameter specification must be valid JSON: {str(e)}"
-                )
+                profile = profile_spec(parameter_spec)
+            except ValueError as e:
+                self.add_error('parameter_spec', f"Invalid parameter specification: {e}")
+                return cleaned_data
+            rejections, self.spec_warnings = spec_problems(profile)
+            if rejections:
+                self.add_error('parameter_spec', rejections)
+            else:
+                self.spec_profile = profile
 
         return cleaned_data
 
@@ -163,6 +181,8 @@ class FlashcardForm(forms.ModelForm):
         steps = self.cleaned_data.get('steps_json')
         if steps is not None:
             instance.steps = steps
+        if self.spec_profile is not None:
+            instance.parameter_profile = self.spec_profile.as_dict()
         if commit:
             instance.save()
             self._save_m2m()
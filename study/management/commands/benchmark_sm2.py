@@ -0,0 +1,62 @@
+"""
+Benchmark the vectorised SM-2 re-scheduler against a per-row Python loop.
+
+Runs entirely in memory on synthetic progress rows (no database access), so
+it measures only the scheduling arithmetic that reschedule_reviews performs.
+
+Usage:
+    python manage.py benchmark_sm2 --rows=1000000
+"""
+
+import datetime
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from study.utils.scheduling import reschedule_arrays, reschedule_row
+
+
+class Command(BaseCommand):
+    help = 'Compares vectorised and per-row SM-2 re-scheduling on synthetic rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Synthetic rows (default: 1,000,000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        rng = np.random.default_rng(options['seed'])
+        ef = np.round(rng.uniform(1.1, 3.0, rows), 4)
+        reps = rng.integers(0, 12, rows)
+        interval = rng.integers(1, 365, rows)
+        due = np.datetime64(datetime.date.today()) + rng.integers(-30, 365, rows).astype('timedelta64[D]')
+        min_ef, max_interval = 1.4, 180
+
+        start = time.perf_counter()
+        new_ef, new_interval, new_due = reschedule_arrays(ef, reps, interval, due, min_ef, max_interval)
+        vector_seconds = time.perf_counter() - start
+
+        ef_list, reps_list = ef.tolist(), reps.tolist()
+        interval_list, due_list = interval.tolist(), due.astype(datetime.date).tolist()
+        start = time.perf_counter()
+        loop_interval = []
+        loop_due = []
+        for i in range(rows):
+            _, days = reschedule_row(ef_list[i], reps_list[i], interval_list[i], min_ef, max_interval)
+            loop_interval.append(days)
+            loop_due.append(due_list[i] - datetime.timedelta(days=interval_list[i] - days))
+        loop_seconds = time.perf_counter() - start
+
+        mismatches = int(np.count_nonzero(
+            (new_interval != np.array(loop_interval))
+            | (new_due != np.array(loop_due, dtype='datetime64[D]'))
+        ))
+        self.stdout.write(f'Rows:        {rows:,}')
+        self.stdout.write(f'Vectorised:  {vector_seconds:.3f}s')
+        self.stdout.write(f'Python loop: {loop_seconds:.3f}s')
+        self.stdout.write(f'Speed-up:    {loop_seconds / max(vector_seconds, 1e-9):.1f}x')
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} row(s) differ between implementations'))
+        else:
+            self.stdout.write(self.style.SUCCESS('[OK] Both implementations agree'))
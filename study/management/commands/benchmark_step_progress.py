@@ -0,0 +1,135 @@
+"""
+Compare the two per-step progress layouts of step_by_step cards.
+
+Storage: an in-memory SQLite database is filled with one step_by_step card's
+progress for --users users, once with one FlashcardProgress row per step and
+once with the compact step_state layout (see study.step_progress), and the
+pages used by each table and its indexes are reported.
+
+Queries: one throwaway user rates every step of a card through
+record_review under each layout, and the statements issued per rating are
+counted. This runs against the configured database inside a transaction
+that is rolled back.
+
+Usage:
+    python manage.py benchmark_step_progress --users=100000 --steps=10
+"""
+
+import datetime
+import random
+import sqlite3
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from study.models import Course, Flashcard, Topic
+from study.progress_writes import record_review
+from study.step_progress import StepCounts, pack_steps
+
+# Mirrors FlashcardProgress: same columns, unique constraint and due index.
+PROGRESS_DDL = """
+CREATE TABLE progress (
+    id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, flashcard_id INTEGER NOT NULL,
+    step_index INTEGER NOT NULL, times_reviewed INTEGER NOT NULL, times_correct INTEGER NOT NULL,
+    last_reviewed TEXT NOT NULL, confidence_level INTEGER NOT NULL, easiness_factor REAL NOT NULL,
+    interval_days INTEGER NOT NULL, sm2_repetitions INTEGER NOT NULL, next_review_date TEXT,
+    previous_interval_days INTEGER NOT NULL, previous_repetitions INTEGER NOT NULL,
+    previous_review_date TEXT, step_state BLOB,
+    UNIQUE (user_id, flashcard_id, step_index)
+);
+CREATE INDEX progress_user_due_idx ON progress (user_id, step_index, next_review_date);
+"""
+INSERT_PROGRESS = 'INSERT INTO progress VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares storage and query counts of per-step rows and packed step_state'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000, help='Users with progress (default: 100,000)')
+        parser.add_argument('--steps', type=int, default=10, help='Steps on the card (default: 10)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic data')
+
+    def handle(self, *args, **options):
+        users, steps = options['users'], options['steps']
+        rng = random.Random(options['seed'])
+
+        row_bytes, row_count = self._storage(users, steps, rng, compact=False)
+        compact_bytes, compact_count = self._storage(users, steps, rng, compact=True)
+        self.stdout.write(f'Users: {users:,}, steps per card: {steps}')
+        self.stdout.write(f'Per-step rows: {row_count:>10,} rows  {row_bytes / 2**20:8.1f} MiB')
+        self.stdout.write(f'Compact:       {compact_count:>10,} rows  {compact_bytes / 2**20:8.1f} MiB')
+        self.stdout.write(f'Storage saved: {100 * (1 - compact_bytes / row_bytes):.0f}%')
+
+        row_queries = self._queries_per_rating(steps, compact=False)
+        compact_queries = self._queries_per_rating(steps, compact=True)
+        self.stdout.write(f'Statements per step rating: per-step rows {row_queries:.1f}, compact {compact_queries:.1f}')
+        self.stdout.write(self.style.SUCCESS('[OK] Benchmark complete'))
+
+    def _storage(self, users, steps, rng, compact):
+        """Bytes used by the progress table and its indexes, and its row count."""
+        db = sqlite3.connect(':memory:')
+        db.executescript(PROGRESS_DDL)
+        today = datetime.date.today()
+        now = datetime.datetime.now().isoformat(' ')
+
+        def row(user_id, step_index, counts, scheduled, packed=None):
+            due = (today + datetime.timedelta(days=rng.randint(-5, 60))).isoformat() if scheduled else None
+            return (user_id, 1, step_index, counts.times_reviewed, counts.times_correct, now,
+                    counts.confidence_level, round(rng.uniform(1.3, 3.0), 4), rng.randint(1, 60),
+                    rng.randint(0, 8), due, 0, 0, None, packed)
+
+        def random_counts():
+            reviewed = rng.randint(1, 30)
+            return StepCounts(reviewed, rng.randint(0, reviewed), rng.randint(0, 5))
+
+        batch = []
+        for user_id in range(1, users + 1):
+            step_counts = [random_counts() for _ in range(steps)]
+            if compact:
+                totals = StepCounts(sum(s.times_reviewed for s in step_counts),
+                                    sum(s.times_correct for s in step_counts), 3)
+                batch.append(row(user_id, -1, totals, True, pack_steps(step_counts)))
+            else:
+                batch.append(row(user_id, -1, StepCounts(), True))
+                batch.extend(row(user_id, k, counts, False) for k, counts in enumerate(step_counts))
+            if len(batch) >= 50_000:
+                db.executemany(INSERT_PROGRESS, batch)
+                batch = []
+        if batch:
+            db.executemany(INSERT_PROGRESS, batch)
+        db.commit()
+        db.execute('VACUUM')
+
+        page_size = db.execute('PRAGMA page_size').fetchone()[0]
+        pages = db.execute('PRAGMA page_count').fetchone()[0]
+        count = db.execute('SELECT COUNT(*) FROM progress').fetchone()[0]
+        db.close()
+        return pages * page_size, count
+
+    def _queries_per_rating(self, steps, compact):
+        """Average statements issued by record_review for one step rating."""
+        captured = 0
+        try:
+            with transaction.atomic(), override_settings(COMPACT_STEP_PROGRESS=compact):
+                user = User.objects.create_user(username='benchmark-step-progress')
+                course = Course.objects.create(name='Benchmark', created_by=user)
+                topic = Topic.objects.create(course=course, name='Benchmark', order=1)
+                card = Flashcard.objects.create(
+                    topic=topic, question='Q', answer='A', question_type='step_by_step',
+                    steps=[{'move': f'step {k}'} for k in range(steps)],
+                )
+                with CaptureQueriesContext(connection) as queries:
+                    for step_index in range(steps):
+                        record_review(user.id, card.id, 4, step_index=step_index)
+                captured = len([q for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']])
+                raise _Rollback
+        except _Rollback:
+            pass
+        return captured / steps
@@ -0,0 +1,48 @@
+"""
+Close study sessions that were left open.
+
+A session is created by its first rating and ended when the student finishes
+the page, but closing the tab or losing the connection leaves it without an
+ended_at. Sessions with no rating for --idle-hours are closed: those with
+reviews get ended_at set to their last rating, and those without (left over
+from before sessions were created lazily) are deleted. Run this from cron.
+
+Usage:
+    python manage.py close_idle_sessions
+    python manage.py close_idle_sessions --idle-hours=24
+"""
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from study.models import StudySession
+from study.session_queue import IDLE_HOURS
+
+
+class Command(BaseCommand):
+    help = 'Ends idle study sessions that have reviews and deletes those without'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--idle-hours',
+            type=int,
+            default=IDLE_HOURS,
+            help=f'Hours without a rating before a session is closed (default: {IDLE_HOURS})',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(hours=options['idle_hours'])
+        idle = StudySession.objects.filter(ended_at__isnull=True).filter(
+            Q(last_review_at__lt=cutoff) | Q(last_review_at__isnull=True, started_at__lt=cutoff)
+        )
+        deleted, _ = idle.filter(review_count=0).delete()
+        ended = idle.filter(review_count__gt=0).update(
+            ended_at=Coalesce(F('last_review_at'), F('started_at')),
+            cards_studied=Greatest(F('cards_studied'), F('review_count')),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Ended {ended} idle session(s) and deleted {deleted} without reviews.'
+        ))
@@ -0,0 +1,32 @@
+"""
+Convert stored per-step progress to the layout COMPACT_STEP_PROGRESS selects.
+
+With the setting on, per-step FlashcardProgress rows are packed into the
+step_state of their whole-card row; with it off, packed step_state is
+unpacked back into one row per step (see study.step_progress). Run this
+after changing the setting, so ratings are not split across both layouts.
+
+Usage:
+    python manage.py convert_step_progress
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from study.migration_helpers import pack_step_rows, unpack_step_rows
+from study.models import FlashcardProgress
+from study.step_progress import compact_enabled
+
+
+class Command(BaseCommand):
+    help = 'Packs or unpacks per-step progress to match COMPACT_STEP_PROGRESS'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if compact_enabled():
+                removed = pack_step_rows(FlashcardProgress)
+                message = f'[OK] Packed {removed} per-step row(s) into step_state.'
+            else:
+                created = unpack_step_rows(FlashcardProgress)
+                message = f'[OK] Unpacked step_state into {created} per-step row(s).'
+        self.stdout.write(self.style.SUCCESS(message))
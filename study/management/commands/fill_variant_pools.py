@@ -0,0 +1,59 @@
+"""
+Top up the pre-generated variant pools of parameterized cards.
+
+The study page takes variants from each card's pool and falls back to live
+generation once it is empty (see study.variant_pool). Run this from cron,
+and after importing or editing parameterized cards, so pools stay full.
+With --low it only refills the cards the study page found running low,
+which is cheap enough to run every few minutes.
+
+Usage:
+    python manage.py fill_variant_pools
+    python manage.py fill_variant_pools --low
+    python manage.py fill_variant_pools --size=100
+    python manage.py fill_variant_pools --card=<flashcard id>
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from study.variant_pool import fill_pool, parameterized_cards, pool_size, pop_low_pools
+
+
+class Command(BaseCommand):
+    help = 'Generates variants for parameterized cards whose pool is below the pool size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            help=f'Variants to keep per card (default: {pool_size()})',
+        )
+        parser.add_argument(
+            '--card',
+            type=int,
+            help='Only fill this flashcard (default: every parameterized card)',
+        )
+        parser.add_argument(
+            '--low',
+            action='store_true',
+            help='Only fill the cards whose pool the study page found below the low-water mark',
+        )
+
+    def handle(self, *args, **options):
+        cards = parameterized_cards()
+        if options.get('card'):
+            cards = cards.filter(id=options['card'])
+            if not cards.exists():
+                raise CommandError(f'Parameterized flashcard {options["card"]} does not exist.')
+        if options.get('low'):
+            cards = cards.filter(id__in=pop_low_pools())
+
+        created = filled = 0
+        for card in cards.iterator():
+            added = fill_pool(card, options.get('size'))
+            created += added
+            filled += bool(added)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Generated {created} variant(s) for {filled} card(s).'
+        ))
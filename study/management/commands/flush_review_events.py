@@ -0,0 +1,30 @@
+"""
+Write buffered review events from the cache to the ReviewEvent table.
+
+Ratings are buffered in the cache and flushed by the request that crosses the
+size or age threshold (see study.review_log). Run this from cron or before a
+deploy so quiet periods do not leave events sitting in the buffer. Events are
+only buffered when the default cache is Redis (see CACHES in settings.py).
+
+Usage:
+    python manage.py flush_review_events
+"""
+
+from django.core.management.base import BaseCommand
+
+from study.review_log import buffering_enabled, flush_review_events, pending_count
+
+
+class Command(BaseCommand):
+    help = 'Flushes buffered review events to the database'
+
+    def handle(self, *args, **options):
+        if not buffering_enabled():
+            self.stdout.write(self.style.WARNING(
+                'The default cache is not Redis, so events are written directly; nothing to flush.'
+            ))
+            return
+        written = flush_review_events()
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Wrote {written} review event(s); {max(0, pending_count())} still buffered.'
+        ))
@@ -0,0 +1,77 @@
+"""
+Generate printable worksheets from parameterized cards.
+
+Renders --variants variants of every parameterized card of a topic or
+course across a process pool (see study.worksheets), and writes the
+worksheet and its answer key as separate HTML or LaTeX files. The same
+--seed reproduces the same worksheets.
+
+Usage:
+    python manage.py generate_worksheets --topic=<topic id> --variants=30
+    python manage.py generate_worksheets --course=<course id> --format=latex --output=exam.tex
+    python manage.py generate_worksheets --course=<course id> --seed=2026 --processes=4
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from study.models import Course, Topic
+from study.worksheets import FORMATS, generate_variants, worksheet_cards, worksheet_document
+
+
+class Command(BaseCommand):
+    help = 'Writes a worksheet and answer key of N variants of every parameterized card of a topic or course'
+
+    def add_arguments(self, parser):
+        scope = parser.add_mutually_exclusive_group(required=True)
+        scope.add_argument('--topic', type=int, help='Topic id')
+        scope.add_argument('--course', type=int, help='Course id')
+        parser.add_argument('--variants', type=int, default=10, help='Variants per card (default: 10)')
+        parser.add_argument('--format', choices=FORMATS, default='html', help='Output format (default: html)')
+        parser.add_argument('--seed', type=int, default=0, help='Worksheet seed (default: 0)')
+        parser.add_argument(
+            '--processes', type=int,
+            help='Worker processes (default: one per CPU; 1 renders in this process)',
+        )
+        parser.add_argument(
+            '--output',
+            help='Worksheet file (default: worksheet.html or worksheet.tex); '
+                 'the answer key is written next to it with an -answers suffix',
+        )
+
+    def handle(self, *args, **options):
+        if options['variants'] < 1:
+            raise CommandError('--variants must be at least 1.')
+        if options['topic']:
+            scope = Topic.objects.filter(id=options['topic']).first()
+            cards = worksheet_cards(topic_id=options['topic'])
+        else:
+            scope = Course.objects.filter(id=options['course']).first()
+            cards = worksheet_cards(course_id=options['course'])
+        if scope is None:
+            raise CommandError('Topic or course does not exist.')
+        cards = list(cards)
+        if not cards:
+            raise CommandError(f'"{scope.name}" has no parameterized cards.')
+
+        start = time.perf_counter()
+        results = generate_variants(cards, options['variants'], options['seed'], options['processes'])
+        elapsed = time.perf_counter() - start
+        for result in results:
+            if result.error:
+                self.stdout.write(self.style.WARNING(f'[SKIP] {result.label}: {result.error}'))
+
+        fmt = options['format']
+        output = options['output'] or f"worksheet.{'tex' if fmt == 'latex' else 'html'}"
+        root, extension = os.path.splitext(output)
+        answers_output = f'{root}-answers{extension}'
+        for path, answers in ((output, False), (answers_output, True)):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(worksheet_document(results, scope.name, fmt, answers=answers))
+
+        generated = sum(len(result.variants) for result in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Generated {generated} variant(s) of {sum(bool(r.variants) for r in results)} card(s) '
+            f'in {elapsed:.2f}s; wrote {output} and {answers_output}.'
+        ))
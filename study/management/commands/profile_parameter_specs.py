@@ -0,0 +1,76 @@
+"""
+Profile the parameter specs of parameterized cards.
+
+Runs the same sampling as saving a card through FlashcardForm (see
+study.spec_profile) over every parameterized card, stores each result on
+the card's parameter_profile and prints one line per card, flagging specs
+that would be rejected or warned about on save. It ends with the hit and
+miss counts of the RestrictedPython compile cache (see study.utils.restricted)
+over the run.
+
+Usage:
+    python manage.py profile_parameter_specs
+    python manage.py profile_parameter_specs --samples=5000
+    python manage.py profile_parameter_specs --problems-only
+"""
+
+from django.core.management.base import BaseCommand
+
+from study.models import Flashcard
+from study.spec_profile import profile_spec, sample_count, spec_problems
+from study.utils import compile_cache_info
+from study.variant_pool import parameterized_cards
+
+
+class Command(BaseCommand):
+    help = 'Reports acceptance rate, error rate and generation time of every parameterized card'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--samples',
+            type=int,
+            help=f'Generation attempts per card (default: {sample_count()})',
+        )
+        parser.add_argument(
+            '--problems-only',
+            action='store_true',
+            help='Only print cards that would be rejected or warned about',
+        )
+
+    def handle(self, *args, **options):
+        profiled = invalid = rejected = warned = 0
+        for card in parameterized_cards().iterator():
+            try:
+                profile = profile_spec(card.parameter_spec, options.get('samples'))
+            except ValueError as exc:
+                invalid += 1
+                self.stdout.write(self.style.ERROR(f'[INVALID] #{card.id}: {exc}'))
+                continue
+            # update() rather than save(): the post_save handler would empty the card's variant pool.
+            Flashcard.objects.filter(id=card.id).update(parameter_profile=profile.as_dict())
+            profiled += 1
+
+            rejections, warnings = spec_problems(profile)
+            rejected += bool(rejections)
+            warned += bool(warnings) and not rejections
+            if options['problems_only'] and not (rejections or warnings):
+                continue
+            timing = f'p50 {profile.p50_ms} ms, p99 {profile.p99_ms} ms' if profile.p50_ms is not None else 'never accepted'
+            line = (f'#{card.id}: {profile.acceptance_rate:.1%} accepted, '
+                    f'{profile.error_rate:.1%} errors, {timing}')
+            if rejections:
+                self.stdout.write(self.style.ERROR(f'[REJECT] {line}; ' + ' '.join(rejections)))
+            elif warnings:
+                self.stdout.write(self.style.WARNING(f'[WARN] {line}; ' + ' '.join(warnings)))
+            else:
+                self.stdout.write(f'[OK] {line}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Profiled {profiled} card(s): {rejected} below the rejection thresholds, '
+            f'{warned} with warnings, {invalid} invalid spec(s).'
+        ))
+        info = compile_cache_info()
+        self.stdout.write(
+            f"Compile cache: {info['hits']} hit(s), {info['misses']} miss(es), "
+            f"{info['size']}/{info['maxsize']} entries."
+        )
@@ -0,0 +1,48 @@
+"""
+Rebuild TopicReviewCounter rows from FlashcardProgress.
+
+The counters are maintained incrementally by the study views and signals.
+Run this after deploying them for the first time, after bulk data changes
+that bypass signals (data migrations, raw SQL), or whenever counts look off.
+
+Usage:
+    python manage.py reconcile_review_counters
+    python manage.py reconcile_review_counters --user=<username>
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from study.counters import rebuild_counters
+from study.models import FlashcardProgress, TopicReviewCounter
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds per-topic new/learning/learned/due counters from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only rebuild this user (default: every user)',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options.get('user'):
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f'User "{options["user"]}" does not exist.')
+
+        rebuilt = 0
+        for user in users.iterator():
+            # Rebuild topics the user has counters for or has studied.
+            topic_ids = set(
+                TopicReviewCounter.objects.filter(user=user).values_list('topic_id', flat=True)
+            ) | set(
+                FlashcardProgress.objects.filter(user=user).values_list('flashcard__topic_id', flat=True)
+            )
+            if topic_ids:
+                rebuilt += len(rebuild_counters(user, topic_ids))
+
+        self.stdout.write(self.style.SUCCESS(f'[OK] Rebuilt {rebuilt} topic counter(s).'))
@@ -0,0 +1,55 @@
+"""
+Render the graphs of cards with graph code.
+
+Each card's graph_code runs in a graph worker process (see
+study.utils.graph_pool) and the PNG is saved to generated_graph_image.
+Run this after importing cards or changing graph settings.
+
+Usage:
+    python manage.py render_graphs
+    python manage.py render_graphs --missing
+    python manage.py render_graphs --card=<flashcard id>
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from study.models import Flashcard
+from study.utils import generate_graph
+
+
+class Command(BaseCommand):
+    help = 'Renders graph images for flashcards with graph code'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--card',
+            type=int,
+            help='Only render this flashcard (default: every card with graph code)',
+        )
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only render cards without a generated image',
+        )
+
+    def handle(self, *args, **options):
+        cards = Flashcard.objects.exclude(graph_code='')
+        if options.get('card'):
+            cards = cards.filter(id=options['card'])
+            if not cards.exists():
+                raise CommandError(f'Flashcard {options["card"]} has no graph code.')
+        if options.get('missing'):
+            cards = cards.filter(Q(generated_graph_image='') | Q(generated_graph_image__isnull=True))
+
+        rendered = failed = 0
+        for card in cards.iterator():
+            if generate_graph(card):
+                rendered += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'Could not render the graph of flashcard {card.id}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Rendered {rendered} graph(s); {failed} failed.'
+        ))
@@ -0,0 +1,46 @@
+"""
+Re-schedule existing FlashcardProgress rows under the current SM-2 settings.
+
+Changing ease_modifier / max_interval_days (or the defaults in
+SpacedRepetitionSettings / study.utils.scheduling) only affects a card the
+next time it is reviewed. This command lifts easiness factors below the new
+minimum and clamps intervals above the new maximum for every scheduled card
+in one vectorised pass, and writes the moved due dates back in chunks.
+
+Usage:
+    python manage.py reschedule_reviews                  # every user
+    python manage.py reschedule_reviews --user=<username>
+"""
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from study.utils.scheduling import reschedule_progress
+
+
+class Command(BaseCommand):
+    help = 'Re-computes next_review_date for scheduled cards after SM-2 settings change'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=str,
+            help='Only re-schedule this user (default: every user)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows read and written per database round trip (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options.get('user'):
+            try:
+                user_ids = [User.objects.get(username=options['user']).id]
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist.')
+
+        changed = reschedule_progress(user_ids=user_ids, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'[OK] Re-scheduled {changed} card(s).'))
@@ -0,0 +1,49 @@
+"""
+Roll old ReviewEvent rows up into per-user, per-day ReviewDailyAggregate rows.
+
+ReviewEvent grows by one row per rating. Per-review detail is only needed
+for recent history, so events older than the retention window are replaced
+by daily totals (reviews, correct, lapses and a quality histogram).
+
+Usage:
+    python manage.py rollup_review_events              # keep 6 months of events
+    python manage.py rollup_review_events --months=3
+"""
+import calendar
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from study.review_log import rollup_review_events
+
+
+def months_ago(day, months):
+    """The same day-of-month `months` earlier, clamped to the end of shorter months."""
+    month_index = day.year * 12 + day.month - 1 - months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return datetime.date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+class Command(BaseCommand):
+    help = 'Rolls review events older than N months into per-day aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=6,
+            help='Keep this many months of individual events (default: 6)',
+        )
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1.')
+
+        cutoff_day = months_ago(timezone.localdate(), options['months'])
+        before = timezone.make_aware(datetime.datetime.combine(cutoff_day, datetime.time.min))
+        rolled = rollup_review_events(before)
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] Rolled up {rolled} review event(s) older than {cutoff_day.isoformat()}.'
+        ))
@@ -76,3 +76,153 @@ def split_trig_exact_values(Flashcard):
                 question_type='standard',
                 uses_latex=True,
             )
+
+
+# ---------------------------------------------------------------------------
+# convert_step_progress — pack per-step FlashcardProgress rows into step_state
+# ---------------------------------------------------------------------------
+
+def _step_pairs(FlashcardProgress, batch_size):
+    """Yield lists of (user_id, flashcard_id) that have per-step rows, in key order."""
+    from django.db.models import Q
+
+    last = None
+    while True:
+        qs = FlashcardProgress.objects.filter(step_index__gte=0)
+        if last is not None:
+            qs = qs.filter(Q(user_id__gt=last[0]) | Q(user_id=last[0], flashcard_id__gt=last[1]))
+        pairs = list(
+            qs.values_list('user_id', 'flashcard_id').distinct().order_by('user_id', 'flashcard_id')[:batch_size]
+        )
+        if not pairs:
+            return
+        last = pairs[-1]
+        yield pairs
+
+
+def _rows_for_pairs(FlashcardProgress, pairs, **filters):
+    wanted = set(pairs)
+    qs = FlashcardProgress.objects.filter(
+        user_id__in={u for u, _ in pairs}, flashcard_id__in={f for _, f in pairs}, **filters
+    )
+    return [p for p in qs if (p.user_id, p.flashcard_id) in wanted]
+
+
+def pack_step_rows(FlashcardProgress, batch_size=1000):
+    """
+    Fold per-step rows (step_index >= 0) into their whole-card row's step_state.
+
+    The whole-card row's counters gain the steps' totals so per-user sums are
+    unchanged; a missing whole-card row is created. Returns the number of
+    per-step rows removed. Accepts the historical or the live model class.
+    """
+    from study.step_progress import StepCounts, pack_steps, unpack_steps
+
+    removed = 0
+    for pairs in _step_pairs(FlashcardProgress, batch_size):
+        steps_by_pair = {}
+        step_pks = []
+        for row in _rows_for_pairs(FlashcardProgress, pairs, step_index__gte=0):
+            steps_by_pair.setdefault((row.user_id, row.flashcard_id), []).append(row)
+            step_pks.append(row.pk)
+        whole = {
+            (p.user_id, p.flashcard_id): p
+            for p in _rows_for_pairs(FlashcardProgress, pairs, step_index=-1)
+        }
+
+        created, updated = [], []
+        for pair, rows in steps_by_pair.items():
+            card = whole.get(pair)
+            if card is None:
+                card = FlashcardProgress(user_id=pair[0], flashcard_id=pair[1], step_index=-1)
+                card.confidence_level = round(sum(r.confidence_level for r in rows) / len(rows))
+                created.append(card)
+            else:
+                updated.append(card)
+            steps = unpack_steps(card.step_state)
+            steps += [StepCounts()] * max(0, max(r.step_index for r in rows) + 1 - len(steps))
+            for r in rows:
+                old = steps[r.step_index]
+                steps[r.step_index] = StepCounts(
+                    old.times_reviewed + r.times_reviewed,
+                    old.times_correct + r.times_correct,
+                    r.confidence_level,
+                )
+            card.step_state = pack_steps(steps)
+            card.times_reviewed += sum(r.times_reviewed for r in rows)
+            card.times_correct += sum(r.times_correct for r in rows)
+
+        FlashcardProgress.objects.bulk_create(created)
+        FlashcardProgress.objects.bulk_update(updated, ['step_state', 'times_reviewed', 'times_correct'])
+        FlashcardProgress.objects.filter(pk__in=step_pks).delete()
+        removed += len(step_pks)
+    return removed
+
+
+def unpack_step_rows(FlashcardProgress, batch_size=1000):
+    """Reverse of pack_step_rows: recreate per-step rows from step_state. Returns rows created."""
+    from study.step_progress import unpack_steps
+
+    created = 0
+    last_pk = 0
+    while True:
+        cards = list(
+            FlashcardProgress.objects.filter(step_state__isnull=False, pk__gt=last_pk).order_by('pk')[:batch_size]
+        )
+        if not cards:
+            return created
+        last_pk = cards[-1].pk
+        step_rows = []
+        for card in cards:
+            for index, step in enumerate(unpack_steps(card.step_state)):
+                if not step.times_reviewed:
+                    continue
+                step_rows.append(FlashcardProgress(
+                    user_id=card.user_id, flashcard_id=card.flashcard_id, step_index=index,
+                    times_reviewed=step.times_reviewed, times_correct=step.times_correct,
+                    confidence_level=step.confidence_level,
+                ))
+                card.times_reviewed = max(0, card.times_reviewed - step.times_reviewed)
+                card.times_correct = max(0, card.times_correct - step.times_correct)
+            card.step_state = None
+        FlashcardProgress.objects.bulk_create(step_rows)
+        FlashcardProgress.objects.bulk_update(cards, ['step_state', 'times_reviewed', 'times_correct'])
+        created += len(step_rows)
+
+
+# ---------------------------------------------------------------------------
+# Migration 0050 — Course.is_public for the system user's courses
+# ---------------------------------------------------------------------------
+
+def mark_public_courses(Course, system_username='system'):
+    """Flag every course owned by the system user as public. Returns the number flagged."""
+    return Course.objects.filter(created_by__username=system_username).update(is_public=True)
+
+
+def backfill_session_reviews(StudySession):
+    """
+    Count the cards of sessions recorded before review_count existed as their
+    reviews, so streaks and badges keep counting them. Returns the number updated.
+    """
+    from django.db.models import F
+    from django.db.models.functions import Coalesce
+
+    return StudySession.objects.filter(cards_studied__gt=0, review_count=0).update(
+        review_count=F('cards_studied'),
+        last_review_at=Coalesce(F('ended_at'), F('started_at')),
+    )
+
+
+def randomize_card_keys(Flashcard, batch_size=1000):
+    """
+    Give every flashcard its own random_key (AddField fills existing rows with
+    one shared default). Returns the number of cards updated.
+    """
+    import random
+
+    cards = list(Flashcard.objects.only('id'))
+    for card in cards:
+        card.random_key = random.random()
+    Flashcard.objects.bulk_update(cards, ['random_key'], batch_size=batch_size)
+    return len(cards)
+
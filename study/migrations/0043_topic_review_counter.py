@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('study', '0042_alter_easiness_factor_min_validator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicReviewCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('new_count', models.IntegerField(default=0, help_text='Cards with no SM-2 schedule yet')),
+                ('learning_count', models.IntegerField(default=0, help_text='Scheduled cards still in the 1- and 6-day steps')),
+                ('learned_count', models.IntegerField(default=0, help_text='Scheduled cards past the learning steps')),
+                ('due_by_date', models.JSONField(blank=True, default=dict, help_text='{"YYYY-MM-DD": number of scheduled cards due that day}')),
+                ('topic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_counters', to='study.topic')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='topic_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'topic')},
+            },
+        ),
+    ]
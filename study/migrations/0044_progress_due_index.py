@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0043_topic_review_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flashcardprogress',
+            index=models.Index(fields=['user', 'step_index', 'next_review_date'], name='progress_user_due_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('study', '0044_progress_due_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step_index', models.SmallIntegerField(default=-1)),
+                ('quality', models.PositiveSmallIntegerField()),
+                ('reviewed_at', models.DateTimeField()),
+                ('previous_interval', models.PositiveIntegerField(help_text='SM-2 interval (days) before this review')),
+                ('new_interval', models.PositiveIntegerField(help_text='SM-2 interval (days) after this review')),
+                ('flashcard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_events', to='study.flashcard')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'reviewed_at'], name='review_event_user_time_idx'), models.Index(fields=['reviewed_at'], name='review_event_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewDailyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0, help_text='Reviews rated 3 or higher')),
+                ('lapse_count', models.PositiveIntegerField(default=0, help_text='Failed reviews of cards that already had an interval')),
+                ('quality_counts', models.JSONField(default=list, help_text='Reviews per quality rating, index 0-5')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_daily_aggregates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
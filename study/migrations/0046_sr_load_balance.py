@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0045_review_event_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spacedrepetitionsettings',
+            name='load_balance',
+            field=models.BooleanField(default=False, help_text='Move each review of a longer-interval card to the least busy day within ±5% of its interval.'),
+        ),
+    ]
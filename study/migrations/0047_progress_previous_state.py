@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-16 20:58
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0046_sr_load_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardprogress',
+            name='previous_interval_days',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='flashcardprogress',
+            name='previous_repetitions',
+            field=models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AddField(
+            model_name='flashcardprogress',
+            name='previous_review_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0047_progress_previous_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcardprogress',
+            name='step_state',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+"""
+Formerly packed per-step FlashcardProgress rows into step_state when
+settings.COMPACT_STEP_PROGRESS was on at migrate time, so the same history
+left different data on different deployments. Converting between the two
+layouts is the convert_step_progress command's job now, and this migration
+does nothing. Before migrating back past it, run that command with the
+setting off so packed step_state is unpacked into per-step rows again.
+"""
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0048_progress_step_state'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-16 21:13
+
+from django.db import migrations, models
+from study.migration_helpers import mark_public_courses
+
+
+def mark_public(apps, schema_editor):
+    mark_public_courses(apps.get_model('study', 'Course'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0049_pack_step_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='is_public',
+            field=models.BooleanField(db_index=True, default=False, editable=False, help_text='Listed in the catalog; kept in sync with ownership by the system user on save'),
+        ),
+        migrations.RunPython(mark_public, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0050_course_is_public'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studysession',
+            name='is_review',
+            field=models.BooleanField(default=False, help_text='Only cards due for review were queued'),
+        ),
+        migrations.AddField(
+            model_name='studysession',
+            name='queue',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studysession',
+            name='queue_cursor',
+            field=models.PositiveIntegerField(default=0, help_text='Position of the first unrated queue entry'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:21
+
+from django.db import migrations, models
+from study.migration_helpers import backfill_session_reviews
+
+
+def backfill(apps, schema_editor):
+    backfill_session_reviews(apps.get_model('study', 'StudySession'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0051_study_session_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studysession',
+            name='last_review_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='studysession',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, help_text='Ratings submitted during the session'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
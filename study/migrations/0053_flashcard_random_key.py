@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:26
+
+from django.db import migrations, models
+import study.models
+from study.migration_helpers import randomize_card_keys
+
+
+def randomize(apps, schema_editor):
+    randomize_card_keys(apps.get_model('study', 'Flashcard'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0052_session_review_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcard',
+            name='random_key',
+            field=models.FloatField(default=study.models.random_sort_key, editable=False),
+        ),
+        migrations.RunPython(randomize, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='flashcard',
+            index=models.Index(fields=['topic', 'random_key'], name='flashcard_topic_random_idx'),
+        ),
+    ]
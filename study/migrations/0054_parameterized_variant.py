@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0053_flashcard_random_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParameterizedVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question', models.TextField()),
+                ('answer', models.TextField()),
+                ('values', models.JSONField(default=dict, help_text='Generated parameter values')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('flashcard', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='study.flashcard')),
+            ],
+        ),
+    ]
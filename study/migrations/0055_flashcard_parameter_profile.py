@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0054_parameterized_variant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flashcard',
+            name='parameter_profile',
+            field=models.JSONField(blank=True, editable=False, help_text='Acceptance rate, error rate and p50/p99 generation time of parameter_spec (see study.spec_profile)', null=True),
+        ),
+    ]
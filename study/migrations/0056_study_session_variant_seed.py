@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-16 23:00
+
+from django.db import migrations, models
+import study.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('study', '0055_flashcard_parameter_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studysession',
+            name='variant_seed',
+            field=models.PositiveIntegerField(default=study.models.random_session_seed, editable=False, help_text='Seeds the values of parameterized cards in the session (see study.variant_pool)'),
+        ),
+    ]
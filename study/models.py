@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator, MaxLengthValidator
 from django.contrib.auth.models import User
+import copy
+import random
 import secrets
 import string
 import datetime
@@ -19,6 +21,23 @@ def generate_accountability_code():
     chars = string.ascii_uppercase + string.digits
     return ''.join(secrets.choice(chars) for _ in range(8))
 
+# Owner of the public curriculum (created by migration 0013 and the populate_* commands).
+SYSTEM_USERNAME = 'system'
+_UNKNOWN = object()
+_system_user_id = _UNKNOWN
+
+def get_system_user_id():
+    """Primary key of the system user (None while it does not exist), looked up once per process."""
+    global _system_user_id
+    if _system_user_id is _UNKNOWN:
+        _system_user_id = User.objects.filter(username=SYSTEM_USERNAME).values_list('id', flat=True).first()
+    return _system_user_id
+
+def reset_system_user_id():
+    """Forget the looked-up id; signals.py calls this when the system user is saved or deleted."""
+    global _system_user_id
+    _system_user_id = _UNKNOWN
+
 # Create your models here.
 
 AQF_LEVEL_CHOICES = [
@@ -67,6 +86,12 @@ class Course(models.Model):
         help_text="AQF-aligned difficulty level (1 = Year 1 primary, 20 = Honours/Masters/Doctorate)"
     )
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='courses')
+    is_public = models.BooleanField(
+        default=False,
+        db_index=True,
+        editable=False,
+        help_text="Listed in the catalog; kept in sync with ownership by the system user on save",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -138,6 +163,16 @@ class Skill(models.Model):
         return self.name
 
 
+def random_sort_key():
+    """Default Flashcard.random_key (a named function so migrations can reference it)."""
+    return random.random()
+
+
+def random_session_seed():
+    """Default StudySession.variant_seed (a named function so migrations can reference it)."""
+    return random.getrandbits(31)
+
+
 class Flashcard(models.Model):
     """Represents a flashcard for studying"""
     QUESTION_TYPES = [
@@ -214,6 +249,12 @@ class Flashcard(models.Model):
         null=True,
         help_text="JSON specification of parameters, ranges, and computations"
     )
+    parameter_profile = models.JSONField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Acceptance rate, error rate and p50/p99 generation time of parameter_spec (see study.spec_profile)"
+    )
 
     # Step-by-step card fields
     steps = models.JSONField(
@@ -301,15 +342,37 @@ class Flashcard(models.Model):
     question_image = models.ImageField(upload_to='flashcards/questions/', null=True, blank=True)
     answer_image = models.ImageField(upload_to='flashcards/answers/', null=True, blank=True)
     
+    # Uniform in [0, 1); study sessions pick new cards in key order from a
+    # random start, so a random sample needs no full-topic shuffle.
+    random_key = models.FloatField(default=random_sort_key, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['topic', '-created_at']
+        indexes = [
+            models.Index(fields=['topic', 'random_key'], name='flashcard_topic_random_idx'),
+        ]
     
     def __str__(self):
         return f"{self.topic.name} - {self.question[:50]}..."
 
+    # Stored values study.signals compares on save: topic moves and variant sources.
+    TRACKED_FIELDS = ('topic_id', 'parameter_spec', 'question_template', 'answer_template')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_stored_values()
+        return instance
+
+    def remember_stored_values(self):
+        """Copy the loaded TRACKED_FIELDS, so a save can tell what changed without a query."""
+        self._stored_values = {
+            field: copy.deepcopy(self.__dict__[field]) for field in self.TRACKED_FIELDS if field in self.__dict__
+        }
+
     @property
     def effective_star_difficulty(self):
         """Return own star_difficulty if set, otherwise inherit from the topic."""
@@ -360,6 +423,23 @@ class MultipleChoiceOption(models.Model):
         return f"{self.flashcard.question[:30]}... - {self.option_text[:30]}..."
 
 
+class ParameterizedVariant(models.Model):
+    """A pre-rendered question/answer of a parameterized card, kept by study.variant_pool.
+
+    The study page takes (and deletes) a stored variant instead of running the
+    generator; the fill_variant_pools command tops each card back up.
+    Study sessions pick one by their seed without deleting it.
+    """
+    flashcard = models.ForeignKey(Flashcard, on_delete=models.CASCADE, related_name='variants')
+    question = models.TextField()
+    answer = models.TextField()
+    values = models.JSONField(default=dict, help_text='Generated parameter values')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.flashcard_id} - {self.question[:50]}"
+
+
 class StudySession(models.Model):
     """Tracks study sessions for a user"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='study_sessions')
@@ -367,6 +447,16 @@ class StudySession(models.Model):
     started_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
     cards_studied = models.IntegerField(default=0)
+    is_review = models.BooleanField(default=False, help_text='Only cards due for review were queued')
+    # Packed (flashcard id, step index) entries in study order; see study.session_queue.
+    queue = models.BinaryField(null=True, blank=True, editable=False)
+    queue_cursor = models.PositiveIntegerField(default=0, help_text='Position of the first unrated queue entry')
+    review_count = models.PositiveIntegerField(default=0, help_text='Ratings submitted during the session')
+    last_review_at = models.DateTimeField(null=True, blank=True)
+    variant_seed = models.PositiveIntegerField(
+        default=random_session_seed, editable=False,
+        help_text='Seeds the values of parameterized cards in the session (see study.variant_pool)',
+    )
     
     class Meta:
         ordering = ['-started_at']
@@ -414,9 +504,24 @@ class FlashcardProgress(models.Model):
         help_text="Date this card is next due for review. Null means the card is new.",
     )
 
+    # SM-2 state before the most recent rating. Written by the same statement that
+    # applies the rating (study.progress_writes), so callers learn the transition
+    # without reading the row first.
+    previous_interval_days = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    previous_repetitions = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    previous_review_date = models.DateField(null=True, blank=True)
+
+    # Compact per-step counters of a step_by_step card, on its whole-card row
+    # (see study.step_progress). Null when the card has no rated steps.
+    step_state = models.BinaryField(null=True, blank=True, editable=False)
+
     class Meta:
         unique_together = ['user', 'flashcard', 'step_index']
         ordering = ['-last_reviewed']
+        indexes = [
+            # Serves the cross-course "Today" queue: user + whole-card rows + due range.
+            models.Index(fields=['user', 'step_index', 'next_review_date'], name='progress_user_due_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.flashcard.question[:30]}..."
@@ -435,6 +540,79 @@ class FlashcardProgress(models.Model):
         return self.next_review_date <= datetime.date.today()
 
 
+class TopicReviewCounter(models.Model):
+    """Per-user, per-topic card counts kept in step with FlashcardProgress writes.
+
+    Maintained incrementally by study.counters; a missing row is rebuilt from
+    FlashcardProgress on demand, so deleting rows is always a safe invalidation.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='topic_counters')
+    topic = models.ForeignKey(Topic, on_delete=models.CASCADE, related_name='review_counters')
+    new_count = models.IntegerField(default=0, help_text='Cards with no SM-2 schedule yet')
+    learning_count = models.IntegerField(default=0, help_text='Scheduled cards still in the 1- and 6-day steps')
+    learned_count = models.IntegerField(default=0, help_text='Scheduled cards past the learning steps')
+    due_by_date = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='{"YYYY-MM-DD": number of scheduled cards due that day}',
+    )
+
+    class Meta:
+        unique_together = ['user', 'topic']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.topic.name}: {self.new_count} new"
+
+    def due_count(self, today=None):
+        """Number of cards due on or before today."""
+        cutoff = (today or datetime.date.today()).isoformat()
+        return sum(n for day, n in self.due_by_date.items() if day <= cutoff)
+
+
+class ReviewEvent(models.Model):
+    """One rating of one card, appended by study.review_log.
+
+    Rows are written in batches from a cache buffer and, once older than the
+    retention window, folded into ReviewDailyAggregate by the
+    rollup_review_events command.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_events')
+    flashcard = models.ForeignKey(Flashcard, on_delete=models.CASCADE, related_name='review_events')
+    step_index = models.SmallIntegerField(default=-1)
+    quality = models.PositiveSmallIntegerField()
+    reviewed_at = models.DateTimeField()
+    previous_interval = models.PositiveIntegerField(help_text='SM-2 interval (days) before this review')
+    new_interval = models.PositiveIntegerField(help_text='SM-2 interval (days) after this review')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'reviewed_at'], name='review_event_user_time_idx'),
+            models.Index(fields=['reviewed_at'], name='review_event_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - card {self.flashcard_id} q{self.quality}"
+
+
+class ReviewDailyAggregate(models.Model):
+    """Per-user, per-day summary of ReviewEvent rows that were rolled up."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_daily_aggregates')
+    date = models.DateField()
+    review_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0, help_text='Reviews rated 3 or higher')
+    lapse_count = models.PositiveIntegerField(
+        default=0, help_text='Failed reviews of cards that already had an interval',
+    )
+    quality_counts = models.JSONField(default=list, help_text='Reviews per quality rating, index 0-5')
+
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}: {self.review_count} reviews"
+
+
 class SpacedRepetitionSettings(models.Model):
     """Per-user settings for the SM-2 spaced repetition algorithm."""
 
@@ -474,6 +652,10 @@ class SpacedRepetitionSettings(models.Model):
         help_text="Maximum new (never reviewed) cards to introduce per review session (1–100).",
         validators=[MinValueValidator(1), MaxValueValidator(100)],
     )
+    load_balance = models.BooleanField(
+        default=False,
+        help_text="Move each review of a longer-interval card to the least busy day within ±5% of its interval.",
+    )
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -0,0 +1,85 @@
+"""Per-user profile bundle: the small per-user rows most views need.
+
+A bundle holds the user's StudyPreference, SpacedRepetitionSettings,
+StudyGoal and the IDs of the courses they are enrolled in. It is built with
+one query per model, cached per user for PROFILE_BUNDLE_CACHE_SECONDS and
+kept on the request, so a view reads it at most once from the cache and
+normally not at all from the database. The post_save/post_delete handlers in
+signals.py drop the cached copy whenever one of those rows changes. That only
+reaches every worker process when the cache is shared between them, which
+settings.py configures for production and checks.shared_cache_check enforces
+on deploy; otherwise a worker would keep serving a stale enrollment list.
+
+Reading a bundle never writes: a user without a StudyPreference gets an
+unsaved default one, and a missing SpacedRepetitionSettings or StudyGoal is
+None. Views that change these rows create them on POST.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CourseEnrollment, SpacedRepetitionSettings, StudyGoal, StudyPreference
+
+PROFILE_BUNDLE_CACHE_SECONDS = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'profile_bundle:{user_id}'
+
+
+class ProfileBundle:
+    """Read-only snapshot of one user's preference, SR settings, goal and enrollments."""
+
+    def __init__(self, user_id, preference, sr_settings, goal, enrolled_course_ids):
+        self.user_id = user_id
+        self.preference = preference
+        self.sr_settings = sr_settings
+        self.goal = goal
+        self.enrolled_course_ids = enrolled_course_ids
+
+    def is_enrolled(self, course_id):
+        return course_id in self.enrolled_course_ids
+
+
+def _build(user_id):
+    return ProfileBundle(
+        user_id=user_id,
+        preference=(
+            StudyPreference.objects.filter(user_id=user_id).first() or StudyPreference(user_id=user_id)
+        ),
+        sr_settings=SpacedRepetitionSettings.objects.filter(user_id=user_id).first(),
+        goal=StudyGoal.objects.filter(user_id=user_id).first(),
+        enrolled_course_ids=frozenset(
+            CourseEnrollment.objects.filter(user_id=user_id).values_list('course_id', flat=True)
+        ),
+    )
+
+
+def load_profile_bundle(user_id):
+    """Return the user's bundle from the cache, building and caching it on a miss."""
+    key = _cache_key(user_id)
+    bundle = cache.get(key)
+    if bundle is None:
+        bundle = _build(user_id)
+        cache.set(key, bundle, PROFILE_BUNDLE_CACHE_SECONDS)
+    return bundle
+
+
+def get_profile_bundle(request):
+    """The bundle of request.user, loaded once per request."""
+    bundle = getattr(request, '_profile_bundle', None)
+    if bundle is None or bundle.user_id != request.user.id:
+        bundle = request._profile_bundle = load_profile_bundle(request.user.id)
+    return bundle
+
+
+def invalidate_profile_bundle(user_id):
+    """
+    Drop the cached bundle of a user.
+
+    The entry is deleted straight away and again once the surrounding
+    transaction commits, so another request that rebuilt it from the old
+    rows in between cannot leave a stale copy behind.
+    """
+    key = _cache_key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
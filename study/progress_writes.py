@@ -0,0 +1,249 @@
+"""Single-statement progress writes.
+
+record_review() applies one rating to a FlashcardProgress row with a single
+INSERT ... ON CONFLICT (user_id, flashcard_id, step_index) DO UPDATE ...
+RETURNING statement. The review counters and the SM-2 fields are computed
+in SQL from the row the statement has locked, so concurrent ratings of the
+same card cannot lose updates, and the new state comes back in the same
+round trip. The statement also copies the old SM-2 state into the previous_*
+columns, which gives callers the state transition without a prior read.
+
+The SQL mirrors views._apply_sm2, including round-half-to-even for the
+interval. It is written for the two supported backends: SQLite >= 3.35
+(needed for RETURNING) and PostgreSQL. The statement is assembled from the
+fixed dialect templates below and column names; every value, including the
+SM-2 constants, is passed as a query parameter.
+
+It is also the write side of the per-step counter layout: see
+study.step_progress for the compact layout versus one row per step.
+"""
+import datetime
+import re
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .forecast import least_loaded_interval, record_due_change
+from .models import FlashcardProgress
+from .step_progress import bump_step, compact_enabled, pack_steps, unpack_steps
+
+RETURNED_FIELDS = [
+    'id', 'times_reviewed', 'times_correct', 'confidence_level',
+    'easiness_factor', 'interval_days', 'sm2_repetitions', 'next_review_date',
+    'previous_interval_days', 'previous_repetitions', 'previous_review_date',
+]
+
+_SQLITE = {
+    'greatest': 'MAX({0}, {1})',
+    'least': 'MIN({0}, {1})',
+    'round4': 'ROUND({0}, 4)',
+    # CAST truncates and ROUND rounds half away from zero; Python rounds half to even.
+    'rint': 'CAST(CASE WHEN ({0}) - CAST(({0}) AS INTEGER) = 0.5 '
+            'THEN 2 * ROUND(({0}) / 2.0) ELSE ROUND({0}) END AS INTEGER)',
+    'add_days': "DATE({0}, '+' || ({1}) || ' days')",
+}
+_POSTGRESQL = {
+    'greatest': 'GREATEST({0}, {1})',
+    'least': 'LEAST({0}, {1})',
+    'round4': 'CAST(ROUND(CAST({0} AS NUMERIC), 4) AS DOUBLE PRECISION)',
+    # float8 -> integer casts use rint(), i.e. round half to even.
+    'rint': 'CAST({0} AS INTEGER)',
+    'add_days': 'CAST({0} AS DATE) + ({1})',
+}
+
+
+def _sql(template, *args):
+    """
+    Fill a dialect template with (sql, params) arguments.
+
+    A template may use an argument more than once (see 'rint'), so the
+    params are repeated in the order the placeholders appear.
+    """
+    order = [int(n) for n in re.findall(r'\{(\d)\}', template)]
+    return template.format(*(sql for sql, _ in args)), [p for n in order for p in args[n][1]]
+
+
+def _dialect():
+    if connection.vendor == 'postgresql':
+        return _POSTGRESQL
+    if connection.vendor == 'sqlite':
+        return _SQLITE
+    raise NotImplementedError(f'record_review does not support the {connection.vendor} backend')
+
+
+def _sm2_constants(quality, settings):
+    min_ef = float(settings.get_min_easiness()) if settings else 1.3
+    max_interval = int(settings.max_interval_days) if settings else 365
+    # Same expression as _apply_sm2 so the float arithmetic matches it bit for bit.
+    penalty = float((5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return min_ef, max_interval, penalty
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def _upsert(user_id, flashcard_id, step_index, quality, settings, review_day, now,
+            count_review, schedule, step_state=None):
+    """Run the upsert for one row and return it as an unsaved-looking FlashcardProgress."""
+    sql_fn = _dialect()
+    table = connection.ops.quote_name(FlashcardProgress._meta.db_table)
+    passed = quality >= 3
+    min_ef, max_interval, penalty = _sm2_constants(quality, settings)
+
+    # Values for a row that does not exist yet: the result of rating a fresh card.
+    insert = {
+        'times_reviewed': 1 if count_review else 0,
+        'times_correct': 1 if count_review and passed else 0,
+        'confidence_level': 1 if count_review and passed else 0,
+        'easiness_factor': 2.5,
+        'interval_days': 0,
+        'sm2_repetitions': 0,
+        'next_review_date': None,
+        'previous_interval_days': 0,
+        'previous_repetitions': 0,
+        'previous_review_date': None,
+    }
+    if schedule:
+        insert.update({
+            'easiness_factor': round(max(min_ef, 2.5 + 0.1 - penalty), 4),
+            'interval_days': 1,
+            'sm2_repetitions': 1 if passed else 0,
+            'next_review_date': connection.ops.adapt_datefield_value(review_day + datetime.timedelta(days=1)),
+        })
+
+    if step_state is not None:
+        insert['step_state'] = step_state
+
+    now = connection.ops.adapt_datetimefield_value(now)
+    day = connection.ops.adapt_datefield_value(review_day)
+    updates = [('last_reviewed', '%s', [now])]
+    if count_review:
+        confidence = (
+            _sql(sql_fn['least'], ('t.confidence_level + 1', []), ('%s', [5])) if passed
+            else _sql(sql_fn['greatest'], ('t.confidence_level - 1', []), ('%s', [0]))
+        )
+        updates += [
+            ('times_reviewed', 't.times_reviewed + 1', []),
+            ('times_correct', 't.times_correct + 1' if passed else 't.times_correct', []),
+            ('confidence_level', *confidence),
+        ]
+    if schedule:
+        new_ef = _sql(sql_fn['greatest'], ('%s', [min_ef]), ('(t.easiness_factor + 0.1) - %s', [penalty]))
+        if passed:
+            grown = _sql(sql_fn['rint'], _sql('t.interval_days * {0}', new_ef))
+            interval = _sql(
+                sql_fn['least'],
+                _sql('CASE t.sm2_repetitions WHEN 0 THEN 1 WHEN 1 THEN 6 ELSE {0} END', grown),
+                ('%s', [max_interval]),
+            )
+            repetitions = 't.sm2_repetitions + 1'
+        else:
+            interval, repetitions = ('1', []), '0'
+        updates += [
+            ('easiness_factor', *_sql(sql_fn['round4'], new_ef)),
+            ('interval_days', *interval),
+            ('sm2_repetitions', repetitions, []),
+            ('next_review_date', *_sql(sql_fn['add_days'], ('%s', [day]), interval)),
+            ('previous_interval_days', 't.interval_days', []),
+            ('previous_repetitions', 't.sm2_repetitions', []),
+            ('previous_review_date', 't.next_review_date', []),
+        ]
+    if step_state is not None:
+        updates.append(('step_state', '%s', [step_state]))
+
+    columns = ['user_id', 'flashcard_id', 'step_index', 'last_reviewed'] + list(insert)
+    params = [user_id, flashcard_id, step_index, now] + list(insert.values())
+    set_clause = []
+    for column, expression, expression_params in updates:
+        set_clause.append(f'{column} = {expression}')
+        params += expression_params
+
+    # Only the quoted table name, column names and dialect templates are interpolated;
+    # every value is in params.
+    sql = (
+        f'INSERT INTO {table} AS t ({", ".join(columns)}) '  # nosec B608
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT (user_id, flashcard_id, step_index) DO UPDATE SET {", ".join(set_clause)} '
+        f'RETURNING {", ".join(RETURNED_FIELDS)}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = dict(zip(RETURNED_FIELDS, cursor.fetchone()))
+    row['next_review_date'] = _as_date(row['next_review_date'])
+    row['previous_review_date'] = _as_date(row['previous_review_date'])
+    return FlashcardProgress(user_id=user_id, flashcard_id=flashcard_id, step_index=step_index, **row)
+
+
+def previous_state(progress):
+    """The SM-2 fields of `progress` before its last rating, as a FlashcardProgress for card_state()."""
+    return FlashcardProgress(
+        interval_days=progress.previous_interval_days,
+        sm2_repetitions=progress.previous_repetitions,
+        next_review_date=progress.previous_review_date,
+    )
+
+
+def record_review(user_id, flashcard_id, quality, settings=None, step_index=-1, review_day=None):
+    """
+    Apply one rating and return the resulting progress rows.
+
+    A whole-card rating is one statement. SM-2 always lives on the
+    whole-card row. With the compact step layout, a step rating locks that
+    row, counts the step in its packed step_state, and applies the rating in
+    the upsert: two statements and one row per card. With one row per step,
+    the step's row counts the review and a second upsert schedules the
+    whole-card row. When settings.load_balance is on and the new interval
+    qualifies, a follow-up UPDATE moves the due date (see
+    forecast.least_loaded_interval). The card's move is recorded in the
+    cached forecast histogram.
+
+    Args:
+        user_id, flashcard_id: The card being rated
+        quality: SM-2 quality 0-5
+        settings: The user's SpacedRepetitionSettings, or None for the defaults
+        step_index: -1 for the whole card, else the step of a step_by_step card
+        review_day: Day the review happened on (defaults to today)
+
+    Returns:
+        Tuple of (rated, sr_row). sr_row is the whole-card FlashcardProgress
+        holding the schedule. rated carries the times_reviewed, times_correct
+        and confidence_level of what was rated: sr_row itself for step_index
+        -1, otherwise the step's row or, in the compact layout, its StepCounts.
+    """
+    review_day = review_day or datetime.date.today()
+    now = timezone.now()
+    if step_index == -1:
+        sr_row = rated_row = _upsert(user_id, flashcard_id, -1, quality, settings, review_day, now,
+                                     count_review=True, schedule=True)
+    elif compact_enabled():
+        with transaction.atomic():
+            packed = (
+                FlashcardProgress.objects.select_for_update()
+                .filter(user_id=user_id, flashcard_id=flashcard_id, step_index=-1)
+                .values_list('step_state', flat=True)
+                .first()
+            )
+            steps = bump_step(unpack_steps(packed), step_index, quality)
+            sr_row = _upsert(user_id, flashcard_id, -1, quality, settings, review_day, now,
+                             count_review=True, schedule=True, step_state=pack_steps(steps))
+        sr_row.step_state = pack_steps(steps)
+        rated_row = steps[step_index]
+    else:
+        rated_row = _upsert(user_id, flashcard_id, step_index, quality, settings, review_day, now,
+                            count_review=True, schedule=False)
+        sr_row = _upsert(user_id, flashcard_id, -1, quality, settings, review_day, now,
+                         count_review=False, schedule=True)
+
+    if getattr(settings, 'load_balance', False) and quality >= 3:
+        balanced = least_loaded_interval(user_id, sr_row.interval_days, settings.max_interval_days, review_day)
+        if balanced != sr_row.interval_days:
+            sr_row.interval_days = balanced
+            sr_row.next_review_date = review_day + datetime.timedelta(days=balanced)
+            FlashcardProgress.objects.filter(pk=sr_row.pk).update(
+                interval_days=sr_row.interval_days, next_review_date=sr_row.next_review_date,
+            )
+    record_due_change(user_id, sr_row.previous_review_date, sr_row.next_review_date)
+    return rated_row, sr_row
@@ -0,0 +1,227 @@
+"""Write-behind buffer for ReviewEvent rows.
+
+Rating a card appends the event to the default cache instead of inserting
+it. Each event gets its own slot key, numbered by an atomic cache counter,
+so concurrent workers never overwrite each other's events. Once the number
+of buffered events reaches REVIEW_EVENT_FLUSH_SIZE, or the oldest one has
+waited REVIEW_EVENT_FLUSH_SECONDS, the next writer flushes the whole buffer
+with one bulk_create. Most requests therefore do no insert at all.
+
+The buffer needs Redis (REDIS_URL, see CACHES in settings.py): it must be
+shared with the flush_review_events command's process, and its counter
+must be atomic and cheap. On the database cache each cache call is itself
+a query, so buffering would cost more than the insert it saves. With any
+other backend the events are inserted with one bulk_create when the
+rating's transaction commits.
+
+The log is analytics data, so losing events when the cache is cleared or
+evicts a slot is acceptable. The flush_review_events command drains the
+buffer on demand, e.g. from cron or before a deploy.
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .checks import cache_backend
+from .models import Flashcard, ReviewDailyAggregate, ReviewEvent
+
+SEQ_KEY = 'review_events:seq'
+FLUSHED_KEY = 'review_events:flushed'
+OLDEST_KEY = 'review_events:oldest'
+GAP_KEY = 'review_events:gap'
+LOCK_KEY = 'review_events:flush_lock'
+LOCK_TIMEOUT = 60
+
+# Slots outlive any sensible flush interval but still expire if nothing flushes.
+SLOT_TIMEOUT = 24 * 60 * 60
+FLUSH_READ_CHUNK = 500
+
+# Backends with an atomic incr that does not hit the database.
+BUFFER_BACKENDS = {'django.core.cache.backends.redis.RedisCache'}
+
+EVENT_FIELDS = ('user_id', 'flashcard_id', 'step_index', 'quality',
+                'reviewed_at', 'previous_interval', 'new_interval')
+
+
+def _slot_key(n):
+    return f'review_events:slot:{n}'
+
+
+def flush_size():
+    return getattr(settings, 'REVIEW_EVENT_FLUSH_SIZE', 100)
+
+
+def flush_seconds():
+    return getattr(settings, 'REVIEW_EVENT_FLUSH_SECONDS', 60)
+
+
+def buffering_enabled():
+    """Whether events are buffered: only when the default cache is Redis (see BUFFER_BACKENDS)."""
+    return cache_backend() in BUFFER_BACKENDS
+
+
+def pending_count():
+    """Number of events appended but not yet flushed."""
+    return cache.get(SEQ_KEY, 0) - cache.get(FLUSHED_KEY, 0)
+
+
+def log_reviews(events):
+    """
+    Buffer review events and flush if a threshold has been reached.
+
+    Args:
+        events: Iterable of dicts with the keys in EVENT_FIELDS; reviewed_at
+            defaults to now
+
+    Returns:
+        Number of events written to the database: by a triggered flush
+        (usually 0), or all of them (on commit) when buffering is off
+    """
+    now = timezone.now()
+    rows = [
+        tuple(dict(event, reviewed_at=event.get('reviewed_at') or now)[field] for field in EVENT_FIELDS)
+        for event in events
+    ]
+    if not rows:
+        return 0
+    if not buffering_enabled():
+        events = [ReviewEvent(**dict(zip(EVENT_FIELDS, row))) for row in rows]
+        transaction.on_commit(lambda: ReviewEvent.objects.bulk_create(events))
+        return len(rows)
+
+    # If the counter was evicted, restart numbering after the last flushed slot.
+    cache.add(SEQ_KEY, cache.get(FLUSHED_KEY, 0), timeout=None)
+    head = cache.incr(SEQ_KEY, len(rows))
+    first = head - len(rows) + 1
+    cache.set_many({_slot_key(first + i): row for i, row in enumerate(rows)}, timeout=SLOT_TIMEOUT)
+    cache.add(OLDEST_KEY, time.time(), timeout=None)
+
+    if pending_count() >= flush_size() or time.time() - cache.get(OLDEST_KEY, time.time()) >= flush_seconds():
+        return flush_review_events()
+    return 0
+
+
+def log_review(**event):
+    """Buffer a single review event; see log_reviews()."""
+    return log_reviews([event])
+
+
+def flush_review_events():
+    """
+    Write every buffered event to ReviewEvent with bulk_create.
+
+    Only one worker flushes at a time; others return immediately. A slot
+    that is missing may belong to a writer that has reserved its number
+    but not stored the event yet, so the flush stops there. If the same
+    slot is still missing on the next flush it is treated as evicted and
+    skipped.
+
+    Returns:
+        Number of events written
+    """
+    if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        return 0
+    try:
+        head = cache.get(SEQ_KEY, 0)
+        flushed = cache.get(FLUSHED_KEY, 0)
+        written = 0
+        while flushed < head:
+            numbers = range(flushed + 1, min(head, flushed + FLUSH_READ_CHUNK) + 1)
+            slots = cache.get_many([_slot_key(n) for n in numbers])
+            batch = []
+            stopped = False
+            for n in numbers:
+                row = slots.get(_slot_key(n))
+                if row is None:
+                    if cache.get(GAP_KEY) != n:
+                        cache.set(GAP_KEY, n, timeout=None)
+                        stopped = True
+                        break
+                else:
+                    batch.append(ReviewEvent(**dict(zip(EVENT_FIELDS, row))))
+                flushed = n
+            # Cards or users deleted while their events sat in the buffer would violate the FKs.
+            live_cards = set(
+                Flashcard.objects.filter(id__in={e.flashcard_id for e in batch}).values_list('id', flat=True)
+            )
+            live_users = set(
+                User.objects.filter(id__in={e.user_id for e in batch}).values_list('id', flat=True)
+            )
+            batch = [e for e in batch if e.flashcard_id in live_cards and e.user_id in live_users]
+            ReviewEvent.objects.bulk_create(batch)
+            written += len(batch)
+            cache.set(FLUSHED_KEY, flushed, timeout=None)
+            cache.delete_many([_slot_key(n) for n in numbers if n <= flushed])
+            if stopped:
+                break
+        if flushed >= head:
+            cache.delete(OLDEST_KEY)
+        return written
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def rollup_review_events(before):
+    """
+    Fold ReviewEvent rows older than `before` into ReviewDailyAggregate.
+
+    Works one day at a time: each day's events are grouped per user, added
+    to any existing aggregate for that user and day, and deleted in the same
+    transaction, so an interrupted run can simply be restarted.
+
+    Args:
+        before: Aware datetime; events reviewed before it are rolled up
+
+    Returns:
+        Number of events rolled up
+    """
+    flush_review_events()
+    old_events = ReviewEvent.objects.filter(reviewed_at__lt=before)
+    rolled = 0
+    while True:
+        oldest = old_events.order_by('reviewed_at').values_list('reviewed_at', flat=True).first()
+        if oldest is None:
+            return rolled
+        day = timezone.localdate(oldest)
+        day_start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+        day_events = old_events.filter(
+            reviewed_at__gte=day_start,
+            reviewed_at__lt=min(before, day_start + datetime.timedelta(days=1)),
+        )
+        with transaction.atomic():
+            totals = list(
+                day_events.values('user_id').annotate(
+                    reviews=Count('id'),
+                    correct=Count('id', filter=Q(quality__gte=3)),
+                    lapses=Count('id', filter=Q(quality__lt=3, previous_interval__gt=0)),
+                    **{f'q{q}': Count('id', filter=Q(quality=q)) for q in range(6)},
+                )
+            )
+            existing = {
+                agg.user_id: agg
+                for agg in ReviewDailyAggregate.objects.select_for_update().filter(
+                    date=day, user_id__in=[row['user_id'] for row in totals],
+                )
+            }
+            created = []
+            for row in totals:
+                agg = existing.get(row['user_id'])
+                if agg is None:
+                    agg = ReviewDailyAggregate(user_id=row['user_id'], date=day, quality_counts=[0] * 6)
+                    created.append(agg)
+                agg.review_count += row['reviews']
+                agg.correct_count += row['correct']
+                agg.lapse_count += row['lapses']
+                agg.quality_counts = [n + row[f'q{q}'] for q, n in enumerate(agg.quality_counts)]
+            ReviewDailyAggregate.objects.bulk_create(created)
+            ReviewDailyAggregate.objects.bulk_update(
+                existing.values(), ['review_count', 'correct_count', 'lapse_count', 'quality_counts'],
+            )
+            deleted, _ = day_events.delete()
+        rolled += deleted
@@ -0,0 +1,99 @@
+"""Cross-course "Today" review queue.
+
+Every whole-card progress row that is due (next_review_date <= today) in any
+course the user is enrolled in, most overdue first. Priority is the overdue
+ratio, days overdue / interval_days, so a 1-day card that is 3 days late comes
+before a 60-day card that is 10 days late. Ordering is done in SQL and cards
+are served in fixed-size chunks with a keyset cursor, so a large backlog is
+never loaded at once and rows rescheduled between chunks do not shift later
+pages.
+"""
+import datetime
+
+from django.db.models import F, FloatField, Func, IntegerField, Q, Value
+from django.db.models.functions import Cast, Greatest
+
+from .models import CourseEnrollment, FlashcardProgress
+
+TODAY_QUEUE_CHUNK_SIZE = 20
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+class DayNumber(Func):
+    """Whole days between 1970-01-01 and a date column."""
+    output_field = IntegerField()
+    template = "(%(expressions)s - DATE '1970-01-01')"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)',
+            **extra_context,
+        )
+
+
+def due_progress(user, today=None):
+    """Whole-card progress rows due by `today` across the user's enrolled courses."""
+    today = today or datetime.date.today()
+    return FlashcardProgress.objects.filter(
+        user=user,
+        step_index=-1,
+        next_review_date__lte=today,
+        flashcard__topic__course_id__in=CourseEnrollment.objects.filter(user=user).values('course_id'),
+    )
+
+
+def encode_cursor(progress):
+    """Cursor pointing just past `progress` (a row returned by today_queue_chunk)."""
+    return f'{progress.overdue_days}-{progress.safe_interval}-{progress.pk}'
+
+
+def decode_cursor(cursor):
+    """Parse a cursor from encode_cursor(); raises ValueError if malformed."""
+    overdue_days, interval, pk = (int(part) for part in cursor.split('-'))
+    if overdue_days < 0 or interval < 1 or pk < 1:
+        raise ValueError('invalid cursor')
+    return overdue_days, interval, pk
+
+
+def today_queue_chunk(user, cursor=None, limit=TODAY_QUEUE_CHUNK_SIZE, today=None):
+    """
+    Return the next chunk of the user's Today queue.
+
+    Rows are annotated with overdue_days, safe_interval (interval_days, at
+    least 1) and overdue_ratio, ordered by ratio descending then pk. The
+    cursor comparison cross-multiplies the integer parts instead of comparing
+    floats, so ties are resolved exactly.
+
+    Args:
+        user: The student
+        cursor: None for the first chunk, else the value returned with the previous one
+        limit: Chunk size
+        today: Override for the current date (tests)
+
+    Returns:
+        Tuple of (list of FlashcardProgress with flashcard selected, next cursor or None)
+    """
+    today = today or datetime.date.today()
+    qs = (
+        due_progress(user, today)
+        .select_related('flashcard')
+        .annotate(
+            overdue_days=Value((today - EPOCH).days) - DayNumber('next_review_date'),
+            safe_interval=Greatest('interval_days', Value(1)),
+        )
+        .annotate(overdue_ratio=Cast('overdue_days', FloatField()) / F('safe_interval'))
+    )
+    if cursor is not None:
+        last_overdue, last_interval, last_pk = decode_cursor(cursor)
+        # ratio < last ratio  <=>  overdue * last_interval < last_overdue * interval
+        qs = qs.annotate(
+            behind=F('overdue_days') * last_interval - F('safe_interval') * last_overdue,
+        ).filter(Q(behind__lt=0) | Q(behind=0, pk__gt=last_pk))
+
+    rows = list(qs.order_by('-overdue_ratio', 'pk')[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
@@ -0,0 +1,56 @@
+"""Packed card queues of study sessions.
+
+A StudySession keeps the ordered list of entries its page works through in
+`queue`: one fixed-width (flashcard id, step index) record per entry, packed
+back to back, with step index -1 for a whole card. `queue_cursor` is the
+position of the first entry the student has not rated yet, so re-opening an
+unfinished session resumes there instead of reshuffling the topic.
+
+A card rated below 3 is studied again RELEARN_GAP entries later. The page
+splices the copy into its own list and reports the rating's position with
+the buffered review, and apply_ratings inserts the same copy here, so the
+stored queue stays in step with what the page shows.
+"""
+import struct
+from typing import Iterable, List, Optional, Tuple
+
+# flashcard id (uint32) and step index (int16, -1 = whole card) per entry.
+QUEUE_ENTRY = struct.Struct('<Ih')
+
+RELEARN_GAP = 3  # A forgotten card comes back this many entries later
+IDLE_HOURS = 12  # A session with no rating for this long is no longer resumed
+
+Entry = Tuple[int, int]
+
+
+def unpack_queue(data: Optional[bytes]) -> List[Entry]:
+    """Decode a queue value (None or empty means an empty queue)."""
+    if not data:
+        return []
+    return list(QUEUE_ENTRY.iter_unpack(bytes(data)))
+
+
+def pack_queue(entries: Iterable[Entry]) -> bytes:
+    return b''.join(QUEUE_ENTRY.pack(*entry) for entry in entries)
+
+
+def apply_ratings(entries: List[Entry], cursor: int, ratings: Iterable[Tuple[int, int]]) -> Tuple[List[Entry], int]:
+    """
+    Replay a session's ratings against its queue.
+
+    Args:
+        entries: the session's unpacked queue
+        cursor: the session's queue_cursor
+        ratings: (position, quality) pairs in the order the page rated them
+
+    Returns:
+        The new (entries, cursor). Positions outside the queue are ignored.
+    """
+    entries = list(entries)
+    for position, quality in ratings:
+        if not 0 <= position < len(entries):
+            continue
+        cursor = max(cursor, position + 1)
+        if quality < 3:
+            entries.insert(min(position + RELEARN_GAP, len(entries)), entries[position])
+    return entries, cursor
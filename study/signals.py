@@ -0,0 +1,116 @@
+"""Signal handlers for the study app"""
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .card_payloads import invalidate_payload
+from .counters import remove_card
+from .models import (SYSTEM_USERNAME, Course, CourseEnrollment, Flashcard, ParameterizedVariant,
+                     SpacedRepetitionSettings, StudyGoal, StudyPreference, TopicReviewCounter, get_system_user_id,
+                     reset_system_user_id)
+from .profile_bundle import invalidate_profile_bundle
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_system_user_id(sender, instance, **kwargs):
+    """The memoized system user id (or its absence) is stale once that user is created or deleted."""
+    if instance.username == SYSTEM_USERNAME:
+        reset_system_user_id()
+
+
+@receiver(pre_save, sender=Course)
+def mark_public_course(sender, instance, raw=False, **kwargs):
+    """Courses owned by the system user are the public catalog."""
+    if not raw:
+        instance.is_public = instance.created_by_id is not None and instance.created_by_id == get_system_user_id()
+
+
+# Fields a card's pre-generated variants are rendered from.
+VARIANT_SOURCE_FIELDS = ('parameter_spec', 'question_template', 'answer_template')
+
+
+@receiver(pre_save, sender=Flashcard)
+def remember_previous_state(sender, instance, **kwargs):
+    """Cards loaded from the database carry their stored values; only hand-built ones need a query."""
+    if instance.pk and not kwargs.get('raw') and not hasattr(instance, '_stored_values'):
+        stored = Flashcard.objects.filter(pk=instance.pk).values(*Flashcard.TRACKED_FIELDS).first()
+        instance._stored_values = stored or {}
+
+
+def _changed(instance, fields):
+    """Whether any of `fields` differs from the stored value (fields never loaded were not changed)."""
+    stored = getattr(instance, '_stored_values', {})
+    return any(
+        field in instance.__dict__ and (field not in stored or stored[field] != instance.__dict__[field])
+        for field in fields
+    )
+
+
+@receiver(post_save, sender=Flashcard)
+def count_new_card(sender, instance, created, raw=False, **kwargs):
+    """A new card is 'new' for everyone already counting its topic."""
+    if raw:
+        return
+    if created:
+        TopicReviewCounter.objects.filter(topic_id=instance.topic_id).update(new_count=F('new_count') + 1)
+        return
+    if _changed(instance, ['topic_id']):
+        # Moving a card between topics is rare; drop both topics' rows and
+        # let them rebuild on next read.
+        previous = getattr(instance, '_stored_values', {}).get('topic_id')
+        TopicReviewCounter.objects.filter(topic_id__in=[previous, instance.topic_id]).delete()
+
+
+@receiver(pre_delete, sender=Flashcard)
+def uncount_deleted_card(sender, instance, origin=None, **kwargs):
+    """
+    Take a deleted card out of the counters.
+
+    Deleting one card updates its topic's rows in place. A bulk or cascading
+    delete (a queryset, a topic, a course) drops the rows of each affected
+    topic once instead, and they rebuild on next read.
+    """
+    if origin is None or origin is instance:
+        remove_card(instance)
+        return
+    dropped = origin.__dict__.setdefault('_uncounted_topic_ids', set())
+    if instance.topic_id not in dropped:
+        dropped.add(instance.topic_id)
+        TopicReviewCounter.objects.filter(topic_id=instance.topic_id).delete()
+
+
+@receiver(post_save, sender=Flashcard)
+@receiver(post_delete, sender=Flashcard)
+def drop_card_payload(sender, instance, **kwargs):
+    """The study page's cached payload of an edited or deleted card is stale."""
+    invalidate_payload(instance.id)
+
+
+@receiver(post_save, sender=Flashcard)
+def drop_card_variants(sender, instance, created, raw=False, **kwargs):
+    """Pre-generated variants of a card whose spec or templates changed are stale."""
+    if created or raw:
+        return
+    if _changed(instance, VARIANT_SOURCE_FIELDS):
+        ParameterizedVariant.objects.filter(flashcard_id=instance.id).delete()
+
+
+@receiver(post_save, sender=Flashcard)
+def remember_saved_state(sender, instance, **kwargs):
+    """What was just saved is what the next save compares against (registered after the handlers above)."""
+    instance.remember_stored_values()
+
+
+@receiver(post_save, sender=StudyPreference)
+@receiver(post_save, sender=SpacedRepetitionSettings)
+@receiver(post_save, sender=StudyGoal)
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=StudyPreference)
+@receiver(post_delete, sender=SpacedRepetitionSettings)
+@receiver(post_delete, sender=StudyGoal)
+@receiver(post_delete, sender=CourseEnrollment)
+def drop_profile_bundle(sender, instance, **kwargs):
+    """Any change to a row in the profile bundle invalidates the user's cached copy."""
+    invalidate_profile_bundle(instance.user_id)
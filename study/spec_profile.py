@@ -0,0 +1,114 @@
+"""Save-time profiling of parameter specs.
+
+A parameterized card whose constraints rarely hold costs up to
+ParameterGenerator.max_retries attempts every time it is generated, and
+shows its raw template when they all fail. profile_spec measures this up
+front: it runs sample_count() single attempts (draw values, compute, check
+constraints) back to back, the way generate() retries, and reports the share
+accepted, the share that raised, and the p50/p99 time of a whole generation
+(the attempts up to and including an accepted one), along with the possible
+division by zero and domain errors that analyze_spec finds statically.
+spec_problems turns a profile into rejections and warnings using the
+PARAMETER_SPEC_* settings.
+
+FlashcardForm profiles a spec on save and stores the report on the card's
+parameter_profile; the profile_parameter_specs command reports on (and
+refreshes) every parameterized card.
+"""
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .utils import ParameterGenerator, compile_spec
+
+
+class SpecProfile(NamedTuple):
+    samples: int
+    acceptance_rate: float
+    error_rate: float
+    p50_ms: Optional[float]  # None when no attempt was accepted
+    p99_ms: Optional[float]
+    # Possible division by zero or domain errors found by static analysis
+    warnings: Tuple[str, ...] = ()
+
+    def as_dict(self) -> Dict[str, Any]:
+        """JSON form stored on Flashcard.parameter_profile."""
+        return {**self._asdict(), 'profiled_at': timezone.now().isoformat()}
+
+
+def sample_count() -> int:
+    return getattr(settings, 'PARAMETER_SPEC_SAMPLES', 2000)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def profile_spec(parameter_spec: Dict[str, Any], samples: Optional[int] = None) -> SpecProfile:
+    """
+    Profile `samples` (default sample_count()) generation attempts of a spec.
+
+    Raises:
+        ValueError: If the spec does not compile (see compile_spec)
+    """
+    samples = sample_count() if samples is None else samples
+    plan = compile_spec(parameter_spec)
+    generator = ParameterGenerator(parameter_spec)
+    accepted = errors = attempts = 0
+    elapsed = 0.0
+    generation_times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        try:
+            ok = generator.attempt() is not None
+        except Exception:
+            ok = False
+            errors += 1
+        elapsed += time.perf_counter() - start
+        attempts += 1
+        if ok:
+            accepted += 1
+            generation_times.append(elapsed * 1000)
+        if ok or attempts == generator.max_retries:
+            attempts = 0
+            elapsed = 0.0
+
+    generation_times.sort()
+    return SpecProfile(
+        samples=samples,
+        acceptance_rate=accepted / samples if samples else 0.0,
+        error_rate=errors / samples if samples else 0.0,
+        p50_ms=round(_percentile(generation_times, 0.5), 3) if generation_times else None,
+        p99_ms=round(_percentile(generation_times, 0.99), 3) if generation_times else None,
+        warnings=plan.warnings,
+    )
+
+
+def spec_problems(profile: SpecProfile) -> Tuple[List[str], List[str]]:
+    """
+    Check a profile against the PARAMETER_SPEC_* thresholds.
+
+    Returns:
+        (rejections, warnings): messages for a spec that should not be
+        saved, and for one that works but is slow or fragile
+    """
+    min_acceptance = getattr(settings, 'PARAMETER_SPEC_MIN_ACCEPTANCE', 0.02)
+    warn_acceptance = getattr(settings, 'PARAMETER_SPEC_WARN_ACCEPTANCE', 0.2)
+    max_errors = getattr(settings, 'PARAMETER_SPEC_MAX_ERROR_RATE', 0.5)
+    warn_errors = getattr(settings, 'PARAMETER_SPEC_WARN_ERROR_RATE', 0.01)
+
+    rejections, warnings = [], []
+    acceptance = f'Only {profile.acceptance_rate:.1%} of {profile.samples} sampled values satisfy the constraints'
+    if profile.acceptance_rate < min_acceptance:
+        rejections.append(f'{acceptance} (minimum {min_acceptance:.1%}); widen the ranges or relax the constraints.')
+    elif profile.acceptance_rate < warn_acceptance:
+        warnings.append(f'{acceptance}; generating this card needs many retries.')
+    errors = f'{profile.error_rate:.1%} of sampled values raise an error in a formula or constraint'
+    if profile.error_rate > max_errors:
+        rejections.append(f'{errors} (maximum {max_errors:.1%}).')
+    elif profile.error_rate > warn_errors:
+        warnings.append(f'{errors}, e.g. a division by zero or math domain error.')
+    warnings.extend(f'Possible error in {warning}.' for warning in profile.warnings)
+    return rejections, warnings
@@ -0,0 +1,57 @@
+"""Packed per-step counters for step_by_step cards.
+
+With the optional compact layout (settings.COMPACT_STEP_PROGRESS, off by
+default) a step rating no longer gets its own FlashcardProgress row. Its counters live
+in the whole-card row (step_index=-1), in `step_state`: one fixed-width
+record per step, packed back to back. The whole-card row's own
+times_reviewed, times_correct and confidence_level also count step ratings,
+so per-user totals add up the same as with one row per step.
+
+Migrations never convert stored rows. After changing the setting, run the
+convert_step_progress command so stored rows match the layout in use.
+
+This module only packs and unpacks the bytes and carries no model imports,
+so the conversion helpers in migration_helpers can use it too. progress_writes.record_review does the
+writes.
+"""
+import struct
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+
+# times_reviewed, times_correct (uint32) and confidence_level (uint8) per step.
+STEP_RECORD = struct.Struct('<IIB')
+
+
+class StepCounts(NamedTuple):
+    times_reviewed: int = 0
+    times_correct: int = 0
+    confidence_level: int = 0
+
+
+def compact_enabled() -> bool:
+    return getattr(settings, 'COMPACT_STEP_PROGRESS', False)
+
+
+def unpack_steps(data: Optional[bytes]) -> List[StepCounts]:
+    """Decode a step_state value (None or empty means no step has been rated)."""
+    if not data:
+        return []
+    return [StepCounts(*record) for record in STEP_RECORD.iter_unpack(bytes(data))]
+
+
+def pack_steps(steps: List[StepCounts]) -> bytes:
+    return b''.join(STEP_RECORD.pack(*step) for step in steps)
+
+
+def bump_step(steps: List[StepCounts], step_index: int, quality: int) -> List[StepCounts]:
+    """Return a copy of `steps` with one rating of `step_index` counted, growing the list if needed."""
+    steps = list(steps) + [StepCounts()] * max(0, step_index + 1 - len(steps))
+    step = steps[step_index]
+    if quality >= 3:
+        steps[step_index] = StepCounts(step.times_reviewed + 1, step.times_correct + 1,
+                                       min(5, step.confidence_level + 1))
+    else:
+        steps[step_index] = StepCounts(step.times_reviewed + 1, step.times_correct,
+                                       max(0, step.confidence_level - 1))
+    return steps
@@ -0,0 +1,84 @@
+"""Tests for graph rendering in worker processes"""
+import tempfile
+import threading
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from .models import Course, Topic, Flashcard
+from .utils import GraphPool
+from .utils.graph_generator import TimeoutException
+
+PLOT_CODE = 'x = np.linspace(0, 10, 50)\nplt.plot(x, x * {a})'
+
+
+class GraphPoolTest(TestCase):
+    """Graph rendering in worker processes (study/utils/graph_pool.py)."""
+
+    def setUp(self):
+        self.pool = GraphPool(size=1, max_jobs=3, timeout=1, memory_mb=256, cpu_seconds=3)
+        self.addCleanup(self.pool.close)
+
+    def test_renders_png_and_survives_runaway_code(self):
+        png = self.pool.render(PLOT_CODE, {'a': 2}, {'title': 'Line'})
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        with self.assertRaises(TimeoutException):
+            self.pool.render('while True:\n    pass')
+        with self.assertRaises(ValueError):
+            self.pool.render('x = np.ones((20000, 20000))')
+        with self.assertRaises(ValueError):
+            self.pool.render('import os')
+        self.assertTrue(self.pool.render(PLOT_CODE, {'a': 3}).startswith(b'\x89PNG'))
+
+    def test_worker_is_replaced_after_max_jobs(self):
+        pids = []
+        for _ in range(4):
+            self.pool.render(PLOT_CODE, {'a': 1})
+            worker = self.pool._idle[-1] if self.pool._idle else None
+            pids.append(worker.process.pid if worker else None)
+        # Jobs 1-2 reuse the first worker, job 3 retires it, job 4 starts a new one.
+        self.assertEqual(pids[0], pids[1])
+        self.assertIsNone(pids[2])
+        self.assertNotIn(pids[3], (pids[0], None))
+
+    def test_waiting_render_starts_a_replacement_worker(self):
+        pool = GraphPool(size=1, max_jobs=1, timeout=2, memory_mb=256, cpu_seconds=4)
+        self.addCleanup(pool.close)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(pool.render(PLOT_CODE, {'a': 1})), daemon=True)
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        # Each worker is retired after its job, so the second render needs a new one.
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(len(results), 2)
+
+    @override_settings(GRAPH_WORKERS=0)
+    def test_render_graphs_command_and_admin_action(self):
+        user = User.objects.create_user(username='graph_staff', password='pass', is_staff=True, is_superuser=True)
+        course = Course.objects.create(name='Graph Course', created_by=user)
+        topic = Topic.objects.create(course=course, name='Graph Topic')
+        good = Flashcard.objects.create(topic=topic, question='q', answer='a', graph_type='function',
+                                        graph_code=PLOT_CODE.format(a=2))
+        bad = Flashcard.objects.create(topic=topic, question='q', answer='a', graph_type='function',
+                                       graph_code='y = undefined_name')
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            out = StringIO()
+            call_command('render_graphs', stdout=out)
+            self.assertIn('[OK] Rendered 1 graph(s); 1 failed.', out.getvalue())
+            good.refresh_from_db()
+            self.assertTrue(good.generated_graph_image.name.endswith('.png'))
+
+            self.client.login(username='graph_staff', password='pass')
+            response = self.client.post('/admin/study/flashcard/', {
+                'action': 'render_graphs', '_selected_action': [good.id, bad.id],
+            }, secure=True, follow=True)
+            messages = [str(message) for message in response.context['messages']]
+        self.assertIn('Rendered 1 graph(s).', messages)
+        self.assertIn('1 graph(s) failed; see the server log.', messages)
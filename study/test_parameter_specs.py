@@ -0,0 +1,292 @@
+"""Tests for compiling, sampling, profiling and analysing parameter specs"""
+import json
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from .models import Course, Topic, Flashcard
+from .utils import ParameterGenerator, compile_cache_info, compile_spec, analyze_spec
+from .utils.parameterization import _compile_spec_json
+from .utils.restricted import clear_compile_cache
+from .spec_profile import profile_spec, spec_problems
+
+
+class CompileCacheTest(TestCase):
+    """RestrictedPython compiles are cached across generations, including failed ones."""
+
+    def setUp(self):
+        clear_compile_cache()
+        _compile_spec_json.cache_clear()
+
+    def test_retries_reuse_compiled_formulas_and_constraints(self):
+        spec = {
+            'variables': {
+                'a': {'type': 'random_int', 'min': 1, 'max': 9},
+                'b': {'type': 'computed', 'formula': 'a * 2'},
+            },
+            'constraints': ['b > 2'],
+        }
+        for _ in range(20):
+            ParameterGenerator(spec).generate()
+        info = compile_cache_info()
+        self.assertEqual((info['misses'], info['hits']), (2, 0))
+
+    def test_compile_errors_are_cached(self):
+        for spec in ({'constraints': ['a >']}, {'variables': {}, 'constraints': ['a >']}):
+            with self.assertRaises(ValueError):
+                ParameterGenerator(spec).generate()
+        self.assertEqual((compile_cache_info()['misses'], compile_cache_info()['hits']), (1, 1))
+
+
+class EvaluationPlanTest(TestCase):
+    """compile_spec orders computed variables and rejects broken specs before sampling."""
+
+    def test_formulas_may_use_variables_declared_later(self):
+        spec = {
+            'variables': {
+                'area': {'type': 'computed', 'formula': 'side ** 2'},
+                'side': {'type': 'computed', 'formula': 'a + 1'},
+                'a': {'type': 'random_int', 'min': 1, 'max': 9},
+            },
+        }
+        self.assertEqual([name for name, _, _ in compile_spec(spec).computed], ['side', 'area'])
+        values = ParameterGenerator(spec).generate()
+        self.assertEqual(values['area'], (values['a'] + 1) ** 2)
+        for row in ParameterGenerator(spec).generate_batch(5):
+            self.assertEqual(row['area'], (row['a'] + 1) ** 2)
+
+    def test_cycles_and_undefined_names_are_rejected(self):
+        cycle = {
+            'variables': {
+                'x': {'type': 'computed', 'formula': 'y + 1'},
+                'y': {'type': 'computed', 'formula': 'x * 2'},
+            },
+        }
+        with self.assertRaisesMessage(ValueError, 'x -> y -> x'):
+            compile_spec(cycle)
+        with self.assertRaisesMessage(ValueError, 'undefined name(s): c'):
+            compile_spec({'variables': {'a': {'type': 'random_int'}}, 'constraints': ['a > c']})
+        # Names bound inside the expression and namespace functions are fine.
+        compile_spec({
+            'variables': {'a': {'type': 'random_int'}, 'b': {'type': 'computed', 'formula': 'sqrt((lambda n: n * n)(a))'}},
+        })
+
+    def test_plan_is_reused_for_the_same_spec(self):
+        spec = {'variables': {'a': {'type': 'random_int'}, 'b': {'type': 'computed', 'formula': 'a * 3'}}}
+        plan = compile_spec(spec)
+        self.assertIs(compile_spec(json.loads(json.dumps(spec))), plan)
+        self.assertIs(ParameterGenerator(spec).plan, plan)
+
+
+class BatchSamplerTest(TestCase):
+    """ParameterGenerator.generate_batch samples whole batches with NumPy."""
+
+    def test_batch_rows_satisfy_constraints_with_python_types(self):
+        spec = {
+            'variables': {
+                'a': {'type': 'random_int', 'min': 1, 'max': 20},
+                'x': {'type': 'random_float', 'min': 0.0, 'max': 1.0, 'precision': 2},
+                'k': {'type': 'random_choice', 'choices': [2, 3]},
+                'c': {'type': 'computed', 'formula': 'a * k + x'},
+            },
+            'constraints': ['a % 2 == 0'],
+        }
+        rows = ParameterGenerator(spec).generate_batch(50)
+        self.assertEqual(len(rows), 50)
+        for row in rows:
+            self.assertIsInstance(row['a'], int)
+            self.assertEqual(row['a'] % 2, 0)
+            self.assertAlmostEqual(row['c'], round(row['a'] * row['k'] + row['x'], 2))
+
+    def test_tight_constraints_are_satisfied(self):
+        spec = {
+            'variables': {
+                'a': {'type': 'random_int', 'min': 1, 'max': 50},
+                'b': {'type': 'random_int', 'min': 1, 'max': 50},
+            },
+            'constraints': ['a == 37', 'b == 3'],
+        }
+        self.assertEqual(ParameterGenerator(spec).generate_batch(2), [{'a': 37, 'b': 3}] * 2)
+
+    def test_non_vectorisable_expressions_fall_back_to_rows(self):
+        spec = {
+            'variables': {
+                'a': {'type': 'random_int', 'min': 1, 'max': 9},
+                'name': {'type': 'random_choice', 'choices': ['x', 'y']},
+            },
+            'constraints': ['a > 2 and a < 5', 'name == "y"'],
+        }
+        for row in ParameterGenerator(spec).generate_batch(10):
+            self.assertIn(row['a'], (3, 4))
+            self.assertEqual(row['name'], 'y')
+
+    def test_batch_rows_match_scalar_evaluation(self):
+        spec = {
+            'variables': {
+                'a': {'type': 'random_int', 'min': 50, 'max': 59},
+                'b': {'type': 'random_int', 'min': 0, 'max': 15},
+                # Overflows int64 for most draws
+                'p': {'type': 'computed', 'formula': 'a ** b'},
+                'q': {'type': 'computed', 'formula': 'a // b'},
+                'm': {'type': 'computed', 'formula': 'a % b'},
+                'r': {'type': 'computed', 'formula': 'round(a / 3)'},
+            },
+        }
+        rows = ParameterGenerator(spec, seed=1).generate_batch(200)
+        self.assertEqual(len(rows), 200)
+        for row in rows:
+            a, b = row['a'], row['b']
+            self.assertNotEqual(b, 0)
+            self.assertEqual(row['p'], a ** b)
+            self.assertEqual((row['q'], row['m']), (a // b, a % b))
+            self.assertIsInstance(row['r'], int)
+            self.assertEqual(row['r'], round(a / 3))
+
+    def test_generate_does_not_fall_back_to_a_batch(self):
+        # Not linear, so the analysis cannot tell that it never holds
+        spec = {'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 9}}, 'constraints': ['a * a == 50']}
+        with mock.patch.object(ParameterGenerator, 'generate_batch') as generate_batch:
+            with self.assertRaises(ValueError):
+                ParameterGenerator(spec).generate()
+        generate_batch.assert_not_called()
+
+    def test_array_attributes_are_not_reachable(self):
+        spec = {
+            'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 9}},
+            'constraints': ['a.dump("x") or True'],
+        }
+        with self.assertRaises(ValueError):
+            ParameterGenerator(spec).generate_batch(1)
+
+
+class SpecProfileTest(TestCase):
+    """Parameter specs are profiled on save and by profile_parameter_specs (study/spec_profile.py)."""
+
+    EASY = {'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 9}}}
+    # Not linear, so interval analysis cannot narrow the range to a == 7
+    RARE = {'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 1000}}, 'constraints': ['a * a == 49']}
+    ERRORS = {
+        'variables': {
+            'a': {'type': 'random_int', 'min': 0, 'max': 3},
+            'b': {'type': 'computed', 'formula': '1 / a'},
+        },
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='spec_author', password='pass')
+        course = Course.objects.create(name='Spec Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Spec Topic', order=1)
+        self.client.login(username='spec_author', password='pass')
+
+    def _post(self, spec):
+        return self.client.post('/flashcard/create/', {
+            'topic': self.topic.id, 'question': 'q', 'answer': 'a', 'difficulty': 'easy',
+            'star_difficulty': 1, 'question_type': 'parameterized',
+            'question_template': 'What is {a}?', 'answer_template': '{a}',
+            'parameter_spec': json.dumps(spec),
+        }, secure=True, follow=True)
+
+    def test_profile_rates(self):
+        easy = profile_spec(self.EASY, samples=200)
+        self.assertEqual((easy.samples, easy.acceptance_rate, easy.error_rate), (200, 1.0, 0.0))
+        self.assertLessEqual(easy.p50_ms, easy.p99_ms)
+        self.assertEqual(spec_problems(easy), ([], []))
+
+        errors = profile_spec(self.ERRORS, samples=400)
+        self.assertGreater(errors.error_rate, 0.1)
+        self.assertAlmostEqual(errors.acceptance_rate, 1 - errors.error_rate)
+        warnings = spec_problems(errors)[1]
+        self.assertEqual(len(warnings), 2)
+        self.assertIn("possible division by zero in '1 / a'", warnings[1])
+
+    def test_single_attempts(self):
+        generator = ParameterGenerator({'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 2}},
+                                        'constraints': ['a * a == 4']}, seed=0)
+        outcomes = {None if values is None else values['a'] for values in (generator.attempt() for _ in range(50))}
+        self.assertEqual(outcomes, {None, 2})
+        with self.assertRaises(ValueError):
+            ParameterGenerator({'variables': {'a': {'type': 'random_int', 'min': 0, 'max': 0},
+                                              'b': {'type': 'computed', 'formula': '1 / a'}}}).attempt()
+
+    def test_form_saves_profile_and_rejects_rare_specs(self):
+        self._post(self.EASY)
+        card = Flashcard.objects.get(topic=self.topic)
+        self.assertEqual(card.parameter_profile['acceptance_rate'], 1.0)
+
+        response = self._post(self.RARE)
+        self.assertContains(response, 'satisfy the constraints')
+        response = self._post({'variables': {'a': {'type': 'computed', 'formula': 'b'}}})
+        self.assertContains(response, 'undefined name(s): b')
+        self.assertEqual(Flashcard.objects.filter(topic=self.topic).count(), 1)
+
+    @override_settings(PARAMETER_SPEC_SAMPLES=200)
+    def test_command_reports_every_card(self):
+        for spec in (self.EASY, self.RARE):
+            Flashcard.objects.create(
+                topic=self.topic, question='q', answer='a', question_type='parameterized',
+                parameter_spec=spec, question_template='{a}', answer_template='{a}',
+            )
+        out = StringIO()
+        call_command('profile_parameter_specs', problems_only=True, stdout=out)
+        self.assertEqual(out.getvalue().count('[REJECT]'), 1)
+        self.assertIn('Profiled 2 card(s): 1 below', out.getvalue())
+        self.assertRegex(out.getvalue(), r'Compile cache: \d+ hit\(s\), \d+ miss\(es\)')
+        self.assertFalse(Flashcard.objects.filter(topic=self.topic, parameter_profile__isnull=True).exists())
+
+
+class SpecAnalysisTest(TestCase):
+    """analyze_spec narrows sampling ranges and flags possible runtime errors (study/utils/spec_analysis.py)."""
+
+    def _plan(self, variables, constraints=()):
+        return compile_spec({'variables': variables, 'constraints': list(constraints)})
+
+    def test_linear_constraints_narrow_sampling_ranges(self):
+        plan = self._plan({
+            'a': {'type': 'random_int', 'min': 1, 'max': 100},
+            'b': {'type': 'random_int', 'min': 1, 'max': 100},
+            'x': {'type': 'random_float', 'min': 0.0, 'max': 10.0},
+            'k': {'type': 'random_choice', 'choices': [1, 2, 5, 10]},
+            's': {'type': 'computed', 'formula': 'k * 2'},
+        }, ['a > b + 90', 'x >= 2.5 and x < 3', 's >= 5'])
+        ranges = {name: spec for name, spec in plan.random_vars}
+        self.assertEqual((ranges['a']['min'], ranges['a']['max']), (92, 100))
+        self.assertEqual((ranges['b']['min'], ranges['b']['max']), (1, 9))
+        self.assertEqual((ranges['x']['min'], ranges['x']['max']), (2.5, 3.0))
+        self.assertEqual(ranges['k']['choices'], [5, 10])
+
+    def test_rounded_computed_values_are_not_narrowed_exactly(self):
+        # a * 0.1 never reaches 1, but rounded to 0 places it does for a >= 6
+        variables = {
+            'a': {'type': 'random_int', 'min': 0, 'max': 9},
+            'c': {'type': 'computed', 'formula': 'a * 0.1', 'precision': 0},
+        }
+        plan = self._plan(variables, ['c >= 1'])
+        generator = ParameterGenerator({'variables': variables, 'constraints': ['c >= 1']}, seed=3)
+        for _ in range(20):
+            values = generator.generate()
+            self.assertGreaterEqual(values['a'], 6)
+            self.assertEqual(values['c'], 1.0)
+        self.assertIsNone(analyze_spec(variables, ['c'], ['c >= 1']).satisfiable)
+        self.assertEqual(plan.random_vars[0][1]['max'], 9)
+
+    def test_satisfiability_is_decided_when_possible(self):
+        variables = {'a': {'type': 'random_int', 'min': 1, 'max': 5}, 'b': {'type': 'random_int', 'min': 6, 'max': 9}}
+        self.assertTrue(analyze_spec(variables, [], ['b > a']).satisfiable)
+        self.assertIsNone(analyze_spec(variables, [], ['a % 2 == 0']).satisfiable)
+        with self.assertRaisesMessage(ValueError, 'can never be satisfied'):
+            self._plan(variables, ['a > b'])
+
+    def test_possible_runtime_errors_are_flagged_unless_guarded(self):
+        variables = {
+            'a': {'type': 'random_int', 'min': -5, 'max': 5},
+            'b': {'type': 'random_int', 'min': -5, 'max': 5},
+            'c': {'type': 'computed', 'formula': '1 / (a - b) + sqrt(a - b)'},
+        }
+        warnings = self._plan(variables).warnings
+        self.assertEqual(len(warnings), 2)
+        self.assertIn('division by zero', warnings[0])
+        self.assertIn('sqrt', warnings[1])
+        self.assertEqual(self._plan(variables, ['a > b']).warnings, ())
@@ -0,0 +1,154 @@
+"""Tests for the cached profile bundle and public course lookup"""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .models import (
+    Course, Topic, Flashcard, CourseEnrollment, SpacedRepetitionSettings,
+    StudyGoal, StudyPreference,
+)
+from .profile_bundle import get_profile_bundle, load_profile_bundle
+from . import models as study_models
+from .migration_helpers import mark_public_courses
+from .views import get_public_content_filter
+from .test_review_log import SHARED_CACHE_DIR, SHARED_CACHES
+
+
+class ProfileBundleTest(TestCase):
+    """Cached per-user preference, SR settings, goal and enrollments (study/profile_bundle.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bundle_user', password='pass')
+        self.course = Course.objects.create(name='Bundle Course', created_by=User.objects.create_user('bundle_owner'))
+        self.topic = Topic.objects.create(course=self.course, name='Bundle Topic', order=1)
+        Flashcard.objects.create(topic=self.topic, question='Q', answer='A', question_type='standard')
+        CourseEnrollment.objects.create(user=self.user, course=self.course)
+        self.client.login(username='bundle_user', password='pass')
+
+    def test_bundle_defaults_without_rows(self):
+        bundle = load_profile_bundle(self.user.id)
+        self.assertEqual(bundle.preference.study_mode, 'standard')
+        self.assertIsNone(bundle.preference.pk)
+        self.assertIsNone(bundle.sr_settings)
+        self.assertIsNone(bundle.goal)
+        self.assertEqual(bundle.enrolled_course_ids, {self.course.id})
+
+    def test_cached_until_a_row_changes(self):
+        load_profile_bundle(self.user.id)
+        with self.assertNumQueries(0):
+            load_profile_bundle(self.user.id)
+
+        StudyPreference.objects.create(user=self.user, study_mode='visual')
+        self.assertEqual(load_profile_bundle(self.user.id).preference.study_mode, 'visual')
+        SpacedRepetitionSettings.objects.create(user=self.user, max_interval_days=90)
+        self.assertEqual(load_profile_bundle(self.user.id).sr_settings.max_interval_days, 90)
+        goal = StudyGoal.objects.create(user=self.user, daily_cards=10)
+        self.assertEqual(load_profile_bundle(self.user.id).goal.daily_cards, 10)
+        goal.delete()
+        self.assertIsNone(load_profile_bundle(self.user.id).goal)
+        CourseEnrollment.objects.filter(user=self.user).delete()
+        self.assertEqual(load_profile_bundle(self.user.id).enrolled_course_ids, frozenset())
+
+    def test_loaded_once_per_request(self):
+        request = SimpleNamespace(user=self.user)
+        bundle = get_profile_bundle(request)
+        with self.assertNumQueries(0):
+            cache.clear()
+            self.assertIs(get_profile_bundle(request), bundle)
+
+    def test_get_pages_do_not_create_rows(self):
+        for url in [f'/study/{self.topic.id}/', '/settings/spaced-repetition/', '/accountability/']:
+            self.assertEqual(self.client.get(url, secure=True).status_code, 200, url)
+        self.assertFalse(StudyPreference.objects.filter(user=self.user).exists())
+        self.assertFalse(SpacedRepetitionSettings.objects.filter(user=self.user).exists())
+        self.assertFalse(StudyGoal.objects.filter(user=self.user).exists())
+
+    def test_enrolling_takes_effect_immediately(self):
+        CourseEnrollment.objects.filter(user=self.user).delete()
+        response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+        self.assertRedirects(response, '/catalog/', fetch_redirect_response=False)
+        CourseEnrollment.objects.create(user=self.user, course=self.course)
+        self.assertEqual(self.client.get(f'/study/{self.topic.id}/', secure=True).status_code, 200)
+
+    @override_settings(CACHES=SHARED_CACHES)
+    def test_enrollment_reaches_other_processes_through_shared_cache(self):
+        from . import profile_bundle
+        from .checks import shared_cache_check
+        self.assertEqual(shared_cache_check(None), [])
+        cache.clear()
+        CourseEnrollment.objects.filter(user=self.user).delete()
+        self.assertFalse(load_profile_bundle(self.user.id).is_enrolled(self.course.id))
+        # Another worker handles the enrollment and drops the bundle through its own connection.
+        with mock.patch.object(profile_bundle, 'cache', FileBasedCache(SHARED_CACHE_DIR, {})):
+            CourseEnrollment.objects.create(user=self.user, course=self.course)
+        self.assertTrue(load_profile_bundle(self.user.id).is_enrolled(self.course.id))
+        cache.clear()
+
+    def test_deploy_check_rejects_process_local_cache(self):
+        from .checks import shared_cache_check
+        self.assertEqual([error.id for error in shared_cache_check(None)], ['study.E001'])
+
+
+class PublicCourseFlagTest(TestCase):
+    """Course.is_public replaces looking up the system user on every request."""
+
+    def setUp(self):
+        self.system_user = User.objects.get(username='system')
+        self.user = User.objects.create_user(username='public_user', password='pass')
+        self.client.login(username='public_user', password='pass')
+
+    def test_system_courses_are_public(self):
+        public = Course.objects.create(name='Public', created_by=self.system_user)
+        private = Course.objects.create(name='Private', created_by=self.user)
+        self.assertTrue(public.is_public)
+        self.assertFalse(private.is_public)
+        self.assertFalse(Course.objects.filter(created_by=self.system_user, is_public=False).exists())
+
+    def test_migration_helper_marks_system_courses(self):
+        Course.objects.update(is_public=False)
+        flagged = mark_public_courses(Course)
+        self.assertEqual(flagged, Course.objects.filter(created_by=self.system_user).count())
+        self.assertEqual(Course.objects.filter(is_public=True).count(), flagged)
+
+    def test_system_user_id_memoized(self):
+        study_models.reset_system_user_id()
+        self.assertEqual(study_models.get_system_user_id(), self.system_user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(study_models.get_system_user_id(), self.system_user.id)
+
+    def test_missing_system_user_is_memoized_until_it_is_created(self):
+        self.system_user.delete()
+        self.assertIsNone(study_models.get_system_user_id())
+        with self.assertNumQueries(0):
+            self.assertIsNone(study_models.get_system_user_id())
+        recreated = User.objects.create_user(username='system')
+        self.assertEqual(study_models.get_system_user_id(), recreated.id)
+        study_models.reset_system_user_id()  # The rollback restores the original user
+
+    def test_public_content_filter_uses_flag(self):
+        own = Course.objects.create(name='Mine', created_by=self.user)
+        Course.objects.create(name='Someone else', created_by=User.objects.create_user('public_other'))
+        visible = set(Course.objects.filter(get_public_content_filter(self.user, Course)).values_list('id', flat=True))
+        expected = set(Course.objects.filter(is_public=True).values_list('id', flat=True)) | {own.id}
+        self.assertEqual(visible, expected)
+        topic = Topic.objects.create(course=own, name='T', order=1)
+        card = Flashcard.objects.create(topic=topic, question='Q', answer='A', question_type='standard')
+        self.assertTrue(Flashcard.objects.filter(get_public_content_filter(self.user, Flashcard), id=card.id).exists())
+
+    def test_catalog_does_not_look_up_system_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/catalog/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if "'system'" in q['sql']])
+
+    def test_enroll_requires_public_course(self):
+        private = Course.objects.create(name='Private', created_by=User.objects.create_user('public_owner'))
+        response = self.client.post(f'/course/{private.id}/enroll/', secure=True)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,145 @@
+"""Tests for the buffered /progress/batch/ endpoint"""
+import datetime
+import json
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Course, Topic, Flashcard, FlashcardProgress, CourseEnrollment
+
+
+class ProgressBatchViewTest(TestCase):
+    """Tests for the buffered /progress/batch/ endpoint."""
+
+    def setUp(self):
+        self.system_user, _ = User.objects.get_or_create(
+            username='system', defaults={'email': 'system@system.local'}
+        )
+        self.user = User.objects.create_user(username='batch_user', password='pass')
+        self.course = Course.objects.create(name='Batch Course', created_by=self.system_user)
+        self.topic = Topic.objects.create(course=self.course, name='Batch Topic', order=1)
+        self.cards = [
+            Flashcard.objects.create(topic=self.topic, question=f'Q{i}', answer=f'A{i}')
+            for i in range(3)
+        ]
+        CourseEnrollment.objects.create(user=self.user, course=self.course)
+        self.client.login(username='batch_user', password='pass')
+
+    def _post(self, reviews):
+        return self.client.post(
+            '/progress/batch/',
+            json.dumps({'reviews': reviews}),
+            content_type='application/json',
+            secure=True,
+        )
+
+    def test_batch_creates_progress_for_every_card(self):
+        response = self._post([
+            {'flashcard_id': card.id, 'step_index': -1, 'quality': 4} for card in self.cards
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['saved'], 3)
+        for card in self.cards:
+            progress = FlashcardProgress.objects.get(user=self.user, flashcard=card, step_index=-1)
+            self.assertEqual(progress.times_reviewed, 1)
+            self.assertEqual(progress.interval_days, 1)
+            self.assertEqual(progress.next_review_date, datetime.date.today() + datetime.timedelta(days=1))
+
+    def test_repeated_ratings_compound_in_reviewed_at_order(self):
+        card = self.cards[0]
+        response = self._post([
+            {'flashcard_id': card.id, 'quality': 4, 'reviewed_at': '2026-01-01T10:05:00Z'},
+            {'flashcard_id': card.id, 'quality': 4, 'reviewed_at': '2026-01-01T10:00:00Z'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        progress = FlashcardProgress.objects.get(user=self.user, flashcard=card, step_index=-1)
+        self.assertEqual(progress.times_reviewed, 2)
+        self.assertEqual(progress.sm2_repetitions, 2)
+        self.assertEqual(progress.interval_days, 6)
+        self.assertEqual(progress.next_review_date, datetime.date(2026, 1, 7))
+
+    def test_updates_existing_rows(self):
+        card = self.cards[0]
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=card, step_index=-1,
+            times_reviewed=5, times_correct=4, confidence_level=3,
+            sm2_repetitions=2, interval_days=6, easiness_factor=2.5,
+        )
+        self._post([{'flashcard_id': card.id, 'step_index': -1, 'quality': 1}])
+        progress = FlashcardProgress.objects.get(user=self.user, flashcard=card, step_index=-1)
+        self.assertEqual(progress.times_reviewed, 6)
+        self.assertEqual(progress.times_correct, 4)
+        self.assertEqual(progress.confidence_level, 2)
+        self.assertEqual(progress.sm2_repetitions, 0)
+        self.assertEqual(FlashcardProgress.objects.filter(user=self.user, flashcard=card).count(), 1)
+
+    @override_settings(COMPACT_STEP_PROGRESS=False)
+    def test_step_rating_schedules_whole_card_record(self):
+        card = self.cards[0]
+        self._post([{'flashcard_id': card.id, 'step_index': 0, 'quality': 4}])
+        step = FlashcardProgress.objects.get(user=self.user, flashcard=card, step_index=0)
+        whole = FlashcardProgress.objects.get(user=self.user, flashcard=card, step_index=-1)
+        self.assertEqual(step.times_reviewed, 1)
+        self.assertIsNone(step.next_review_date)
+        self.assertEqual(whole.times_reviewed, 0)
+        self.assertEqual(whole.interval_days, 1)
+
+    @override_settings(REVIEW_EVENT_FLUSH_SIZE=100, REVIEW_EVENT_FLUSH_SECONDS=3600)
+    def test_query_count_does_not_grow_with_batch_size(self):
+        from .counters import get_topic_counters
+        get_topic_counters(self.user, [self.topic.id])
+        reviews = [{'flashcard_id': card.id, 'quality': 4} for card in self.cards]
+        # Keep the review-event buffer from flushing inside either measurement.
+        from django.core.cache import cache
+        from .profile_bundle import load_profile_bundle
+        cache.clear()
+        load_profile_bundle(self.user.id)
+        with CaptureQueriesContext(connection) as small:
+            self._post(reviews[:1])
+        FlashcardProgress.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self._post(reviews)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_invalid_quality_rejects_whole_batch(self):
+        response = self._post([
+            {'flashcard_id': self.cards[0].id, 'quality': 4},
+            {'flashcard_id': self.cards[1].id, 'quality': 9},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(FlashcardProgress.objects.exists())
+
+    def test_non_enrolled_user_blocked(self):
+        User.objects.create_user(username='batch_other', password='pass')
+        self.client.login(username='batch_other', password='pass')
+        response = self._post([{'flashcard_id': self.cards[0].id, 'quality': 4}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['saved'], 0)
+        self.assertEqual(response.json()['rejected'], [{'flashcard_id': self.cards[0].id, 'error': 'No access'}])
+        self.assertFalse(FlashcardProgress.objects.exists())
+
+    def test_stale_card_does_not_lose_the_other_ratings(self):
+        other_course = Course.objects.create(name='Private', created_by=self.system_user)
+        foreign = Flashcard.objects.create(
+            topic=Topic.objects.create(course=other_course, name='Private Topic'), question='Q', answer='A',
+        )
+        gone = self.cards[2].id
+        self.cards[2].delete()
+        response = self._post([
+            {'flashcard_id': self.cards[0].id, 'quality': 4},
+            {'flashcard_id': gone, 'quality': 4},
+            {'flashcard_id': foreign.id, 'quality': 4},
+            {'flashcard_id': self.cards[1].id, 'quality': 2},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['saved'], 2)
+        self.assertEqual(data['rejected'], [
+            {'flashcard_id': gone, 'error': 'Unknown flashcard'},
+            {'flashcard_id': foreign.id, 'error': 'No access'},
+        ])
+        self.assertEqual(
+            set(FlashcardProgress.objects.values_list('flashcard_id', flat=True)), {self.cards[0].id, self.cards[1].id},
+        )
@@ -0,0 +1,223 @@
+"""Tests for single-statement progress writes and packed step counters"""
+import datetime
+import json
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.db.models import Sum
+from django.core.management import call_command
+
+from .models import (
+    Course, Topic, Flashcard, FlashcardProgress, CourseEnrollment,
+    SpacedRepetitionSettings,
+)
+from .views import _apply_sm2
+from .progress_writes import previous_state, record_review
+from .migration_helpers import pack_step_rows, unpack_step_rows
+from .step_progress import StepCounts, bump_step, pack_steps, unpack_steps
+
+
+class ProgressUpsertTest(TestCase):
+    """record_review must match _apply_sm2 and the old counter logic in one statement."""
+
+    def setUp(self):
+        self.system_user, _ = User.objects.get_or_create(
+            username='system', defaults={'email': 'system@system.local'}
+        )
+        self.user = User.objects.create_user(username='upsert_user', password='pass')
+        course = Course.objects.create(name='Upsert Course', created_by=self.system_user)
+        self.topic = Topic.objects.create(course=course, name='Upsert Topic', order=1)
+        self.card = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+        CourseEnrollment.objects.create(user=self.user, course=course)
+
+    def test_fresh_row_is_inserted_in_one_statement(self):
+        with self.assertNumQueries(1):
+            progress, sr_progress = record_review(self.user.id, self.card.id, 4)
+        self.assertIs(progress, sr_progress)
+        stored = FlashcardProgress.objects.get(user=self.user, flashcard=self.card, step_index=-1)
+        self.assertEqual(stored.pk, progress.pk)
+        self.assertEqual((stored.times_reviewed, stored.times_correct, stored.confidence_level), (1, 1, 1))
+        self.assertEqual((stored.interval_days, stored.sm2_repetitions), (1, 1))
+        self.assertEqual(stored.next_review_date, datetime.date.today() + datetime.timedelta(days=1))
+        self.assertEqual(progress.next_review_date, stored.next_review_date)
+        self.assertIsNone(progress.previous_review_date)
+
+    def test_matches_apply_sm2_over_a_sequence(self):
+        settings = SpacedRepetitionSettings.objects.create(user=self.user, ease_modifier=1, max_interval_days=60)
+        expected = FlashcardProgress(user=self.user, flashcard=self.card)
+        day = datetime.date(2026, 1, 1)
+        for quality in [4, 5, 3, 5, 5, 2, 4, 4, 5, 5, 5, 0, 3, 5]:
+            _apply_sm2(expected, quality, settings, today=day)
+            with self.assertNumQueries(1):
+                _, progress = record_review(self.user.id, self.card.id, quality, settings, review_day=day)
+            self.assertEqual(
+                (progress.easiness_factor, progress.interval_days, progress.sm2_repetitions,
+                 progress.next_review_date),
+                (expected.easiness_factor, expected.interval_days, expected.sm2_repetitions,
+                 expected.next_review_date),
+            )
+            day = progress.next_review_date
+        self.assertEqual(progress.times_reviewed, 14)
+        self.assertEqual(progress.times_correct, 12)
+
+    def test_interval_rounds_half_to_even_like_python(self):
+        for interval, expected in [(5, 12), (7, 18)]:
+            FlashcardProgress.objects.update_or_create(
+                user=self.user, flashcard=self.card, step_index=-1,
+                defaults={'interval_days': interval, 'easiness_factor': 2.5, 'sm2_repetitions': 3},
+            )
+            _, progress = record_review(self.user.id, self.card.id, 4)
+            self.assertEqual(progress.interval_days, expected)
+
+    def test_confidence_is_clamped_in_sql(self):
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.card, step_index=-1, confidence_level=5, times_reviewed=3,
+        )
+        progress, _ = record_review(self.user.id, self.card.id, 5)
+        self.assertEqual(progress.confidence_level, 5)
+        FlashcardProgress.objects.filter(user=self.user).update(confidence_level=0)
+        progress, _ = record_review(self.user.id, self.card.id, 1)
+        self.assertEqual((progress.confidence_level, progress.times_reviewed, progress.times_correct), (0, 5, 1))
+
+    def test_previous_state_is_returned(self):
+        due = datetime.date(2026, 2, 1)
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.card, step_index=-1,
+            interval_days=6, sm2_repetitions=2, next_review_date=due,
+        )
+        _, progress = record_review(self.user.id, self.card.id, 1)
+        self.assertEqual(
+            (progress.previous_interval_days, progress.previous_repetitions, progress.previous_review_date),
+            (6, 2, due),
+        )
+        self.assertEqual(previous_state(progress).next_review_date, due)
+
+    @override_settings(COMPACT_STEP_PROGRESS=False)
+    def test_step_rating_counts_on_step_row_and_schedules_whole_card(self):
+        with self.assertNumQueries(2):
+            step_row, sr_row = record_review(self.user.id, self.card.id, 4, step_index=1)
+        self.assertEqual((step_row.step_index, step_row.times_reviewed, step_row.next_review_date), (1, 1, None))
+        self.assertEqual((sr_row.step_index, sr_row.times_reviewed, sr_row.interval_days), (-1, 0, 1))
+
+    def test_view_uses_upsert(self):
+        self.client.login(username='upsert_user', password='pass')
+        response = self.client.post(f'/flashcard/{self.card.id}/progress/', {'quality': 4}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['times_reviewed'], 1)
+        self.assertEqual(response.json()['interval_days'], 1)
+        from .counters import get_topic_counters
+        counter = get_topic_counters(self.user, [self.topic.id])[self.topic.id]
+        self.assertEqual((counter.new_count, counter.learning_count), (0, 1))
+
+
+@override_settings(COMPACT_STEP_PROGRESS=True)
+class CompactStepProgressTest(TestCase):
+    """Per-step counters packed into the whole-card row (study/step_progress.py)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='steps_user', password='pass')
+        course = Course.objects.create(name='Steps Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Steps Topic', order=1)
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        self.card = Flashcard.objects.create(
+            topic=self.topic, question='Laplace', answer='F(s)', question_type='step_by_step',
+            steps=[{'move': f'step {k}'} for k in range(4)],
+        )
+        self.client.login(username='steps_user', password='pass')
+
+    def _whole(self):
+        return FlashcardProgress.objects.get(user=self.user, flashcard=self.card, step_index=-1)
+
+    def test_pack_round_trip_and_bump(self):
+        steps = bump_step([], 2, 4)
+        self.assertEqual(steps, [StepCounts(), StepCounts(), StepCounts(1, 1, 1)])
+        steps = bump_step(steps, 2, 1)
+        self.assertEqual(steps[2], StepCounts(2, 1, 0))
+        self.assertEqual(unpack_steps(pack_steps(steps)), steps)
+        self.assertEqual(len(pack_steps(steps)), 3 * 9)
+        self.assertEqual(unpack_steps(None), [])
+
+    def test_step_rating_keeps_one_row_per_card(self):
+        for step_index, quality in [(0, 4), (1, 4), (1, 2), (3, 5)]:
+            response = self.client.post(
+                f'/flashcard/{self.card.id}/progress/',
+                {'quality': quality, 'step_index': step_index}, secure=True,
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['times_reviewed'], 1)
+        self.assertEqual(FlashcardProgress.objects.filter(user=self.user).count(), 1)
+        whole = self._whole()
+        self.assertEqual(unpack_steps(whole.step_state), [
+            StepCounts(1, 1, 1), StepCounts(2, 1, 0), StepCounts(), StepCounts(1, 1, 1),
+        ])
+        self.assertEqual((whole.times_reviewed, whole.times_correct), (4, 3))
+        self.assertEqual(whole.sm2_repetitions, 1)
+
+    def test_step_rating_statement_count(self):
+        with self.assertNumQueries(4):  # savepoint, locked read, upsert, release
+            record_review(self.user.id, self.card.id, 4, step_index=2)
+
+    def test_batch_endpoint_packs_steps(self):
+        self.client.post('/progress/batch/', json.dumps({'reviews': [
+            {'flashcard_id': self.card.id, 'step_index': 0, 'quality': 4},
+            {'flashcard_id': self.card.id, 'step_index': 2, 'quality': 1},
+        ]}), content_type='application/json', secure=True)
+        self.assertEqual(FlashcardProgress.objects.filter(user=self.user).count(), 1)
+        whole = self._whole()
+        self.assertEqual(unpack_steps(whole.step_state), [StepCounts(1, 1, 1), StepCounts(), StepCounts(1, 0, 0)])
+        self.assertEqual(whole.times_reviewed, 2)
+
+    def test_never_seen_clears_step_state(self):
+        record_review(self.user.id, self.card.id, 4, step_index=1)
+        self.client.post(f'/flashcard/{self.card.id}/never-seen/', secure=True)
+        self.assertIsNone(self._whole().step_state)
+
+    def test_migration_helpers_convert_both_ways(self):
+        other = User.objects.create_user(username='steps_other')
+        FlashcardProgress.objects.create(user=self.user, flashcard=self.card, step_index=-1,
+                                         times_reviewed=2, times_correct=1, interval_days=6)
+        FlashcardProgress.objects.create(user=self.user, flashcard=self.card, step_index=0,
+                                         times_reviewed=3, times_correct=2, confidence_level=2)
+        FlashcardProgress.objects.create(user=self.user, flashcard=self.card, step_index=2,
+                                         times_reviewed=1, times_correct=0, confidence_level=0)
+        FlashcardProgress.objects.create(user=other, flashcard=self.card, step_index=1,
+                                         times_reviewed=4, times_correct=4, confidence_level=4)
+        totals = FlashcardProgress.objects.values('user_id').annotate(n=Sum('times_reviewed'), c=Sum('times_correct'))
+        before = {row['user_id']: (row['n'], row['c']) for row in totals}
+
+        self.assertEqual(pack_step_rows(FlashcardProgress, batch_size=1), 3)
+        self.assertFalse(FlashcardProgress.objects.filter(step_index__gte=0).exists())
+        whole = self._whole()
+        self.assertEqual(whole.interval_days, 6)
+        self.assertEqual(unpack_steps(whole.step_state), [StepCounts(3, 2, 2), StepCounts(), StepCounts(1, 0, 0)])
+        other_whole = FlashcardProgress.objects.get(user=other, step_index=-1)
+        self.assertEqual((other_whole.times_reviewed, other_whole.confidence_level), (4, 4))
+        totals = FlashcardProgress.objects.values('user_id').annotate(n=Sum('times_reviewed'), c=Sum('times_correct'))
+        self.assertEqual({row['user_id']: (row['n'], row['c']) for row in totals}, before)
+
+        self.assertEqual(unpack_step_rows(FlashcardProgress), 3)
+        self.assertEqual(
+            FlashcardProgress.objects.get(user=self.user, step_index=0).times_reviewed, 3,
+        )
+        self.assertEqual((self._whole().times_reviewed, self._whole().step_state), (2, None))
+
+    def test_convert_command_follows_setting(self):
+        FlashcardProgress.objects.create(user=self.user, flashcard=self.card, step_index=1,
+                                         times_reviewed=2, times_correct=2, confidence_level=2)
+        out = StringIO()
+        call_command('convert_step_progress', stdout=out)
+        self.assertIn('Packed 1 per-step row(s)', out.getvalue())
+        self.assertEqual(unpack_steps(self._whole().step_state)[1], StepCounts(2, 2, 2))
+        with self.settings(COMPACT_STEP_PROGRESS=False):
+            call_command('convert_step_progress', stdout=out)
+        self.assertIn('Unpacked step_state into 1 per-step row(s)', out.getvalue())
+        self.assertEqual(FlashcardProgress.objects.get(user=self.user, step_index=1).times_reviewed, 2)
+        self.assertEqual(self._whole().times_reviewed, 0)
+
+    def test_benchmark_command_runs(self):
+        out = StringIO()
+        call_command('benchmark_step_progress', users=50, steps=3, stdout=out)
+        self.assertIn('Per-step rows:        200 rows', out.getvalue())
+        self.assertIn('Compact:               50 rows', out.getvalue())
+        self.assertIn('per-step rows 2.0, compact 2.0', out.getvalue())
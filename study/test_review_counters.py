@@ -0,0 +1,258 @@
+"""Tests for the per-topic review counters and the Today queue"""
+import datetime
+import json
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Course, Topic, Flashcard, FlashcardProgress, CourseEnrollment
+from .review_queue import TODAY_QUEUE_CHUNK_SIZE, decode_cursor, today_queue_chunk
+
+
+class TopicReviewCounterTest(TestCase):
+    """Tests for the incrementally maintained per-topic counters."""
+
+    def setUp(self):
+        from .models import TopicReviewCounter
+        self.Counter = TopicReviewCounter
+        self.system_user, _ = User.objects.get_or_create(
+            username='system', defaults={'email': 'system@system.local'}
+        )
+        self.user = User.objects.create_user(username='counter_user', password='pass')
+        self.course = Course.objects.create(name='Counter Course', created_by=self.system_user)
+        self.topic = Topic.objects.create(course=self.course, name='Counter Topic')
+        self.cards = [
+            Flashcard.objects.create(topic=self.topic, question=f'Q{i}', answer=f'A{i}')
+            for i in range(4)
+        ]
+        CourseEnrollment.objects.create(user=self.user, course=self.course)
+        self.client.login(username='counter_user', password='pass')
+
+    def _counter(self):
+        return self.Counter.objects.get(user=self.user, topic=self.topic)
+
+    def _assert_matches_rebuild(self):
+        from .counters import build_counters
+        counter = self._counter()
+        fresh = build_counters(self.user, [self.topic.id])[0]
+        self.assertEqual(
+            (counter.new_count, counter.learning_count, counter.learned_count, counter.due_by_date),
+            (fresh.new_count, fresh.learning_count, fresh.learned_count, fresh.due_by_date),
+        )
+
+    def test_topic_detail_builds_counter_on_first_read(self):
+        response = self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        self.assertEqual(response.context['due_count'], 0)
+        self.assertEqual(self._counter().new_count, 4)
+
+    def test_ratings_move_cards_between_buckets(self):
+        self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        self.client.post(f'/flashcard/{self.cards[0].id}/progress/', {'quality': 4}, secure=True)
+        self.client.post(
+            '/progress/batch/',
+            json.dumps({'reviews': [
+                {'flashcard_id': self.cards[1].id, 'quality': 4},
+                {'flashcard_id': self.cards[1].id, 'quality': 5},
+            ]}),
+            content_type='application/json', secure=True,
+        )
+        counter = self._counter()
+        self.assertEqual((counter.new_count, counter.learning_count, counter.learned_count), (2, 1, 1))
+        self._assert_matches_rebuild()
+
+    def test_never_seen_returns_card_to_new(self):
+        self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        self.client.post(f'/flashcard/{self.cards[0].id}/progress/', {'quality': 4}, secure=True)
+        self.client.post(f'/flashcard/{self.cards[0].id}/never-seen/', secure=True)
+        self.assertEqual(self._counter().new_count, 4)
+        self._assert_matches_rebuild()
+
+    def test_due_count_reads_due_buckets(self):
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.cards[0], step_index=-1,
+            sm2_repetitions=1, interval_days=1, next_review_date=datetime.date.today(),
+        )
+        response = self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        self.assertEqual(response.context['due_count'], 1)
+
+    def test_home_due_count_rebuilds_missing_counters(self):
+        # No counter rows yet, as right after a reschedule drops them.
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.cards[0], step_index=-1,
+            sm2_repetitions=1, interval_days=1, next_review_date=datetime.date.today(),
+        )
+        self.assertFalse(self.Counter.objects.filter(user=self.user).exists())
+        response = self.client.get('/', secure=True)
+        self.assertEqual(response.context['due_today'], 1)
+        self._assert_matches_rebuild()
+
+    def test_card_create_and_delete_update_counters(self):
+        self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        extra = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+        self.assertEqual(self._counter().new_count, 5)
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.cards[0], step_index=-1,
+            sm2_repetitions=3, interval_days=15, next_review_date=datetime.date.today(),
+        )
+        self.Counter.objects.all().delete()
+        self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        self.cards[0].delete()
+        extra.delete()
+        counter = self._counter()
+        self.assertEqual((counter.new_count, counter.learned_count, counter.due_by_date), (3, 0, {}))
+
+    def test_bulk_deletes_drop_each_topic_once(self):
+        other = Topic.objects.create(course=self.course, name='Other Topic')
+        Flashcard.objects.create(topic=other, question='Q', answer='A')
+        self.client.get(f'/course/{self.course.id}/', secure=True)
+        with CaptureQueriesContext(connection) as queries:
+            Flashcard.objects.filter(topic__course=self.course).delete()
+        # One DELETE per topic rather than a read and update per card
+        counter_queries = [q['sql'] for q in queries if 'study_topicreviewcounter' in q['sql']]
+        self.assertEqual(len(counter_queries), 2)
+        self.assertTrue(all(sql.startswith('DELETE') for sql in counter_queries))
+        self.assertFalse(self.Counter.objects.exists())
+        self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        self.assertEqual(self._counter().new_count, 0)
+
+    def test_saving_a_loaded_card_does_not_reread_it(self):
+        card = Flashcard.objects.get(id=self.cards[0].id)
+        card.hint = 'edited'
+        # Only the UPDATE (atomic savepoints aside): the previous topic is known from the load.
+        with self.assertNumQueries(1):
+            card.save(update_fields=['hint'])
+        self.client.get(f'/topic/{self.topic.id}/', secure=True)
+        other = Topic.objects.create(course=self.course, name='Other Topic')
+        card.topic = other
+        card.save()
+        self.assertFalse(self.Counter.objects.filter(topic=self.topic).exists())
+
+    def test_course_detail_reads_counts_in_one_query(self):
+        other = Topic.objects.create(course=self.course, name='Second Topic')
+        self.client.get(f'/course/{self.course.id}/', secure=True)
+        from .counters import get_topic_counters
+        with CaptureQueriesContext(connection) as ctx:
+            counters = get_topic_counters(self.user, [self.topic.id, other.id])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(counters[other.id].new_count, 0)
+
+    def test_reconcile_command_rebuilds_from_scratch(self):
+        from django.core.management import call_command
+        from io import StringIO
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.cards[0], step_index=-1,
+            sm2_repetitions=1, interval_days=1, next_review_date=datetime.date.today(),
+        )
+        self.Counter.objects.create(user=self.user, topic=self.topic, new_count=99)
+        call_command('reconcile_review_counters', stdout=StringIO())
+        self._assert_matches_rebuild()
+        self.assertEqual(self._counter().new_count, 3)
+
+
+class TodayReviewQueueTest(TestCase):
+    """Tests for the cross-course Today queue (study/review_queue.py)."""
+
+    def setUp(self):
+        self.system_user, _ = User.objects.get_or_create(
+            username='system', defaults={'email': 'system@system.local'}
+        )
+        self.user = User.objects.create_user(username='queue_user', password='pass')
+        self.today = datetime.date(2026, 3, 10)
+        self.topics = []
+        for n in range(2):
+            course = Course.objects.create(name=f'Queue Course {n}', created_by=self.system_user)
+            CourseEnrollment.objects.create(user=self.user, course=course)
+            self.topics.append(Topic.objects.create(course=course, name=f'Queue Topic {n}', order=1))
+        self.client.login(username='queue_user', password='pass')
+
+    def _due(self, topic, overdue_days, interval_days, user=None):
+        card = Flashcard.objects.create(topic=topic, question='Q', answer='A')
+        FlashcardProgress.objects.create(
+            user=user or self.user, flashcard=card, step_index=-1,
+            interval_days=interval_days, sm2_repetitions=2,
+            next_review_date=self.today - datetime.timedelta(days=overdue_days),
+        )
+        return card
+
+    def _walk(self, limit):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = today_queue_chunk(self.user, cursor, limit=limit, today=self.today)
+            seen.extend(p.flashcard_id for p in rows)
+            if cursor is None:
+                return seen
+
+    def test_orders_by_overdue_ratio_across_courses(self):
+        slow = self._due(self.topics[0], overdue_days=10, interval_days=60)   # 0.17
+        fast = self._due(self.topics[1], overdue_days=3, interval_days=1)     # 3.0
+        mid = self._due(self.topics[0], overdue_days=6, interval_days=6)      # 1.0
+        today = self._due(self.topics[1], overdue_days=0, interval_days=6)    # 0.0
+        rows, cursor = today_queue_chunk(self.user, today=self.today)
+        self.assertEqual([p.flashcard_id for p in rows], [fast.id, mid.id, slow.id, today.id])
+        self.assertIsNone(cursor)
+        self.assertEqual(rows[0].overdue_days, 3)
+
+    def test_excludes_future_unenrolled_and_step_rows(self):
+        due = self._due(self.topics[0], overdue_days=1, interval_days=1)
+        self._due(self.topics[0], overdue_days=-2, interval_days=1)
+        other = Course.objects.create(name='Not enrolled', created_by=self.system_user)
+        self._due(Topic.objects.create(course=other, name='T', order=1), 5, 1)
+        self._due(self.topics[0], 5, 1, user=User.objects.create_user(username='someone'))
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=due, step_index=0, next_review_date=self.today,
+        )
+        self.assertEqual(self._walk(limit=10), [due.id])
+
+    def test_keyset_pages_cover_queue_once_with_ties(self):
+        cards = [
+            self._due(self.topics[i % 2], overdue_days=i % 4, interval_days=(i % 3) * 2)
+            for i in range(23)
+        ]
+        single_page = self._walk(limit=100)
+        self.assertEqual(sorted(single_page), sorted(c.id for c in cards))
+        self.assertEqual(self._walk(limit=4), single_page)
+
+    def test_rescheduled_rows_do_not_shift_later_pages(self):
+        for i in range(6):
+            self._due(self.topics[0], overdue_days=i, interval_days=1)
+        expected = self._walk(limit=2)
+        rows, cursor = today_queue_chunk(self.user, limit=2, today=self.today)
+        FlashcardProgress.objects.filter(pk__in=[p.pk for p in rows]).update(
+            next_review_date=self.today + datetime.timedelta(days=5),
+        )
+        rest = []
+        while cursor:
+            page, cursor = today_queue_chunk(self.user, cursor, limit=2, today=self.today)
+            rest.extend(p.flashcard_id for p in page)
+        self.assertEqual(rest, expected[2:])
+
+    def test_decode_cursor_rejects_garbage(self):
+        for bad in ['', 'abc', '1-2', '1-0-3', '-1-2-3']:
+            with self.assertRaises(ValueError):
+                decode_cursor(bad)
+
+    def test_page_and_chunk_endpoint(self):
+        for i in range(TODAY_QUEUE_CHUNK_SIZE + 3):
+            self._due(self.topics[i % 2], overdue_days=0, interval_days=1)
+        FlashcardProgress.objects.update(next_review_date=datetime.date.today())
+        response = self.client.get('/review/today/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['flashcards_data']), TODAY_QUEUE_CHUNK_SIZE)
+        queue = response.context['queue']
+        self.assertEqual(queue['total'], TODAY_QUEUE_CHUNK_SIZE + 3)
+        self.assertIn('topic_name', response.context['flashcards_data'][0])
+
+        response = self.client.get('/review/today/cards/', {'cursor': queue['next_cursor']}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['cards']), 3)
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_page_redirects_home_when_nothing_due(self):
+        response = self.client.get('/review/today/', secure=True)
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+    def test_chunk_endpoint_rejects_bad_cursor(self):
+        response = self.client.get('/review/today/cards/', {'cursor': 'x'}, secure=True)
+        self.assertEqual(response.status_code, 400)
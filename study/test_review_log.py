@@ -0,0 +1,159 @@
+"""Tests for the buffered ReviewEvent log and its rollup"""
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.utils import timezone
+
+from .models import Course, Topic, Flashcard, CourseEnrollment, ReviewEvent, ReviewDailyAggregate
+from . import review_log
+
+# The buffer needs a cache shared between processes; a file cache is one.
+SHARED_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'study-tests-review-buffer')
+SHARED_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                             'LOCATION': SHARED_CACHE_DIR}}
+
+
+@override_settings(REVIEW_EVENT_FLUSH_SIZE=3, REVIEW_EVENT_FLUSH_SECONDS=3600, CACHES=SHARED_CACHES)
+# The file cache stands in for Redis, which the tests do not have.
+@mock.patch.object(review_log, 'BUFFER_BACKENDS', {'django.core.cache.backends.filebased.FileBasedCache'})
+class ReviewEventLogTest(TestCase):
+    """Tests for the buffered ReviewEvent log and its rollup."""
+
+    def setUp(self):
+        cache.clear()
+        self.system_user, _ = User.objects.get_or_create(
+            username='system', defaults={'email': 'system@system.local'}
+        )
+        self.user = User.objects.create_user(username='log_user', password='pass')
+        self.course = Course.objects.create(name='Log Course', created_by=self.system_user)
+        self.topic = Topic.objects.create(course=self.course, name='Log Topic', order=1)
+        self.card = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+        CourseEnrollment.objects.create(user=self.user, course=self.course)
+        self.client.login(username='log_user', password='pass')
+
+    def tearDown(self):
+        cache.clear()
+
+    def _rate(self, quality):
+        return self.client.post(
+            f'/flashcard/{self.card.id}/progress/', {'quality': quality}, secure=True,
+        )
+
+    def test_rating_is_buffered_until_size_threshold(self):
+        self._rate(4)
+        self._rate(4)
+        self.assertEqual(ReviewEvent.objects.count(), 0)
+        self.assertEqual(review_log.pending_count(), 2)
+
+        self._rate(1)
+        events = list(ReviewEvent.objects.order_by('reviewed_at', 'id'))
+        self.assertEqual(review_log.pending_count(), 0)
+        self.assertEqual(
+            [(e.quality, e.previous_interval, e.new_interval) for e in events],
+            [(4, 0, 1), (4, 1, 6), (1, 6, 1)],
+        )
+        self.assertEqual(events[0].user, self.user)
+        self.assertEqual(events[0].step_index, -1)
+
+    @override_settings(REVIEW_EVENT_FLUSH_SECONDS=0)
+    def test_time_threshold_flushes(self):
+        self._rate(5)
+        self.assertEqual(ReviewEvent.objects.count(), 1)
+
+    def test_batch_endpoint_logs_each_review(self):
+        self.client.post(
+            '/progress/batch/',
+            json.dumps({'reviews': [
+                {'flashcard_id': self.card.id, 'quality': 4, 'reviewed_at': '2026-01-01T10:00:00Z'},
+                {'flashcard_id': self.card.id, 'quality': 2, 'reviewed_at': '2026-01-01T10:01:00Z'},
+            ]}),
+            content_type='application/json',
+            secure=True,
+        )
+        self.assertEqual(review_log.pending_count(), 2)
+        self.assertEqual(review_log.flush_review_events(), 2)
+        events = list(ReviewEvent.objects.order_by('reviewed_at'))
+        self.assertEqual([(e.quality, e.previous_interval, e.new_interval) for e in events], [(4, 0, 1), (2, 1, 1)])
+        self.assertEqual(events[0].reviewed_at.isoformat(), '2026-01-01T10:00:00+00:00')
+
+    def _event(self, **extra):
+        event = dict(
+            user_id=self.user.id, flashcard_id=self.card.id, step_index=-1,
+            quality=4, previous_interval=0, new_interval=1,
+        )
+        event.update(extra)
+        return event
+
+    def test_missing_slot_stops_flush_once_then_is_skipped(self):
+        review_log.log_reviews([self._event(), self._event()])
+        cache.delete(review_log._slot_key(1))
+        self.assertEqual(review_log.flush_review_events(), 0)
+        self.assertEqual(review_log.pending_count(), 2)
+        self.assertEqual(review_log.flush_review_events(), 1)
+        self.assertEqual(review_log.pending_count(), 0)
+
+    def test_flush_from_another_cache_instance(self):
+        # The cron command's process reaches the buffer through its own cache connection.
+        review_log.log_reviews([self._event(), self._event(quality=2)])
+        with mock.patch.object(review_log, 'cache', FileBasedCache(SHARED_CACHE_DIR, {})):
+            self.assertEqual(review_log.pending_count(), 2)
+            self.assertEqual(review_log.flush_review_events(), 2)
+        self.assertEqual(review_log.pending_count(), 0)
+        self.assertEqual(sorted(ReviewEvent.objects.values_list('quality', flat=True)), [2, 4])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_without_redis_events_are_inserted_on_commit(self):
+        self.assertFalse(review_log.buffering_enabled())
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(review_log.log_reviews([self._event(), self._event()]), 2)
+            self.assertEqual(ReviewEvent.objects.count(), 0)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(ReviewEvent.objects.count(), 2)
+        out = StringIO()
+        call_command('flush_review_events', stdout=out)
+        self.assertIn('written directly', out.getvalue())
+
+    def test_events_for_deleted_cards_are_dropped(self):
+        other = Flashcard.objects.create(topic=self.topic, question='Q2', answer='A2')
+        review_log.log_reviews([self._event(), self._event(flashcard_id=other.id)])
+        other.delete()
+        self.assertEqual(review_log.flush_review_events(), 1)
+
+    def test_rollup_command_aggregates_and_deletes_old_events(self):
+        old = timezone.now() - datetime.timedelta(days=400)
+        old_day = timezone.localdate(old)
+        ReviewEvent.objects.bulk_create([
+            ReviewEvent(**self._event(reviewed_at=old, quality=5)),
+            ReviewEvent(**self._event(reviewed_at=old, quality=1, previous_interval=6)),
+            ReviewEvent(**self._event(reviewed_at=old + datetime.timedelta(days=1), quality=3)),
+            ReviewEvent(**self._event(reviewed_at=timezone.now())),
+        ])
+        ReviewDailyAggregate.objects.create(
+            user=self.user, date=old_day, review_count=1, correct_count=1, quality_counts=[0, 0, 0, 0, 1, 0],
+        )
+        out = StringIO()
+        call_command('rollup_review_events', months=6, stdout=out)
+        self.assertIn('Rolled up 3', out.getvalue())
+        self.assertEqual(ReviewEvent.objects.count(), 1)
+
+        first = ReviewDailyAggregate.objects.get(user=self.user, date=old_day)
+        self.assertEqual(
+            (first.review_count, first.correct_count, first.lapse_count, first.quality_counts),
+            (3, 2, 1, [0, 1, 0, 0, 1, 1]),
+        )
+        second = ReviewDailyAggregate.objects.get(user=self.user, date=old_day + datetime.timedelta(days=1))
+        self.assertEqual(second.quality_counts, [0, 0, 0, 1, 0, 0])
+
+    def test_months_ago_clamps_to_month_end(self):
+        from .management.commands.rollup_review_events import months_ago
+        self.assertEqual(months_ago(datetime.date(2026, 8, 31), 6), datetime.date(2026, 2, 28))
+        self.assertEqual(months_ago(datetime.date(2026, 3, 15), 3), datetime.date(2025, 12, 15))
@@ -0,0 +1,238 @@
+"""Tests for SM-2 re-scheduling and the review-load forecast"""
+import datetime
+import json
+from types import SimpleNamespace
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import (
+    Course, Topic, Flashcard, FlashcardProgress, CourseEnrollment,
+    SpacedRepetitionSettings,
+)
+from .views import _apply_sm2
+from .forecast import FORECAST_DAYS, due_histogram, least_loaded_interval, review_forecast
+from .progress_writes import record_review
+
+
+class SM2ReschedulingTest(TestCase):
+    """Tests for the vectorised SM-2 re-scheduler in study.utils.scheduling."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='resched_user', password='pass')
+        course = Course.objects.create(name='Resched Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Resched Topic')
+        self.review_day = datetime.date.today() - datetime.timedelta(days=3)
+
+    def _scheduled(self, ef=2.5, reps=3, interval=15):
+        card = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+        return FlashcardProgress.objects.create(
+            user=self.user, flashcard=card, step_index=-1,
+            easiness_factor=ef, sm2_repetitions=reps, interval_days=interval,
+            next_review_date=self.review_day + datetime.timedelta(days=interval),
+        )
+
+    def test_array_recurrence_matches_apply_sm2(self):
+        from .utils.scheduling import apply_sm2_arrays
+        states = [(2.5, 0, 0), (2.5, 1, 1), (2.36, 2, 6), (1.7, 5, 40), (1.3, 4, 20)]
+        for quality in range(6):
+            ef, interval, reps = apply_sm2_arrays(
+                [s[0] for s in states], [s[2] for s in states], [s[1] for s in states], quality,
+            )
+            for i, (s_ef, s_reps, s_interval) in enumerate(states):
+                progress = SimpleNamespace(easiness_factor=s_ef, sm2_repetitions=s_reps, interval_days=s_interval)
+                _apply_sm2(progress, quality)
+                self.assertAlmostEqual(ef[i], progress.easiness_factor)
+                self.assertEqual(interval[i], progress.interval_days)
+                self.assertEqual(reps[i], progress.sm2_repetitions)
+
+    def test_arrays_match_scalar_reference(self):
+        from .utils.scheduling import reschedule_arrays, reschedule_row
+        ef = [1.3, 1.3, 1.3, 2.5, 3.0]
+        reps = [0, 2, 5, 8, 12]
+        interval = [1, 6, 40, 300, 120]
+        due = ['2030-01-01'] * 5
+        new_ef, new_interval, _ = reschedule_arrays(ef, reps, interval, due, 1.5, 180)
+        expected = [reschedule_row(*row, 1.5, 180) for row in zip(ef, reps, interval)]
+        self.assertEqual(list(zip(new_ef.tolist(), new_interval.tolist())), expected)
+        self.assertEqual([days for _, days in expected], [1, 6, 46, 180, 120])
+
+    def test_real_history_is_kept_when_settings_do_not_affect_it(self):
+        from .utils.scheduling import reschedule_progress
+        card = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+        progress = FlashcardProgress(user=self.user, flashcard=card, step_index=-1)
+        for quality in [4, 3, 3, 3, 3]:
+            _apply_sm2(progress, quality, today=self.review_day)
+        progress.save()
+        # The EF fell with every 3, so the intervals were not grown at the final EF.
+        self.assertEqual(progress.interval_days, 52)
+        settings = SpacedRepetitionSettings.objects.create(user=self.user)
+        self.assertEqual(reschedule_progress(user_ids=[self.user.id]), 0)
+
+        settings.max_interval_days = 30
+        settings.save()
+        self.assertEqual(reschedule_progress(user_ids=[self.user.id]), 1)
+        progress.refresh_from_db()
+        self.assertEqual(progress.interval_days, 30)
+        self.assertEqual(progress.next_review_date, self.review_day + datetime.timedelta(days=30))
+
+    def test_lower_max_interval_pulls_due_dates_in(self):
+        from .utils.scheduling import reschedule_progress
+        progress = self._scheduled(reps=8, interval=300)
+        SpacedRepetitionSettings.objects.create(user=self.user, max_interval_days=30)
+        self.assertEqual(reschedule_progress(user_ids=[self.user.id]), 1)
+        progress.refresh_from_db()
+        self.assertEqual(progress.interval_days, 30)
+        self.assertEqual(progress.next_review_date, self.review_day + datetime.timedelta(days=30))
+
+    def test_higher_ease_modifier_lifts_easiness(self):
+        from .utils.scheduling import reschedule_progress
+        progress = self._scheduled(ef=1.3, reps=3, interval=8)
+        SpacedRepetitionSettings.objects.create(user=self.user, ease_modifier=2)
+        reschedule_progress()
+        progress.refresh_from_db()
+        self.assertAlmostEqual(progress.easiness_factor, 1.5)
+        self.assertEqual(progress.interval_days, 9)
+
+    def test_unchanged_rows_are_not_written(self):
+        from .utils.scheduling import reschedule_progress
+        self._scheduled(ef=2.5, reps=3, interval=15)
+        self.assertEqual(reschedule_progress(), 0)
+
+    def test_settings_change_reschedules_existing_cards(self):
+        progress = self._scheduled(reps=8, interval=300)
+        self.client.login(username='resched_user', password='pass')
+        self.client.post('/settings/spaced-repetition/', {
+            'ease_modifier': 0, 'max_interval_days': 60, 'daily_new_cards': 20,
+        }, secure=True)
+        progress.refresh_from_db()
+        self.assertEqual(progress.interval_days, 60)
+
+    def test_management_command_reschedules_all_users(self):
+        from django.core.management import call_command
+        from io import StringIO
+        self._scheduled(reps=8, interval=500)
+        out = StringIO()
+        call_command('reschedule_reviews', stdout=out)
+        self.assertIn('Re-scheduled 1 card', out.getvalue())
+
+
+class ReviewForecastTest(TestCase):
+    """Tests for the review-load forecast and due-date load balancing."""
+
+    def setUp(self):
+        cache.clear()
+        self.system_user, _ = User.objects.get_or_create(
+            username='system', defaults={'email': 'system@system.local'}
+        )
+        self.user = User.objects.create_user(username='forecast_user', password='pass')
+        course = Course.objects.create(name='Forecast Course', created_by=self.system_user)
+        self.topic = Topic.objects.create(course=course, name='Forecast Topic', order=1)
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        self.today = datetime.date.today()
+        self.client.login(username='forecast_user', password='pass')
+
+    def tearDown(self):
+        cache.clear()
+
+    def _schedule(self, days_from_today, count=1, step_index=-1):
+        for _ in range(count):
+            card = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+            FlashcardProgress.objects.create(
+                user=self.user, flashcard=card, step_index=step_index, interval_days=6,
+                next_review_date=self.today + datetime.timedelta(days=days_from_today),
+            )
+
+    def test_forecast_counts_per_day_with_overdue_on_today(self):
+        self._schedule(-3, count=2)
+        self._schedule(0)
+        self._schedule(5, count=4)
+        self._schedule(5, step_index=0)
+        self._schedule(200)
+        forecast = review_forecast(self.user.id)
+        self.assertEqual(len(forecast), FORECAST_DAYS)
+        self.assertEqual(forecast[0], {'date': self.today.isoformat(), 'due': 3})
+        self.assertEqual(forecast[5]['due'], 4)
+        self.assertEqual(sum(day['due'] for day in forecast), 7)
+
+    def test_histogram_is_cached(self):
+        self._schedule(1)
+        due_histogram(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(review_forecast(self.user.id, days=3)[1]['due'], 1)
+
+    def test_forecast_api(self):
+        self._schedule(2, count=3)
+        response = self.client.get('/api/forecast/', {'days': 7}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['days']), 7)
+        self.assertEqual(data['days'][2]['due'], 3)
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(
+            self.client.get('/api/forecast/', {'days': 'x'}, secure=True).status_code, 400,
+        )
+
+    def test_least_loaded_interval_picks_quietest_day_in_window(self):
+        # Interval 40 -> window 38..42; 41 is empty, everything else is busy.
+        for offset in (38, 39, 40, 42):
+            self._schedule(offset, count=3)
+        self.assertEqual(least_loaded_interval(self.user.id, 40, 365), 41)
+
+    def test_ratings_move_cards_in_cached_histogram(self):
+        settings = SpacedRepetitionSettings.objects.create(user=self.user, load_balance=True)
+        self._schedule(-2)
+        self._schedule(40, count=3)
+        progress = FlashcardProgress.objects.get(next_review_date__lt=self.today)
+        progress.sm2_repetitions, progress.interval_days = 3, 16
+        progress.save()
+        histogram = due_histogram(self.user.id)
+        self.assertEqual(histogram[self.today.isoformat()], 1)
+
+        # 16 * 2.5 = 40 is busy; the overdue card leaves today and lands on 39 (the window is 38..42).
+        _, sr_row = record_review(self.user.id, progress.flashcard_id, 4, settings)
+        self.assertEqual(sr_row.interval_days, 39)
+        histogram = due_histogram(self.user.id)
+        self.assertNotIn(self.today.isoformat(), histogram)
+        self.assertEqual(histogram[(self.today + datetime.timedelta(days=39)).isoformat()], 1)
+
+        # A batch rating moves the card again, off day 39.
+        self.client.post('/progress/batch/', json.dumps({'reviews': [
+            {'flashcard_id': progress.flashcard_id, 'quality': 1},
+        ]}), content_type='application/json', secure=True)
+        histogram = due_histogram(self.user.id)
+        self.assertNotIn((self.today + datetime.timedelta(days=39)).isoformat(), histogram)
+        self.assertEqual(histogram[(self.today + datetime.timedelta(days=1)).isoformat()], 1)
+        self.assertEqual(sum(histogram.values()), 4)
+
+    def test_least_loaded_interval_prefers_computed_day_on_ties(self):
+        self.assertEqual(least_loaded_interval(self.user.id, 40, 365), 40)
+
+    def test_short_intervals_and_cap_are_respected(self):
+        self._schedule(1, count=5)
+        self.assertEqual(least_loaded_interval(self.user.id, 1, 365), 1)
+        self._schedule(30, count=5)
+        self.assertEqual(least_loaded_interval(self.user.id, 30, 30), 29)
+
+    def test_apply_sm2_balances_only_when_enabled(self):
+        settings = SpacedRepetitionSettings.objects.create(user=self.user)
+        self._schedule(15, count=5)
+        card = Flashcard.objects.create(topic=self.topic, question='Q', answer='A')
+        progress = FlashcardProgress(
+            user=self.user, flashcard=card, sm2_repetitions=3, interval_days=6, easiness_factor=2.5,
+        )
+        _apply_sm2(progress, 4, settings)
+        self.assertEqual(progress.interval_days, 15)
+
+        settings.load_balance = True
+        progress.sm2_repetitions, progress.interval_days = 3, 6
+        _apply_sm2(progress, 4, settings)
+        self.assertEqual(progress.interval_days, 14)
+        self.assertEqual(progress.next_review_date, self.today + datetime.timedelta(days=14))
+
+    def test_settings_view_saves_load_balance(self):
+        self.client.post('/settings/spaced-repetition/', {
+            'ease_modifier': 0, 'max_interval_days': 365, 'daily_new_cards': 20, 'load_balance': 'on',
+        }, secure=True)
+        self.assertTrue(SpacedRepetitionSettings.objects.get(user=self.user).load_balance)
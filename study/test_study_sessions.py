@@ -0,0 +1,242 @@
+"""Tests for study sessions, their queues and cached card payloads"""
+import datetime
+import json
+from io import StringIO
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from .models import (
+    Course, Topic, Flashcard, FlashcardProgress, CourseEnrollment,
+    SpacedRepetitionSettings, FlashcardVote, StudySession,
+)
+from .card_payloads import get_payloads
+from .views import STUDY_CHUNK_SIZE
+from .session_queue import unpack_queue
+
+
+class CardPayloadCacheTest(TestCase):
+    """Static per-card payloads are cached and merged with per-user fields (study/card_payloads.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='payload_user', password='pass')
+        course = Course.objects.create(name='Payload Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Payload Topic', order=1)
+        self.card = Flashcard.objects.create(
+            topic=self.topic, question='<svg>big</svg>', answer='A', hint='H', question_type='standard',
+        )
+        self.steps = Flashcard.objects.create(
+            topic=self.topic, question='Solve', answer='x', question_type='step_by_step',
+            steps=[{'move': 'one'}, {'move': 'two', 'detail': 'd'}],
+        )
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        self.client.login(username='payload_user', password='pass')
+
+    def _session_cards(self):
+        response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return {(c['id'], c['step_index']): c for c in response.context['flashcards_data']}
+
+    def test_payloads_served_from_cache(self):
+        light = list(Flashcard.objects.filter(topic=self.topic).only('id', 'topic', 'question_type', 'updated_at'))
+        get_payloads(light)
+        with self.assertNumQueries(0):
+            payloads = get_payloads(light)
+        self.assertEqual(payloads[self.card.id]['entries'][0]['question'], '<svg>big</svg>')
+        self.assertEqual([e['answer'] for e in payloads[self.steps.id]['entries']], ['one', 'two'])
+
+    def test_edit_invalidates_payload(self):
+        self._session_cards()
+        self.card.question = 'Edited'
+        self.card.save()
+        self.assertEqual(self._session_cards()[(self.card.id, -1)]['question'], 'Edited')
+
+    def test_user_fields_are_not_cached(self):
+        other = User.objects.create_user(username='payload_voter')
+        FlashcardVote.objects.create(user=other, flashcard=self.card, vote=1)
+        cards = self._session_cards()
+        self.assertEqual(cards[(self.card.id, -1)]['net_votes'], 1)
+        self.assertEqual(cards[(self.steps.id, 1)]['answer_detail'], 'd')
+        FlashcardProgress.objects.create(user=self.user, flashcard=self.card, interval_days=6,
+                                         next_review_date=datetime.date.today())
+        FlashcardVote.objects.create(user=self.user, flashcard=self.card, vote=1)
+        card = self._session_cards()[(self.card.id, -1)]
+        self.assertEqual((card['net_votes'], card['user_vote'], card['interval_days']), (2, 1, 6))
+
+
+class StudySessionChunkTest(TestCase):
+    """The study page embeds the first chunk of the deck; the rest comes from study_session_cards."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='chunk_user', password='pass')
+        course = Course.objects.create(name='Chunk Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Chunk Topic', order=1)
+        for n in range(2 * STUDY_CHUNK_SIZE + 3):
+            Flashcard.objects.create(topic=self.topic, question=f'Q{n}', answer='A', question_type='standard')
+        Flashcard.objects.create(
+            topic=self.topic, question='Steps', answer='A', question_type='step_by_step',
+            steps=[{'move': 'one'}, {'move': 'two'}],
+        )
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        SpacedRepetitionSettings.objects.create(user=self.user, daily_new_cards=100)
+        self.client.login(username='chunk_user', password='pass')
+
+    def test_page_embeds_first_chunk_and_endpoint_serves_rest(self):
+        response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+        queue = response.context['queue']
+        self.assertEqual(queue['total'], 2 * STUDY_CHUNK_SIZE + 5)
+        self.assertEqual(queue['next_cursor'], str(STUDY_CHUNK_SIZE))
+        seen = [(card['id'], card['step_index']) for card in response.context['flashcards_data']]
+        self.assertEqual(len(seen), STUDY_CHUNK_SIZE)
+
+        cursor = queue['next_cursor']
+        while cursor is not None:
+            data = self.client.get(queue['chunk_url'], {'cursor': cursor}, secure=True).json()
+            seen += [(card['id'], card['step_index']) for card in data['cards']]
+            cursor = data['next_cursor']
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), queue['total'])
+        self.assertEqual({card_id for card_id, _ in seen},
+                         set(Flashcard.objects.filter(topic=self.topic).values_list('id', flat=True)))
+
+    def test_chunks_are_private_and_validated(self):
+        queue = self.client.get(f'/study/{self.topic.id}/', secure=True).context['queue']
+        self.assertEqual(self.client.get(queue['chunk_url'], {'cursor': 'x'}, secure=True).status_code, 400)
+        User.objects.create_user(username='chunk_other', password='pass')
+        self.client.login(username='chunk_other', password='pass')
+        self.assertEqual(self.client.get(queue['chunk_url'], {'cursor': '10'}, secure=True).status_code, 404)
+
+
+class StudySessionQueueTest(TestCase):
+    """A study session stores its queue and cursor so re-opening the topic resumes it."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='queue_user', password='pass')
+        course = Course.objects.create(name='Queue Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Queue Topic', order=1)
+        for n in range(6):
+            Flashcard.objects.create(topic=self.topic, question=f'Q{n}', answer='A', question_type='standard')
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        self.client.login(username='queue_user', password='pass')
+
+    def _open(self, **params):
+        return self.client.get(f'/study/{self.topic.id}/', params, secure=True)
+
+    def _rate(self, queue, cards, quality=4, start=0):
+        """Post ratings the way the page does; returns the created or existing session."""
+        body = {'reviews': [
+            {'flashcard_id': card['id'], 'step_index': card['step_index'], 'quality': quality,
+             'position': start + n}
+            for n, card in enumerate(cards)
+        ]}
+        body.update({'session': queue['session_id']} if queue['session_id'] else {'deck': queue['deck']})
+        data = self.client.post('/progress/batch/', json.dumps(body),
+                                content_type='application/json', secure=True).json()
+        return StudySession.objects.get(id=data['session']['id'] if 'session' in data else queue['session_id'])
+
+    def test_session_is_created_by_first_rating(self):
+        first = self._open()
+        self._open(mode='quiz')
+        self.assertIsNone(first.context['session'])
+        self.assertFalse(StudySession.objects.filter(user=self.user).exists())
+
+        session = self._rate(first.context['queue'], first.context['flashcards_data'][:2])
+        self.assertEqual((session.review_count, session.queue_cursor), (2, 2))
+        self.assertEqual(StudySession.objects.filter(user=self.user).count(), 1)
+
+    def test_reopening_resumes_stored_queue_at_cursor(self):
+        first = self._open()
+        order = [card['id'] for card in first.context['flashcards_data']]
+        self.assertEqual([card['id'] for card in self._open().context['flashcards_data']], order)
+        session = self._rate(first.context['queue'], first.context['flashcards_data'][:2])
+
+        again = self._open(mode='quiz')
+        self.assertEqual(again.context['session'].id, session.id)
+        self.assertEqual(again.context['queue']['offset'], 2)
+        self.assertEqual([card['id'] for card in again.context['flashcards_data']], order[2:])
+        self.assertEqual(StudySession.objects.filter(user=self.user).count(), 1)
+
+    def test_forgotten_card_is_queued_again_server_side(self):
+        first = self._open()
+        card = first.context['flashcards_data'][0]
+        session = self._rate(first.context['queue'], [card], quality=1)
+
+        entries = unpack_queue(session.queue)
+        self.assertEqual(len(entries), 7)
+        self.assertEqual(entries[3], (card['id'], -1))
+        self.assertEqual(session.queue_cursor, 1)
+        self.assertEqual(self._open().context['queue']['total'], 7)
+
+    def test_ended_sessions_are_not_resumed(self):
+        first = self._open()
+        session = self._rate(first.context['queue'], first.context['flashcards_data'][:1])
+        self.client.post(f'/session/{session.id}/end/', {'cards_studied': 1}, secure=True)
+        self.assertIsNone(self._open().context['session'])
+
+
+class CloseIdleSessionsTest(TestCase):
+    """close_idle_sessions ends idle sessions with reviews and deletes those without; streaks skip empty ones."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='idle_user', password='pass')
+        course = Course.objects.create(name='Idle Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Idle Topic', order=1)
+
+    def test_idle_sessions_are_ended_or_deleted(self):
+        long_ago = timezone.now() - datetime.timedelta(days=1)
+        reviewed = StudySession.objects.create(user=self.user, topic=self.topic, review_count=4,
+                                               last_review_at=long_ago)
+        empty = StudySession.objects.create(user=self.user, topic=self.topic)
+        StudySession.objects.filter(id=empty.id).update(started_at=long_ago)
+        active = StudySession.objects.create(user=self.user, topic=self.topic, review_count=1,
+                                             last_review_at=timezone.now())
+
+        call_command('close_idle_sessions', stdout=StringIO())
+
+        reviewed.refresh_from_db()
+        self.assertEqual((reviewed.ended_at, reviewed.cards_studied), (long_ago, 4))
+        self.assertFalse(StudySession.objects.filter(id=empty.id).exists())
+        active.refresh_from_db()
+        self.assertIsNone(active.ended_at)
+
+    def test_streak_counts_only_sessions_with_reviews(self):
+        from .views import _calculate_streak
+        StudySession.objects.create(user=self.user, topic=self.topic)
+        self.assertEqual(_calculate_streak(self.user), 0)
+        StudySession.objects.create(user=self.user, topic=self.topic, review_count=1)
+        self.assertEqual(_calculate_streak(self.user), 1)
+
+
+class StudyDeckAssemblyTest(TestCase):
+    """New cards are sampled in the database by random_key; seen cards are all kept."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='deck_user', password='pass')
+        course = Course.objects.create(name='Deck Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Deck Topic', order=1)
+        self.cards = [
+            Flashcard.objects.create(topic=self.topic, question=f'Q{n}', answer='A', question_type='standard')
+            for n in range(30)
+        ]
+        for card in self.cards[:3]:
+            FlashcardProgress.objects.create(user=self.user, flashcard=card, step_index=-1, times_reviewed=1)
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        SpacedRepetitionSettings.objects.create(user=self.user, daily_new_cards=5)
+        self.client.login(username='deck_user', password='pass')
+
+    def test_deck_has_seen_cards_and_capped_new_sample(self):
+        queue = self.client.get(f'/study/{self.topic.id}/', secure=True).context['queue']
+        self.assertEqual(queue['total'], 3 + 5)
+        ids = {card['id'] for card in self.client.get(queue['chunk_url'], secure=True).json()['cards']}
+        self.assertTrue({card.id for card in self.cards[:3]} <= ids)
+
+    def test_new_card_sample_wraps_around_the_key_range(self):
+        from .views import _random_sample
+        # Every key is below any random start, so the sample comes from the wrap-around query.
+        Flashcard.objects.filter(topic=self.topic).update(random_key=0.0)
+        sample = _random_sample(Flashcard.objects.filter(topic=self.topic), 4)
+        self.assertEqual(len(sample), 4)
@@ -0,0 +1,136 @@
+"""Tests for pre-generated and seeded parameterized variants"""
+import datetime
+import json
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+
+from .models import (
+    Course, Topic, Flashcard, FlashcardProgress, CourseEnrollment,
+    StudySession, ParameterizedVariant,
+)
+from .utils import ParameterGenerator
+
+
+class ParameterizedVariantPoolTest(TestCase):
+    """The Today queue takes pre-generated variants and falls back to live generation (study/variant_pool.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='variant_user', password='pass')
+        course = Course.objects.create(name='Variant Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Variant Topic', order=1)
+        self.card = Flashcard.objects.create(
+            topic=self.topic, question='fallback', answer='fallback', question_type='parameterized',
+            parameter_spec={'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 9}}},
+            question_template='What is {a}?', answer_template='{a}',
+        )
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        FlashcardProgress.objects.create(
+            user=self.user, flashcard=self.card, step_index=-1,
+            sm2_repetitions=1, interval_days=1, next_review_date=datetime.date.today(),
+        )
+        self.client.login(username='variant_user', password='pass')
+
+    def _question(self):
+        response = self.client.get('/review/today/', secure=True)
+        return response.context['flashcards_data'][0]['question']
+
+    @override_settings(PARAMETERIZED_VARIANT_LOW_WATER=0)
+    def test_command_fills_pool_and_page_takes_a_variant(self):
+        call_command('fill_variant_pools', size=3, stdout=StringIO())
+        self.assertEqual(self.card.variants.count(), 3)
+        stored = set(self.card.variants.values_list('question', flat=True))
+
+        self.assertIn(self._question(), stored)
+        self.assertEqual(self.card.variants.count(), 2)
+
+    @override_settings(PARAMETERIZED_VARIANT_POOL_SIZE=5, PARAMETERIZED_VARIANT_LOW_WATER=3)
+    def test_pool_below_low_water_is_topped_up_by_the_command(self):
+        call_command('fill_variant_pools', size=3, stdout=StringIO())
+        self._question()
+        self.assertEqual(self.card.variants.count(), 2)  # Not refilled during the request
+        out = StringIO()
+        call_command('fill_variant_pools', low=True, stdout=out)
+        self.assertIn('Generated 3 variant(s) for 1 card(s)', out.getvalue())
+        self.assertEqual(self.card.variants.count(), 5)
+        call_command('fill_variant_pools', low=True, stdout=out)
+        self.assertIn('Generated 0 variant(s) for 0 card(s)', out.getvalue())
+
+    def test_empty_pool_generates_live(self):
+        self.assertRegex(self._question(), r'^What is [1-9]\?$')
+
+    def test_editing_card_empties_pool(self):
+        call_command('fill_variant_pools', size=2, stdout=StringIO())
+        self.card.hint = 'Unrelated edit'
+        self.card.save()
+        self.assertEqual(self.card.variants.count(), 2)
+        self.card.question_template = 'Now {a}?'
+        self.card.save()
+        self.assertFalse(ParameterizedVariant.objects.filter(flashcard=self.card).exists())
+
+
+class SeededVariantTest(TestCase):
+    """Parameterized values follow a (user, card, session) seed on study pages."""
+
+    SPEC = {'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 10 ** 6}}}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='seed_user', password='pass')
+        course = Course.objects.create(name='Seed Course', created_by=self.user)
+        self.topic = Topic.objects.create(course=course, name='Seed Topic', order=1)
+        self.card = Flashcard.objects.create(
+            topic=self.topic, question='fallback', answer='fallback', question_type='parameterized',
+            parameter_spec=self.SPEC, question_template='What is {a}?', answer_template='{a}',
+        )
+        CourseEnrollment.objects.create(user=self.user, course=course)
+        self.client.login(username='seed_user', password='pass')
+
+    def test_same_seed_same_values(self):
+        first = ParameterGenerator(self.SPEC, seed=42)
+        second = ParameterGenerator(self.SPEC, seed=42)
+        self.assertEqual([first.generate() for _ in range(3)], [second.generate() for _ in range(3)])
+        self.assertEqual(ParameterGenerator(self.SPEC, seed=7).generate_batch(5),
+                         ParameterGenerator(self.SPEC, seed=7).generate_batch(5))
+        self.assertNotEqual(ParameterGenerator(self.SPEC, seed=1).generate_batch(5),
+                            ParameterGenerator(self.SPEC, seed=2).generate_batch(5))
+
+    def test_session_shows_the_same_variant_until_it_ends(self):
+        def question():
+            response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+            return response.context['flashcards_data'][0]['question']
+
+        shown = question()
+        cache.clear()  # Regenerated from the seed, not only served from the cache
+        self.assertEqual(question(), shown)
+
+        deck_seed = self.client.session['study_decks'][f'{self.topic.id}:0']['variant_seed']
+        self.client.post('/progress/batch/', data=json.dumps({
+            'deck': f'{self.topic.id}:0',
+            'reviews': [{'flashcard_id': self.card.id, 'quality': 5, 'position': 0}],
+        }), content_type='application/json', secure=True)
+        self.assertEqual(StudySession.objects.get(user=self.user).variant_seed, deck_seed)
+
+    def test_session_picks_its_variant_from_the_pool(self):
+        call_command('fill_variant_pools', size=5, stdout=StringIO())
+        pool = set(self.card.variants.values_list('question', flat=True))
+        with mock.patch('study.variant_pool.generate_parameterized_card') as generate:
+            response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+            shown = response.context['flashcards_data'][0]['question']
+            cache.clear()
+            response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+        generate.assert_not_called()
+        self.assertIn(shown, pool)
+        self.assertEqual(response.context['flashcards_data'][0]['question'], shown)
+        self.assertEqual(self.card.variants.count(), 5)  # Picked, not taken
+
+    def test_failed_seeded_variant_shows_template(self):
+        with mock.patch('study.views.seeded_variants', return_value={}):
+            response = self.client.get(f'/study/{self.topic.id}/', secure=True)
+        entry = response.context['flashcards_data'][0]
+        self.assertEqual((entry['question'], entry['answer']), ('What is {a}?', '{a}'))
@@ -0,0 +1,90 @@
+"""Tests for parameterized card worksheets"""
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+from .models import Course, Topic, Flashcard
+from .worksheets import generate_variants, worksheet_cards, worksheet_document
+
+
+class WorksheetTest(TestCase):
+    """Worksheets of parameterized cards (study/worksheets.py)."""
+
+    def setUp(self):
+        self.staff = User.objects.create_user(username='worksheet_staff', password='pass', is_staff=True)
+        course = Course.objects.create(name='Worksheet Course', created_by=self.staff)
+        self.topic = Topic.objects.create(course=course, name='Worksheet Topic', order=1)
+        for n in range(3):
+            Flashcard.objects.create(
+                topic=self.topic, question='q', answer='a', question_type='parameterized',
+                parameter_spec={
+                    'variables': {
+                        'a': {'type': 'random_int', 'min': 1, 'max': 99},
+                        'b': {'type': 'computed', 'formula': f'a * {n + 2}'},
+                    },
+                },
+                question_template=f'What is {{a}} times {n + 2}?', answer_template='{b}',
+            )
+
+    def test_variants_are_reproducible_in_and_out_of_the_pool(self):
+        cards = list(worksheet_cards(topic_id=self.topic.id))
+        inline = generate_variants(cards, 20, seed=5, processes=1)
+        self.assertEqual([len(result.variants) for result in inline], [20, 20, 20])
+        self.assertEqual(inline, generate_variants(cards, 20, seed=5, processes=2))
+        self.assertNotEqual(inline, generate_variants(cards, 20, seed=6, processes=1))
+
+    def test_command_writes_worksheet_and_answer_key(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'exam.tex')
+            out = StringIO()
+            call_command('generate_worksheets', topic=self.topic.id, variants=4, format='latex',
+                         output=output, processes=1, stdout=out)
+            with open(output) as f:
+                worksheet = f.read()
+            with open(os.path.join(directory, 'exam-answers.tex')) as f:
+                answers = f.read()
+        self.assertIn('Generated 12 variant(s) of 3 card(s)', out.getvalue())
+        self.assertEqual(worksheet.count('\\item What is'), 12)
+        self.assertEqual(answers.count('\\item'), 12)
+        self.assertNotIn('What is', answers)
+
+    def test_latex_cards_pass_through_and_plain_text_is_escaped(self):
+        spec = {'variables': {'a': {'type': 'random_int', 'min': 1, 'max': 1}}}
+        Flashcard.objects.create(
+            topic=self.topic, question='q', answer='a', question_type='parameterized', parameter_spec=spec,
+            uses_latex=True, question_template=r'Solve $\begin{aligned} x &= {a} \\ y &= 2 \end{aligned}$',
+            answer_template='$x^2$',
+        )
+        Flashcard.objects.create(
+            topic=self.topic, question='q', answer='a', question_type='parameterized', parameter_spec=spec,
+            question_template='50% of {a} & #1_x ^ ~ \\ {{b}} $5', answer_template='{a}',
+        )
+        results = generate_variants(list(worksheet_cards(topic_id=self.topic.id))[3:], 1, processes=1)
+        document = ''.join(worksheet_document(results, 'Q&A', fmt='latex'))
+        self.assertIn(r'\section*{Q\&A}', document)
+        self.assertIn(r'\item Solve $\begin{aligned} x &= 1 \\ y &= 2 \end{aligned}$', document)
+        self.assertIn(
+            r'\item 50\% of 1 \& \#1\_x \textasciicircum{} \textasciitilde{} '
+            r'\textbackslash{} \{\{b\}\} \$5', document)
+
+    def test_view_streams_for_staff_only(self):
+        url = f'/topic/{self.topic.id}/worksheet/?variants=2&answers=1'
+        User.objects.create_user(username='worksheet_student', password='pass')
+        self.client.login(username='worksheet_student', password='pass')
+        self.assertEqual(self.client.get(url, secure=True).status_code, 403)
+
+        self.client.login(username='worksheet_staff', password='pass')
+        response = self.client.get(url, secure=True)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('answer key', body)
+        self.assertEqual(body.count('<li>'), 6)
+
+        with mock.patch('study.views.MAX_VIEW_VARIANTS', 5):
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(b'generate_worksheets', response.content)
@@ -1,6 +1,6 @@
 import json
 from types import SimpleNamespace
-from django.test import TestCase, TransactionTestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.db import connection
 from django.db.models import Q
@@ -182,6 +182,24 @@ class TemplateRendererTestCase(TestCase):
         result = renderer.render(template, values)
         self.assertEqual(result, "42")
 
+    def test_format_specs(self):
+        """Test placeholders with Python and engineering format specs"""
+        renderer = TemplateRenderer()
+        template = "R = {R:.3g} ohm, I = {I:eng} A, n = {n:03d}, V = {I:.2eng}"
+        values = {'R': 1234.5678, 'I': 0.004712, 'n': 7}
+        
+        result = renderer.render(template, values)
+        self.assertEqual(result, "R = 1.23e+03 ohm, I = 4.71e-3 A, n = 007, V = 4.7e-3")
+    
+    def test_values_and_braces_are_not_substituted_twice(self):
+        """Test that substituted text and other braces are left alone"""
+        renderer = TemplateRenderer()
+        template = "{a} and {b} in \\frac{1}{2}, {missing}, {a:d}"
+        values = {'a': '{b}', 'b': 2}
+        
+        result = renderer.render(template, values)
+        self.assertEqual(result, "{b} and 2 in \\frac{1}{2}, {missing}, {a:d}")
+
 
 class GenerateParameterizedCardTestCase(TestCase):
     """Test complete parameterized card generation"""
@@ -683,6 +701,7 @@ class ProgressUpdateAjaxTest(TestCase):
         data = json.loads(response.content)
         self.assertIn('confidence_level', data)
 
+    @override_settings(COMPACT_STEP_PROGRESS=False)
     def test_progress_update_with_step_index(self):
         response = self.client.post(
             f'/flashcard/{self.card.id}/progress/',
@@ -31,16 +31,24 @@ urlpatterns = [
     path('flashcard/<int:flashcard_id>/vote/', views.vote_flashcard, name='vote_flashcard'),
     path('flashcard/<int:flashcard_id>/comment/', views.comment_flashcard, name='comment_flashcard'),
     path('topic/<int:topic_id>/suggest-card/', views.suggest_card, name='suggest_card'),
+    path('topic/<int:topic_id>/worksheet/', views.worksheet_download, name='topic_worksheet'),
+    path('course/<int:course_id>/worksheet/', views.worksheet_download, name='course_worksheet'),
     
     # Study Session URLs
     path('study/<int:topic_id>/', views.study_session, name='study_session'),
     path('study/<int:topic_id>/review/', views.review_session, name='review_session'),
+    path('study/<int:topic_id>/cards/', views.study_deck_cards, name='study_deck_cards'),
+    path('review/today/', views.review_today, name='review_today'),
+    path('review/today/cards/', views.review_today_cards, name='review_today_cards'),
+    path('session/<int:session_id>/cards/', views.study_session_cards, name='study_session_cards'),
     path('session/<int:session_id>/end/', views.end_study_session, name='end_study_session'),
     path('flashcard/<int:flashcard_id>/progress/', views.update_flashcard_progress, name='update_flashcard_progress'),
+    path('progress/batch/', views.update_flashcard_progress_batch, name='update_flashcard_progress_batch'),
     path('flashcard/<int:flashcard_id>/never-seen/', views.mark_card_never_seen, name='mark_card_never_seen'),
 
     # Spaced Repetition Settings
     path('settings/spaced-repetition/', views.spaced_repetition_settings, name='spaced_repetition_settings'),
+    path('api/forecast/', views.review_forecast_api, name='review_forecast'),
     
     # Statistics
     path('statistics/', views.statistics, name='statistics'),
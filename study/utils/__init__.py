@@ -2,14 +2,25 @@
 from .parameterization import (
     ParameterGenerator,
     TemplateRenderer,
-    generate_parameterized_card
+    compile_spec,
+    generate_parameterized_card,
+    variant_seed,
 )
 from .graph_generator import generate_graph, safe_execute_graph_code
+from .graph_pool import GraphPool, render_graph
+from .restricted import compile_cache_info
+from .spec_analysis import analyze_spec
 
 __all__ = [
     'ParameterGenerator',
     'TemplateRenderer',
+    'compile_spec',
     'generate_parameterized_card',
+    'variant_seed',
     'generate_graph',
     'safe_execute_graph_code',
+    'GraphPool',
+    'render_graph',
+    'compile_cache_info',
+    'analyze_spec',
 ]
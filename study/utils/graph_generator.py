@@ -11,9 +11,10 @@ import json
 import logging
 import threading
 from contextlib import contextmanager
-from RestrictedPython import compile_restricted_exec
 from RestrictedPython.Guards import guarded_iter_unpack_sequence, safe_builtins, safer_getattr
 
+from .restricted import compile_cached
+
 logger = logging.getLogger(__name__)
 
 
@@ -70,13 +71,17 @@ def timeout(seconds):
             timer.cancel()
 
 
-def safe_execute_graph_code(code, variables=None):
+def safe_execute_graph_code(code, variables=None, timeout_seconds=None):
     """
     Execute matplotlib code safely with restricted builtins.
     
+    The timeout only interrupts the code on the main thread of a Unix
+    process; render graphs through graph_pool to get hard limits.
+    
     Args:
         code: Python code string to execute
         variables: Dictionary of variables to substitute in code
+        timeout_seconds: Execution timeout (default: settings.GRAPH_TIMEOUT)
         
     Returns:
         matplotlib figure object
@@ -122,14 +127,15 @@ def safe_execute_graph_code(code, variables=None):
     fig = plt.figure(figsize=(8, 6))
     
     try:
-        # Compile code with RestrictedPython for safety
-        byte_code = compile_restricted_exec(code, '<graph>')
+        # Compile code with RestrictedPython for safety (cached per source)
+        byte_code = compile_cached(code, 'exec', '<graph>')
         if byte_code.errors:
             plt.close(fig)
             raise ValueError(f"Code compilation errors: {byte_code.errors}")
         
         # Execute the code with timeout
-        timeout_seconds = getattr(settings, 'GRAPH_TIMEOUT', 3)
+        if timeout_seconds is None:
+            timeout_seconds = getattr(settings, 'GRAPH_TIMEOUT', 3)
         with timeout(timeout_seconds):
             exec(byte_code.code, restricted_globals, {})  # nosec B102 - Using RestrictedPython compiled bytecode
     except TimeoutException:
@@ -142,37 +148,28 @@ def safe_execute_graph_code(code, variables=None):
     return fig
 
 
-def generate_graph(flashcard):
+def render_graph_png(code, variables=None, config=None, timeout_seconds=None):
     """
-    Generate graph from code and save to flashcard.
+    Run graph code and return the figure as PNG bytes.
+    
+    This is the job graph_pool workers run; it reads no Django settings
+    when timeout_seconds is given.
     
     Args:
-        flashcard: Flashcard model instance with graph_code
+        code: Graph code (see safe_execute_graph_code)
+        variables: Dictionary of variables to substitute in code
+        config: Optional graph_config (title, xlabel, ylabel, xlim, ylim, grid)
+        timeout_seconds: Execution timeout (default: settings.GRAPH_TIMEOUT)
         
-    Returns:
-        True if graph was generated successfully, False otherwise
+    Raises:
+        ValueError: If the code is rejected or fails
+        TimeoutException: If the code takes too long to execute
     """
-    if flashcard.graph_type == 'none' or not flashcard.graph_code:
-        return False
-    
-    # Check if graph generation is enabled
-    if not getattr(settings, 'ENABLE_GRAPH_GENERATION', True):
-        return False
-    
     try:
-        # Extract variables if this is a parameterized card
-        variables = {}
-        if flashcard.parameter_spec:
-            from .parameterization import ParameterGenerator
-            generator = ParameterGenerator(flashcard.parameter_spec)
-            variables = generator.generate()
-        
-        # Execute the graph code
-        fig = safe_execute_graph_code(flashcard.graph_code, variables)
+        safe_execute_graph_code(code, variables, timeout_seconds)
         
         # Apply graph configuration if provided
-        if flashcard.graph_config:
-            config = flashcard.graph_config
+        if config:
             if 'title' in config:
                 plt.title(config['title'])
             if 'xlabel' in config:
@@ -186,18 +183,50 @@ def generate_graph(flashcard):
             if 'grid' in config and config['grid']:
                 plt.grid(True)
         
-        # Save figure to BytesIO
         buffer = BytesIO()
         plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-        buffer.seek(0)
+        return buffer.getvalue()
+    finally:
+        # Always close any open figures
+        plt.close('all')
+
+
+def generate_graph(flashcard, seed=None):
+    """
+    Generate graph from code and save to flashcard.
+    
+    The code runs in a graph_pool worker process (in this process when
+    settings.GRAPH_WORKERS is 0).
+    
+    Args:
+        flashcard: Flashcard model instance with graph_code
+        seed: Seed for a parameterized card's values; the same seed draws
+            the graph of the same variant (see variant_seed)
         
-        # Create ContentFile and save to ImageField
-        image_content = ContentFile(buffer.read())
-        filename = f'graph_{flashcard.id}_{flashcard.graph_type}.png'
-        flashcard.generated_graph_image.save(filename, image_content, save=True)
+    Returns:
+        True if graph was generated successfully, False otherwise
+    """
+    if flashcard.graph_type == 'none' or not flashcard.graph_code:
+        return False
+    
+    # Check if graph generation is enabled
+    if not getattr(settings, 'ENABLE_GRAPH_GENERATION', True):
+        return False
+    
+    try:
+        # Extract variables if this is a parameterized card
+        variables = {}
+        if flashcard.parameter_spec:
+            from .parameterization import ParameterGenerator
+            generator = ParameterGenerator(flashcard.parameter_spec, seed=seed)
+            variables = generator.generate()
         
-        # Close the figure to free memory
-        plt.close(fig)
+        from .graph_pool import render_graph
+        png = render_graph(flashcard.graph_code, variables, flashcard.graph_config)
+        
+        # Save to the ImageField
+        filename = f'graph_{flashcard.id}_{flashcard.graph_type}.png'
+        flashcard.generated_graph_image.save(filename, ContentFile(png), save=True)
         
         return True
         
@@ -205,9 +234,6 @@ def generate_graph(flashcard):
         # Log the error using proper logging
         logger.error(f"Error generating graph for flashcard {flashcard.id}: {str(e)}")
         return False
-    finally:
-        # Always close any open figures
-        plt.close('all')
 
 
 def get_graph_template(graph_type):
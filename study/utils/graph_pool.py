@@ -0,0 +1,228 @@
+"""Graph rendering in a pool of recyclable worker processes.
+
+safe_execute_graph_code's SIGALRM timeout only works on a process's main
+thread, so in a threaded web worker runaway graph code would keep running,
+and a graph that allocates without bound grows the web worker. GraphPool
+runs render_graph_png in separate processes instead:
+
+* every job gets a wall-clock timeout (GRAPH_TIMEOUT plus a grace period);
+  a worker that overruns it is killed and replaced
+* each worker runs under rlimits: its address space may grow by at most
+  GRAPH_WORKER_MEMORY_MB past what it used after start-up, and each job
+  gets GRAPH_WORKER_CPU_SECONDS of CPU time (SIGXCPU ends the worker)
+* a worker is replaced after GRAPH_WORKER_MAX_JOBS jobs, so leaks and
+  matplotlib state do not accumulate
+
+Workers start with the forkserver method where it exists (spawn otherwise),
+so they never inherit the web worker's threads or database connections.
+They are started on first use, up to GRAPH_WORKERS at a time.
+
+render_graph uses one process-wide pool (get_graph_pool), so views, admin
+actions and management commands share it; with GRAPH_WORKERS = 0 it renders
+in the calling process, as before.
+"""
+import atexit
+import multiprocessing
+import threading
+
+from django.conf import settings
+
+from .graph_generator import TimeoutException, render_graph_png
+
+GRACE_SECONDS = 2  # Added to the timeout before a worker is killed
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits
+    resource = None
+
+
+def _address_space_bytes():
+    """Current virtual memory size of this process, or None where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _worker_main(conn, memory_mb, cpu_seconds):
+    """Worker loop: receive (code, variables, config, timeout) jobs and send back ('ok', png) or ('error', message)."""
+    if resource is not None and memory_mb:
+        baseline = _address_space_bytes()
+        if baseline is not None:
+            limit = baseline + memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    while True:
+        try:
+            code, variables, config, timeout_seconds = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if resource is not None and cpu_seconds:
+            # RLIMIT_CPU counts the whole process, so each job gets a budget on top of what is used.
+            soft = int(_cpu_seconds()) + cpu_seconds
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, resource.getrlimit(resource.RLIMIT_CPU)[1]))
+        try:
+            conn.send(('ok', render_graph_png(code, variables, config, timeout_seconds)))
+        except TimeoutException as exc:
+            conn.send(('timeout', str(exc)))
+        except MemoryError:
+            conn.send(('error', 'Graph code exceeded the memory limit'))
+        except Exception as exc:
+            conn.send(('error', str(exc)))
+
+
+class _Worker:
+    def __init__(self, context, memory_mb, cpu_seconds):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_mb, cpu_seconds), daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self):
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+
+
+class GraphPool:
+    """
+    Pool of graph rendering processes.
+
+    Args default to the GRAPH_* settings:
+        size: GRAPH_WORKERS (default 2)
+        max_jobs: GRAPH_WORKER_MAX_JOBS (default 50), jobs before a worker is replaced
+        timeout: GRAPH_TIMEOUT (default 3), seconds a job may run
+        memory_mb: GRAPH_WORKER_MEMORY_MB (default 512), address space a worker may add
+        cpu_seconds: GRAPH_WORKER_CPU_SECONDS (default timeout + 2), CPU time per job
+    """
+
+    def __init__(self, size=None, max_jobs=None, timeout=None, memory_mb=None, cpu_seconds=None):
+        self.size = size if size is not None else getattr(settings, 'GRAPH_WORKERS', 2)
+        self.max_jobs = max_jobs or getattr(settings, 'GRAPH_WORKER_MAX_JOBS', 50)
+        self.timeout = timeout or getattr(settings, 'GRAPH_TIMEOUT', 3)
+        self.memory_mb = memory_mb if memory_mb is not None else getattr(settings, 'GRAPH_WORKER_MEMORY_MB', 512)
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else getattr(
+            settings, 'GRAPH_WORKER_CPU_SECONDS', self.timeout + GRACE_SECONDS)
+        methods = multiprocessing.get_all_start_methods()
+        if 'forkserver' in methods:
+            self.context = multiprocessing.get_context('forkserver')
+            # Workers fork from a server that has matplotlib imported already.
+            self.context.set_forkserver_preload([__name__])
+        else:
+            self.context = multiprocessing.get_context('spawn')
+        self._idle = []  # Most recently used last
+        # Guards _idle and _started; notified when a worker is returned or discarded.
+        self._available = threading.Condition()
+        self._started = 0
+        self._closed = False
+
+    def _checkout(self):
+        """An idle worker, or a new one while fewer than `size` run; waits for either."""
+        with self._available:
+            while not self._idle and self._started >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._started += 1
+        try:
+            return _Worker(self.context, self.memory_mb, self.cpu_seconds)
+        except Exception:
+            with self._available:
+                self._started -= 1
+                self._available.notify()
+            raise
+
+    def _release(self, worker):
+        with self._available:
+            self._idle.append(worker)
+            self._available.notify()
+
+    def _discard(self, worker):
+        worker.stop()
+        with self._available:
+            self._started -= 1
+            # A waiting render may start a replacement.
+            self._available.notify()
+
+    def render(self, code, variables=None, config=None):
+        """
+        Render graph code to PNG bytes in a worker.
+
+        Raises:
+            ValueError: If the code is rejected or fails, or its worker hits
+                the memory or CPU limit
+            TimeoutException: If the code runs past the timeout
+        """
+        if self._closed:
+            raise RuntimeError('GraphPool is closed')
+        worker = self._checkout()
+        try:
+            worker.conn.send((code, variables or {}, config, self.timeout))
+            finished = worker.conn.poll(self.timeout + GRACE_SECONDS)
+            if finished:
+                status, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            # The worker died: SIGXCPU from the CPU limit, or killed for memory.
+            self._discard(worker)
+            raise ValueError('Graph worker died (CPU or memory limit exceeded)')
+        except BaseException:
+            self._discard(worker)
+            raise
+        if not finished:
+            # Stuck where the worker's own alarm cannot reach; only killing it stops the code.
+            self._discard(worker)
+            raise TimeoutException('Graph generation timed out')
+
+        worker.jobs += 1
+        if worker.jobs >= self.max_jobs:
+            self._discard(worker)
+        else:
+            self._release(worker)
+        if status == 'timeout':
+            raise TimeoutException(payload)
+        if status == 'error':
+            raise ValueError(payload)
+        return payload
+
+    def close(self):
+        """Stop every idle worker; workers busy with a job stop when it returns."""
+        self._closed = True
+        with self._available:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_graph_pool():
+    """The process-wide GraphPool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GraphPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def render_graph(code, variables=None, config=None):
+    """
+    Render graph code to PNG bytes with the process-wide pool.
+
+    With settings.GRAPH_WORKERS = 0 the code runs in this process.
+    """
+    if getattr(settings, 'GRAPH_WORKERS', 2) == 0:
+        return render_graph_png(code, variables, config)
+    return get_graph_pool().render(code, variables, config)
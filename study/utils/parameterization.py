@@ -1,11 +1,19 @@
 """Utilities for parameterized flashcard generation"""
+import ast
+import hashlib
+import json
 import random
 import math
 import re
-from typing import Dict, Any, List
-from RestrictedPython import compile_restricted_eval, safe_builtins
+from functools import lru_cache
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+import numpy as np
+from RestrictedPython import safe_builtins
 from RestrictedPython.Guards import guarded_iter_unpack_sequence, safer_getattr
 
+from .restricted import compile_cached
+from .spec_analysis import analyze_spec, narrowed_spec
+
 
 def safe_getitem(obj, index):
     """
@@ -26,21 +34,210 @@ def safe_getitem(obj, index):
     return obj[index]
 
 
+def batch_getattr(obj, name, *default):
+    """
+    Attribute guard for batch evaluation: NumPy arrays and functions expose
+    methods such as ndarray.tofile, so no attribute of them is reachable.
+    """
+    if isinstance(obj, (np.ndarray, np.generic, np.ufunc)):
+        raise AttributeError(f"Attribute access not allowed on {type(obj).__name__}")
+    return safer_getattr(obj, name, *default)
+
+
+def _batch_log(x, base=None):
+    return np.log(x) if base is None else np.log(x) / np.log(base)
+
+
+def _batch_round(x, ndigits=None):
+    # round(x) gives an int in Python, np.round keeps floats.
+    return np.rint(x).astype(np.int64) if ndigits is None else np.round(x, ndigits)
+
+
+def _to_python(value):
+    """Plain Python value of a NumPy scalar (other values are returned as-is)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# Functions formulas and constraints may call, besides RestrictedPython's safe_builtins.
+MATH_FUNCTIONS = {
+    'sqrt': math.sqrt,
+    'pow': math.pow,
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'log': math.log,
+    'log10': math.log10,
+    'exp': math.exp,
+    'abs': abs,
+    'round': round,
+}
+
+RANDOM_TYPES = ('random_int', 'random_float', 'random_choice')
+PLAN_CACHE_SIZE = 256
+
+
+class EvaluationPlan(NamedTuple):
+    """A parameter spec compiled by compile_spec."""
+    random_vars: Tuple[Tuple[str, Dict[str, Any]], ...]
+    # (name, code, precision) of each computed variable, dependencies first.
+    computed: Tuple[Tuple[str, Any, int], ...]
+    constraints: Tuple[Any, ...]
+    # Possible division by zero or domain errors found by analyze_spec
+    warnings: Tuple[str, ...] = ()
+
+
+def _free_names(source: str, what: str) -> set:
+    """Names `source` reads that it does not bind itself (comprehension or lambda variables)."""
+    try:
+        tree = ast.parse(source, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Syntax error in {what}: {e.msg}")
+    loaded, bound = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else bound).add(node.id)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+    return loaded - bound
+
+
+def _compile_expression(source: str, filename: str, what: str, known: set):
+    byte_code = compile_cached(source, 'eval', filename)
+    if byte_code.errors:
+        raise ValueError(f"Compilation errors in {what}: {byte_code.errors}")
+    undefined = _free_names(source, what) - known
+    if undefined:
+        raise ValueError(f"{what[0].upper()}{what[1:]} uses undefined name(s): {', '.join(sorted(undefined))}")
+    return byte_code.code
+
+
+def _dependency_order(dependencies: Dict[str, set]) -> List[str]:
+    """Topological order of `dependencies` (name -> names it needs), keeping declaration order where free."""
+    order, done, visiting = [], set(), []
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            cycle = visiting[visiting.index(name):] + [name]
+            raise ValueError(f"Computed variables form a cycle: {' -> '.join(cycle)}")
+        visiting.append(name)
+        for dependency in dependencies:
+            if dependency in dependencies[name]:
+                visit(dependency)
+        visiting.pop()
+        done.add(name)
+        order.append(name)
+
+    for name in dependencies:
+        visit(name)
+    return order
+
+
+def _build_plan(parameter_spec: Dict[str, Any]) -> EvaluationPlan:
+    variables = parameter_spec.get('variables', {})
+    precision = parameter_spec.get('precision', 2)
+    known = set(variables) | set(MATH_FUNCTIONS) | set(safe_builtins)
+
+    random_vars = []
+    dependencies = {}
+    for var_name, var_spec in variables.items():
+        var_type = var_spec.get('type')
+        if var_type in RANDOM_TYPES:
+            random_vars.append((var_name, var_spec))
+        elif var_type == 'computed':
+            if not var_spec.get('formula', ''):
+                raise ValueError("computed type requires 'formula'")
+            dependencies[var_name] = _free_names(var_spec['formula'], f"formula for '{var_name}'")
+        else:
+            raise ValueError(f"Unknown variable type: {var_type}")
+
+    order = _dependency_order(dependencies)
+    computed = tuple(
+        (
+            var_name,
+            _compile_expression(variables[var_name]['formula'], '<formula>', f"formula for '{var_name}'", known),
+            variables[var_name].get('precision', precision),
+        )
+        for var_name in order
+    )
+    constraint_sources = parameter_spec.get('constraints', [])
+    constraints = tuple(
+        _compile_expression(constraint, '<constraint>', f"constraint '{constraint}'", known)
+        for constraint in constraint_sources
+    )
+
+    # Sample only from the part of each range the constraints leave open.
+    analysis = analyze_spec(variables, order, constraint_sources, precision)
+    if analysis.satisfiable is False:
+        raise ValueError(f"Constraints can never be satisfied: {analysis.reason}")
+    random_vars = [
+        (var_name, narrowed_spec(var_spec, analysis.ranges[var_name], precision) if var_name in analysis.ranges else var_spec)
+        for var_name, var_spec in random_vars
+    ]
+    return EvaluationPlan(tuple(random_vars), computed, constraints, analysis.warnings)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _compile_spec_json(spec_json: str) -> EvaluationPlan:
+    return _build_plan(json.loads(spec_json))
+
+
+def compile_spec(parameter_spec: Dict[str, Any]) -> EvaluationPlan:
+    """
+    Compile a parameter spec into an evaluation plan.
+
+    Computed variables are ordered so each formula runs after the variables
+    it uses, whatever order the spec lists them in. Random variables are
+    sampled from the ranges left after analyze_spec narrows them by the
+    linear constraints. Plans are cached per
+    spec (PLAN_CACHE_SIZE most recent), so generating again for the same
+    spec parses and compiles nothing.
+
+    Raises:
+        ValueError: On an unknown variable type, a formula or constraint
+            that does not compile or uses an undefined name, computed
+            variables that depend on each other in a cycle, or constraints
+            that analyze_spec proves can never hold
+    """
+    try:
+        spec_json = json.dumps(parameter_spec)
+    except (TypeError, ValueError):
+        return _build_plan(parameter_spec)
+    return _compile_spec_json(spec_json)
+
+
 class ParameterGenerator:
     """Generates random parameters according to specification"""
     
-    def __init__(self, parameter_spec: Dict[str, Any]):
+    def __init__(self, parameter_spec: Dict[str, Any], seed: int = None):
         """
         Initialize generator with parameter specification.
         
         Args:
             parameter_spec: Dictionary with 'variables' and optional 'constraints' and 'precision'
+            seed: Seed of the generator's private RNG; the same spec and seed
+                always give the same values (see variant_seed). None seeds
+                from the OS.
         """
         self.spec = parameter_spec
+        self.seed = seed
+        # Private, so seeded generation is reproducible and threads share no RNG state.
+        self.rng = random.Random(seed)
         self.variables = parameter_spec.get('variables', {})
         self.constraints = parameter_spec.get('constraints', [])
         self.precision = parameter_spec.get('precision', 2)
         self.max_retries = 100
+        self.batch_size = 4096
+        self.max_batches = 10
+        self._plan = None
+
+    @property
+    def plan(self) -> EvaluationPlan:
+        """The spec's EvaluationPlan (raises ValueError for an invalid spec)."""
+        if self._plan is None:
+            self._plan = compile_spec(self.spec)
+        return self._plan
     
     def _create_safe_namespace(self, values: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -57,16 +254,7 @@ class ParameterGenerator:
             '_iter_unpack_sequence_': guarded_iter_unpack_sequence,
             '_getitem_': safe_getitem,
             '_getattr_': safer_getattr,
-            'sqrt': math.sqrt,
-            'pow': math.pow,
-            'sin': math.sin,
-            'cos': math.cos,
-            'tan': math.tan,
-            'log': math.log,
-            'log10': math.log10,
-            'exp': math.exp,
-            'abs': abs,
-            'round': round,
+            **MATH_FUNCTIONS,
             **values
         }
         
@@ -78,42 +266,182 @@ class ParameterGenerator:
             Dictionary mapping variable names to generated values
             
         Raises:
-            ValueError: If constraints cannot be satisfied after max_retries
+            ValueError: If the spec is invalid (see compile_spec) or
+                constraints cannot be satisfied after max_retries
         """
+        self.plan  # An invalid spec fails here rather than on every attempt.
         for attempt in range(self.max_retries):
             try:
-                values = self._generate_once()
-                if self._check_constraints(values):
-                    return values
+                values = self.attempt()
             except Exception:
                 continue
-                
+            if values is not None:
+                return values
+
         raise ValueError(f"Could not generate valid parameters after {self.max_retries} attempts")
+
+    def attempt(self) -> Optional[Dict[str, Any]]:
+        """
+        Make one generation attempt, as generate() does up to max_retries times.
+
+        Returns:
+            The values, or None when they fail a constraint
+
+        Raises:
+            ValueError: If the spec is invalid or a formula fails for the drawn values
+        """
+        values = self._generate_once()
+        return values if self._check_constraints(values) else None
+
+    def generate_batch(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Generate up to `count` sets of parameter values by vectorised rejection sampling.
+
+        Each round draws `batch_size` candidates at once with NumPy, evaluates
+        computed formulas and constraints over the whole batch and keeps the
+        valid rows, for at most `max_batches` rounds. Kept rows are
+        re-evaluated with the scalar plan, so their values are the ones
+        generate() computes for the same draws.
+
+        Args:
+            count: Number of value sets wanted
+
+        Returns:
+            List of at most `count` dictionaries like generate() returns;
+            shorter when the constraints are too tight to find `count`
+
+        Raises:
+            ValueError: If the spec is invalid or no valid set is found
+        """
+        rng = np.random.default_rng(self.rng.getrandbits(64))
+        rows = []
+        for attempt in range(self.max_batches):
+            rows.extend(self._sample_batch(rng, count - len(rows)))
+            if len(rows) >= count:
+                break
+        if not rows:
+            raise ValueError(
+                f"Could not generate valid parameters from {self.max_batches} batches of {self.batch_size}"
+            )
+        return rows
+
+    def _sample_batch(self, rng, limit: int) -> List[Dict[str, Any]]:
+        """The first `limit` valid rows of one batch of candidates."""
+        size = self.batch_size
+        plan = self.plan
+        arrays = {}
+        for var_name, var_spec in plan.random_vars:
+            var_type = var_spec.get('type')
+            if var_type == 'random_int':
+                arrays[var_name] = rng.integers(var_spec.get('min', 0), var_spec.get('max', 100), size, endpoint=True)
+            elif var_type == 'random_float':
+                precision = var_spec.get('precision', self.precision)
+                arrays[var_name] = np.round(
+                    rng.uniform(var_spec.get('min', 0.0), var_spec.get('max', 100.0), size), precision
+                )
+            elif var_type == 'random_choice':
+                choices = var_spec.get('choices', [])
+                if not choices:
+                    raise ValueError("random_choice requires 'choices' list")
+                numeric = all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in choices)
+                options = np.array(choices) if numeric else np.array(choices, dtype=object)
+                arrays[var_name] = options[rng.integers(0, len(choices), size)]
+
+        valid = np.ones(size, dtype=bool)
+        with np.errstate(all='ignore'):
+            for var_name, code, precision in plan.computed:
+                result, ok = self._evaluate_batch(code, arrays, size)
+                if result.dtype.kind == 'f':
+                    result = np.round(result, precision)
+                    ok &= np.isfinite(result)
+                arrays[var_name] = result
+                valid &= ok
+            for code in plan.constraints:
+                result, ok = self._evaluate_batch(code, arrays, size)
+                valid &= ok & result.astype(bool)
+
+        # NumPy wraps int64 overflow, returns 0 for integer division by zero
+        # and keeps float results where Python gives ints, so the vectorised
+        # pass is only a filter: each surviving row is recomputed with the
+        # scalar plan, and returned exactly as generate() would return it.
+        rows = []
+        for i in np.flatnonzero(valid):
+            values = {var_name: _to_python(arrays[var_name][i]) for var_name, _ in plan.random_vars}
+            try:
+                for var_name, code, precision in plan.computed:
+                    values[var_name] = self._compute_value(var_name, code, precision, values)
+            except ValueError:
+                continue
+            if self._check_constraints(values):
+                rows.append(values)
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def _evaluate_batch(self, code, arrays: Dict[str, Any], size: int) -> Tuple[Any, Any]:
+        """
+        Evaluate a compiled expression from the plan over a batch.
+
+        Returns:
+            (values, ok): an array of `size` results and a mask of the rows
+            whose evaluation succeeded
+        """
+        try:
+            result = np.asarray(eval(code, self._create_batch_namespace(arrays), {}))  # nosec B307 - Using RestrictedPython compiled bytecode
+            if result.dtype != object:
+                return np.broadcast_to(result, (size,)).copy(), np.ones(size, dtype=bool)
+        except Exception:
+            pass
+        # Expressions that do not vectorise (`and`, conditionals, indexing)
+        # are evaluated row by row with the scalar namespace.
+        results = []
+        ok = np.ones(size, dtype=bool)
+        for i in range(size):
+            namespace = self._create_safe_namespace({name: _to_python(values[i]) for name, values in arrays.items()})
+            try:
+                results.append(eval(code, namespace, {}))  # nosec B307 - Using RestrictedPython compiled bytecode
+            except Exception:
+                results.append(0)
+                ok[i] = False
+        numeric = all(isinstance(r, (int, float)) for r in results)
+        return (np.array(results) if numeric else np.array(results, dtype=object)), ok
+
+    def _create_batch_namespace(self, arrays: Dict[str, Any]) -> Dict[str, Any]:
+        """Like _create_safe_namespace, with NumPy versions of the math functions."""
+        namespace = self._create_safe_namespace({})
+        namespace.update({
+            '_getattr_': batch_getattr,
+            'sqrt': np.sqrt,
+            'pow': np.float_power,
+            'sin': np.sin,
+            'cos': np.cos,
+            'tan': np.tan,
+            'log': _batch_log,
+            'log10': np.log10,
+            'exp': np.exp,
+            'abs': np.abs,
+            'round': _batch_round,
+        })
+        namespace.update(arrays)
+        return namespace
     
     def _generate_once(self) -> Dict[str, Any]:
-        """Generate one set of parameter values"""
+        """Generate one set of parameter values by running the spec's plan"""
         values = {}
         
-        # First pass: generate random values
-        for var_name, var_spec in self.variables.items():
+        for var_name, var_spec in self.plan.random_vars:
             var_type = var_spec.get('type')
             
             if var_type == 'random_int':
                 values[var_name] = self._generate_random_int(var_spec)
             elif var_type == 'random_float':
                 values[var_name] = self._generate_random_float(var_spec)
-            elif var_type == 'random_choice':
-                values[var_name] = self._generate_random_choice(var_spec)
-            elif var_type == 'computed':
-                # Computed values are handled in second pass
-                pass
             else:
-                raise ValueError(f"Unknown variable type: {var_type}")
+                values[var_name] = self._generate_random_choice(var_spec)
         
-        # Second pass: compute derived values
-        for var_name, var_spec in self.variables.items():
-            if var_spec.get('type') == 'computed':
-                values[var_name] = self._compute_value(var_spec, values)
+        # Computed values, in dependency order
+        for var_name, code, precision in self.plan.computed:
+            values[var_name] = self._compute_value(var_name, code, precision, values)
                 
         return values
     
@@ -121,14 +449,14 @@ class ParameterGenerator:
         """Generate random integer"""
         min_val = spec.get('min', 0)
         max_val = spec.get('max', 100)
-        return random.randint(min_val, max_val)
+        return self.rng.randint(min_val, max_val)
     
     def _generate_random_float(self, spec: Dict[str, Any]) -> float:
         """Generate random float"""
         min_val = spec.get('min', 0.0)
         max_val = spec.get('max', 100.0)
         precision = spec.get('precision', self.precision)
-        value = random.uniform(min_val, max_val)
+        value = self.rng.uniform(min_val, max_val)
         return round(value, precision)
     
     def _generate_random_choice(self, spec: Dict[str, Any]) -> Any:
@@ -136,50 +464,35 @@ class ParameterGenerator:
         choices = spec.get('choices', [])
         if not choices:
             raise ValueError("random_choice requires 'choices' list")
-        return random.choice(choices)
+        return self.rng.choice(choices)
     
-    def _compute_value(self, spec: Dict[str, Any], values: Dict[str, Any]) -> Any:
-        """Compute value from formula"""
-        formula = spec.get('formula', '')
-        if not formula:
-            raise ValueError("computed type requires 'formula'")
-        
+    def _compute_value(self, var_name: str, code, precision: int, values: Dict[str, Any]) -> Any:
+        """Evaluate a computed variable's compiled formula"""
         # Create safe namespace with math functions and generated values
         namespace = self._create_safe_namespace(values)
         
-        # Safely evaluate the formula using RestrictedPython
         try:
-            # Compile with RestrictedPython for safety
-            byte_code = compile_restricted_eval(formula, '<formula>')
-            if byte_code.errors:
-                raise ValueError(f"Formula compilation errors: {byte_code.errors}")
-            
-            result = eval(byte_code.code, namespace, {})  # nosec B307 - Using RestrictedPython compiled bytecode
+            result = eval(code, namespace, {})  # nosec B307 - Using RestrictedPython compiled bytecode
             
             # Apply precision if it's a float
             if isinstance(result, float):
-                precision = spec.get('precision', self.precision)
                 result = round(result, precision)
                 
             return result
         except Exception as e:
-            raise ValueError(f"Error evaluating formula '{formula}': {e}")
+            raise ValueError(f"Error evaluating formula for '{var_name}': {e}")
     
     def _check_constraints(self, values: Dict[str, Any]) -> bool:
         """Check if generated values satisfy all constraints"""
-        if not self.constraints:
+        constraints = self.plan.constraints
+        if not constraints:
             return True
             
         namespace = self._create_safe_namespace(values)
         
-        for constraint in self.constraints:
+        for code in constraints:
             try:
-                # Compile with RestrictedPython for safety
-                byte_code = compile_restricted_eval(constraint, '<constraint>')
-                if byte_code.errors:
-                    return False
-                
-                if not eval(byte_code.code, namespace, {}):  # nosec B307 - Using RestrictedPython compiled bytecode
+                if not eval(code, namespace, {}):  # nosec B307 - Using RestrictedPython compiled bytecode
                     return False
             except Exception:
                 return False
@@ -187,6 +500,48 @@ class ParameterGenerator:
         return True
 
 
+TEMPLATE_CACHE_SIZE = 1024
+
+# {name} or {name:format spec}; other braces (LaTeX groups) are literal text.
+PLACEHOLDER_RE = re.compile(r'\{([A-Za-z_]\w*)(?::([^{}]*))?\}')
+ENG_SPEC_RE = re.compile(r'(?:\.(\d+))?eng')
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def parse_template(template: str) -> Tuple[Any, ...]:
+    """
+    Split a template into literal and placeholder segments.
+
+    Returns:
+        Tuple of segments: literal text as str, and each placeholder as a
+        (name, format spec or None, placeholder text) tuple
+    """
+    segments = []
+    position = 0
+    for match in PLACEHOLDER_RE.finditer(template):
+        if match.start() > position:
+            segments.append(template[position:match.start()])
+        segments.append((match.group(1), match.group(2), match.group(0)))
+        position = match.end()
+    if position < len(template):
+        segments.append(template[position:])
+    return tuple(segments)
+
+
+def _format_eng(value: float, digits: int) -> str:
+    """Engineering notation: `digits` significant digits, exponent a multiple of 3 (4700 -> 4.7e3)."""
+    value = float(value)
+    if value == 0 or not math.isfinite(value):
+        return f"{value:g}"
+    exponent = math.floor(math.log10(abs(value)) / 3) * 3
+    mantissa = float(f"{value / 10 ** exponent:.{digits}g}")
+    if abs(mantissa) >= 1000:  # Rounding carried into the next group
+        mantissa /= 1000
+        exponent += 3
+    formatted = f"{mantissa:.{digits}g}"
+    return formatted if exponent == 0 else f"{formatted}e{exponent}"
+
+
 class TemplateRenderer:
     """Renders templates with generated parameter values"""
     
@@ -194,6 +549,12 @@ class TemplateRenderer:
         """
         Render template by replacing {variable} placeholders.
         
+        A placeholder may carry a format spec: any of Python's ({R:.3g},
+        {n:03d}) or `eng` / `.Neng` for engineering notation ({I:eng}).
+        Placeholders naming no value, or whose spec does not fit the
+        value, are left as written. Templates are parsed once and cached
+        (see parse_template).
+        
         Args:
             template: String with {variable} placeholders
             values: Dictionary of variable values
@@ -204,20 +565,28 @@ class TemplateRenderer:
         if not template:
             return ""
             
-        result = template
-        
-        # Replace each variable placeholder
-        for var_name, var_value in values.items():
-            placeholder = f"{{{var_name}}}"
-            
-            # Format the value appropriately
-            formatted_value = self._format_value(var_value)
-            result = result.replace(placeholder, formatted_value)
-            
-        return result
+        parts = []
+        for segment in parse_template(template):
+            if isinstance(segment, str):
+                parts.append(segment)
+                continue
+            name, spec, text = segment
+            if name not in values:
+                parts.append(text)
+                continue
+            try:
+                parts.append(self._format_value(values[name], spec))
+            except (TypeError, ValueError):
+                parts.append(text)
+        return ''.join(parts)
     
-    def _format_value(self, value: Any) -> str:
+    def _format_value(self, value: Any, spec: str = None) -> str:
         """Format a value for display"""
+        if spec:
+            eng = ENG_SPEC_RE.fullmatch(spec)
+            if eng:
+                return _format_eng(value, int(eng.group(1) or 3))
+            return format(value, spec)
         if isinstance(value, float):
             # Remove unnecessary trailing zeros
             formatted = f"{value:.10f}".rstrip('0').rstrip('.')
@@ -226,9 +595,20 @@ class TemplateRenderer:
             return str(value)
 
 
+def variant_seed(*parts) -> int:
+    """
+    Stable seed of a variant identified by `parts`, e.g. (user id, card id, session seed).
+
+    Unlike hash(), the result is the same in every process.
+    """
+    digest = hashlib.blake2b(':'.join(map(str, parts)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
 def generate_parameterized_card(parameter_spec: Dict[str, Any], 
                                  question_template: str,
-                                 answer_template: str) -> tuple:
+                                 answer_template: str,
+                                 seed: int = None) -> tuple:
     """
     Generate a parameterized card with random values.
     
@@ -236,11 +616,12 @@ def generate_parameterized_card(parameter_spec: Dict[str, Any],
         parameter_spec: Parameter specification dictionary
         question_template: Template for question
         answer_template: Template for answer
+        seed: Optional seed; the same seed renders the same card
         
     Returns:
         Tuple of (rendered_question, rendered_answer, generated_values)
     """
-    generator = ParameterGenerator(parameter_spec)
+    generator = ParameterGenerator(parameter_spec, seed=seed)
     values = generator.generate()
     
     renderer = TemplateRenderer()
@@ -0,0 +1,66 @@
+"""Process-wide cache of RestrictedPython compilations.
+
+Parameter formulas and constraints are evaluated on every generation attempt
+(up to ParameterGenerator.max_retries per card) and graph code on every
+render, but there are few distinct sources and compiling one costs far more
+than running it. compile_cached keeps the last COMPILE_CACHE_SIZE results,
+keyed by source text, mode and filename. Results with compile errors are
+cached too, so a broken formula is not recompiled on every retry.
+compile_cache_info reports the cache's hits, misses and size; the
+profile_parameter_specs command prints them.
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict
+
+from RestrictedPython import compile_restricted_eval, compile_restricted_exec
+
+COMPILE_CACHE_SIZE = 1024
+
+_COMPILERS = {
+    'eval': compile_restricted_eval,
+    'exec': compile_restricted_exec,
+}
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_hits = 0
+_misses = 0
+
+
+def compile_cached(source: str, mode: str, filename: str):
+    """
+    RestrictedPython compile result of `source` ('eval' or 'exec' mode).
+
+    Returns:
+        The CompileResult from compile_restricted_eval/_exec; check its
+        `errors` before running its `code`, as with an uncached compile.
+    """
+    global _hits, _misses
+    key = (source, mode, filename)
+    with _lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+            _hits += 1
+            return result
+        _misses += 1
+    result = _COMPILERS[mode](source, filename)
+    with _lock:
+        _cache[key] = result
+        if len(_cache) > COMPILE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def compile_cache_info() -> Dict[str, int]:
+    """Hit and miss counts and current size of the compile cache."""
+    with _lock:
+        return {'hits': _hits, 'misses': _misses, 'size': len(_cache), 'maxsize': COMPILE_CACHE_SIZE}
+
+
+def clear_compile_cache():
+    global _hits, _misses
+    with _lock:
+        _cache.clear()
+        _hits = _misses = 0
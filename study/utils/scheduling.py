@@ -0,0 +1,181 @@
+"""Vectorised SM-2 scheduling for re-scheduling many FlashcardProgress rows at once"""
+import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+# Same fallbacks _apply_sm2 uses when a user has no SpacedRepetitionSettings row.
+DEFAULT_MIN_EF = 1.3
+DEFAULT_MAX_INTERVAL = 365
+
+RESCHEDULE_FIELDS = ['easiness_factor', 'interval_days', 'next_review_date']
+
+
+def apply_sm2_arrays(ef, interval, reps, quality,
+                     min_ef=DEFAULT_MIN_EF, max_interval=DEFAULT_MAX_INTERVAL):
+    """
+    Array version of views._apply_sm2 for one review of every row.
+
+    Args:
+        ef, interval, reps: Current easiness_factor, interval_days and sm2_repetitions
+        quality: 0-5 rating per row (or a scalar applied to all rows)
+        min_ef, max_interval: Scalars or per-row arrays from the user's settings
+
+    Returns:
+        Tuple of new (easiness_factor, interval_days, sm2_repetitions) arrays
+    """
+    ef = np.asarray(ef, dtype=np.float64)
+    interval = np.asarray(interval, dtype=np.int64)
+    reps = np.asarray(reps, dtype=np.int64)
+    q = np.broadcast_to(np.asarray(quality, dtype=np.int64), ef.shape)
+
+    new_ef = np.maximum(min_ef, ef + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    passed = q >= 3
+
+    grown = np.rint(interval * new_ef).astype(np.int64)
+    new_interval = np.where(reps == 0, 1, np.where(reps == 1, 6, grown))
+    new_interval = np.where(passed, np.minimum(new_interval, max_interval), 1)
+    new_reps = np.where(passed, reps + 1, 0)
+
+    return np.round(new_ef, 4), new_interval, new_reps
+
+
+def reschedule_row(ef: float, reps: int, interval: int, min_ef: float = DEFAULT_MIN_EF,
+                   max_interval: int = DEFAULT_MAX_INTERVAL) -> Tuple[float, int]:
+    """Scalar reference for reschedule_arrays: the new (easiness_factor, interval_days) of one row."""
+    new_ef = round(max(ef, min_ef), 4)
+    if new_ef > ef and reps >= 3:
+        interval = round(interval * new_ef / ef)
+    return new_ef, min(interval, max_interval)
+
+
+def reschedule_arrays(ef, reps, interval, due, min_ef=DEFAULT_MIN_EF,
+                      max_interval=DEFAULT_MAX_INTERVAL):
+    """
+    Re-schedule scheduled cards under (possibly changed) SM-2 settings.
+
+    Only rows the settings change affects are moved; the interval a card's
+    review history produced is otherwise kept as it is:
+
+    * an easiness factor below min_ef is lifted to it, and an interval that
+      was grown by the easiness factor (from the third success on) is
+      re-grown with the lifted value: interval * new_ef / ef
+    * an interval longer than max_interval is clamped to it
+
+    The due date is moved so it stays counted from the day of the last
+    review (due - interval).
+
+    Args:
+        ef, reps, interval: Current SM-2 state per row
+        due: Current next_review_date per row as datetime64[D]
+        min_ef, max_interval: Scalars or per-row arrays
+
+    Returns:
+        Tuple of new (easiness_factor, interval_days, next_review_date) arrays
+    """
+    due = np.asarray(due, dtype='datetime64[D]')
+    ef = np.asarray(ef, dtype=np.float64)
+    reps = np.asarray(reps, dtype=np.int64)
+    interval = np.asarray(interval, dtype=np.int64)
+    new_ef = np.round(np.maximum(ef, min_ef), 4)
+    regrow = (new_ef > ef) & (reps >= 3)
+    new_interval = np.where(regrow, np.rint(interval * new_ef / ef), interval).astype(np.int64)
+    new_interval = np.minimum(new_interval, max_interval)
+    reviewed_on = due - interval.astype('timedelta64[D]')
+    return new_ef, new_interval, reviewed_on + new_interval.astype('timedelta64[D]')
+
+
+def _settings_by_user(user_ids: Optional[Iterable[int]]) -> Dict[int, Tuple[float, int]]:
+    from study.models import SpacedRepetitionSettings
+
+    qs = SpacedRepetitionSettings.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    return {s.user_id: (s.get_min_easiness(), s.max_interval_days) for s in qs}
+
+
+def _invalidate_counters(user_ids):
+    """Due dates moved, so drop the cached per-topic counts and forecasts; they rebuild on next read."""
+    from study.forecast import invalidate_forecast
+    from study.models import TopicReviewCounter
+
+    qs = TopicReviewCounter.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+        # Forecasts of all users cannot be enumerated; they expire on their own.
+        invalidate_forecast(user_ids)
+    qs.delete()
+
+
+def reschedule_progress(user_ids: Optional[Iterable[int]] = None, chunk_size: int = 2000) -> int:
+    """
+    Recompute next_review_date for every scheduled whole-card progress row.
+
+    Rows are read in primary-key chunks, re-scheduled with reschedule_arrays
+    using each owner's SpacedRepetitionSettings (or the defaults), and rows
+    that changed are written back with bulk_update. TopicReviewCounter rows of
+    the affected users are dropped so they rebuild with the new due dates.
+
+    Args:
+        user_ids: Restrict to these users; None re-schedules everyone
+        chunk_size: Rows read and written per round trip
+
+    Returns:
+        Number of rows whose schedule changed
+    """
+    from study.models import FlashcardProgress
+
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    params = _settings_by_user(user_ids)
+    default = (DEFAULT_MIN_EF, DEFAULT_MAX_INTERVAL)
+
+    qs = FlashcardProgress.objects.filter(step_index=-1, next_review_date__isnull=False)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+
+    changed = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            qs.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'user_id', 'easiness_factor', 'sm2_repetitions',
+                'interval_days', 'next_review_date',
+            )[:chunk_size]
+        )
+        if not rows:
+            if changed:
+                _invalidate_counters(user_ids)
+            return changed
+        last_pk = rows[-1][0]
+
+        pks, users, ef, reps, interval, due = (np.array(col) for col in zip(*rows))
+        unique_users, inverse = np.unique(users, return_inverse=True)
+        user_params = np.array([params.get(int(u), default) for u in unique_users])
+        min_ef = user_params[inverse, 0]
+        max_interval = user_params[inverse, 1].astype(np.int64)
+
+        new_ef, new_interval, new_due = reschedule_arrays(
+            ef, reps, interval, due.astype('datetime64[D]'), min_ef, max_interval,
+        )
+        dirty = np.flatnonzero(
+            (new_ef != ef) | (new_interval != interval) | (new_due != due.astype('datetime64[D]'))
+        )
+        if not len(dirty):
+            continue
+
+        due_dates = new_due[dirty].astype(datetime.date)
+        FlashcardProgress.objects.bulk_update(
+            [
+                FlashcardProgress(
+                    pk=int(pks[i]),
+                    easiness_factor=float(new_ef[i]),
+                    interval_days=int(new_interval[i]),
+                    next_review_date=due_dates[n],
+                )
+                for n, i in enumerate(dirty)
+            ],
+            RESCHEDULE_FIELDS,
+            batch_size=chunk_size,
+        )
+        changed += len(dirty)
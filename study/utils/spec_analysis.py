@@ -0,0 +1,505 @@
+"""Static interval analysis of parameter specs.
+
+Before any value is drawn, analyze_spec bounds every numeric variable with an
+interval: random variables by their min/max (or choices), computed variables
+by evaluating their formula with interval arithmetic in dependency order.
+
+Constraints that are linear in the random variables (`a > b`, `2*a + b <= 20`,
+`b != 0`, also through linear computed variables) are propagated back onto
+the random variables' ranges until nothing changes. This only removes values
+that cannot satisfy the constraints, so sampling from the narrowed ranges
+gives the same distribution of accepted values as rejection over the full
+ranges, with far fewer rejections. A range that narrows to nothing, or a
+constraint that fails everywhere, proves the spec unsatisfiable.
+
+Divisions whose divisor may be zero and sqrt/log calls whose argument may
+leave their domain are reported as warnings, unless a constraint rules the
+bad values out (`a != b` guards `1/(a-b)`, `x >= 0` guards `sqrt(x)`).
+
+Anything the analysis does not understand (non-numeric choices, indexing,
+`or`) is treated as unbounded, never as an error: the analysis only ever
+narrows and warns, and generation still checks every constraint.
+"""
+import ast
+import math
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+INF = math.inf
+MAX_ROUNDS = 20  # Constraint propagation stops after this many passes
+
+
+class Interval(NamedTuple):
+    lo: float
+    hi: float
+
+    def contains(self, value: float) -> bool:
+        return self.lo <= value <= self.hi
+
+
+TOP = Interval(-INF, INF)
+
+
+class SpecAnalysis(NamedTuple):
+    # Narrowed (min, max) of each numeric random variable
+    ranges: Dict[str, Tuple[float, float]]
+    # Bounds of every numeric variable over the narrowed ranges
+    intervals: Dict[str, Interval]
+    warnings: Tuple[str, ...]
+    # True: every draw satisfies the constraints; False: none can; None: unknown
+    satisfiable: Optional[bool]
+    reason: str = ''
+
+
+def _finite(value: float) -> float:
+    return 0.0 if math.isnan(value) else value
+
+
+def _hull(values) -> Interval:
+    values = [_finite(v) for v in values]
+    return Interval(min(values), max(values))
+
+
+def _add(a: Interval, b: Interval) -> Interval:
+    return Interval(_finite(a.lo + b.lo), _finite(a.hi + b.hi))
+
+
+def _neg(a: Interval) -> Interval:
+    return Interval(-a.hi, -a.lo)
+
+
+def _mul(a: Interval, b: Interval) -> Interval:
+    return _hull([a.lo * b.lo, a.lo * b.hi, a.hi * b.lo, a.hi * b.hi])
+
+
+def _div(a: Interval, b: Interval) -> Interval:
+    if b.contains(0):
+        return TOP
+    return _mul(a, Interval(1 / b.hi, 1 / b.lo))
+
+
+def _monotone(func, a: Interval) -> Interval:
+    try:
+        return Interval(func(a.lo), func(a.hi))
+    except (OverflowError, ValueError):
+        return TOP
+
+
+def _pow(a: Interval, b: Interval) -> Interval:
+    if b.lo == b.hi and float(b.lo).is_integer() and b.lo >= 0:
+        n = int(b.lo)
+        try:
+            corners = [a.lo ** n, a.hi ** n]
+        except OverflowError:
+            return TOP
+        if n % 2 == 0 and a.contains(0):
+            corners.append(0)
+        return _hull(corners)
+    if a.lo > 0:
+        try:
+            return _hull([a.lo ** b.lo, a.lo ** b.hi, a.hi ** b.lo, a.hi ** b.hi])
+        except OverflowError:
+            return TOP
+    return TOP
+
+
+def _linear_sub(a: Dict[str, float], b: Dict[str, float], scale: float = 1.0) -> Dict[str, float]:
+    """a - scale*b of two linear forms ({variable: coefficient, '': constant})."""
+    result = dict(a)
+    for name, coefficient in b.items():
+        result[name] = result.get(name, 0) - scale * coefficient
+    return {name: c for name, c in result.items() if c or name == ''}
+
+
+def _normalize(form: Dict[str, float]) -> Tuple[Optional[frozenset], float]:
+    """(key, scale) with form == scale * normalized form; key None for a constant."""
+    names = sorted(name for name in form if name)
+    if not names:
+        return None, 1.0
+    scale = form[names[0]]
+    return frozenset((name, round(c / scale, 12)) for name, c in form.items() if c or name), scale
+
+
+class _Analyzer:
+    def __init__(self, variables: Dict[str, Dict[str, Any]], order: List[str], constraints: List[str],
+                 precision: int = 2):
+        self.variables = variables
+        self.order = order
+        self.precision = precision
+        self.constraints = []
+        for constraint in constraints:
+            try:
+                tree = ast.parse(constraint, mode='eval').body
+            except SyntaxError:
+                continue
+            self.constraints.extend((constraint, part) for part in self._conjuncts(tree))
+        self.ranges = {}
+        self.intervals = {}
+        self.integral = set()
+        self.forms = {}  # Linear forms of variables over the random ones
+        self.facts = {}  # normalized linear form -> relations known from constraints
+        self.warnings = []
+        self.label = ''
+
+    @staticmethod
+    def _conjuncts(node):
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            for value in node.values:
+                yield from _Analyzer._conjuncts(value)
+        else:
+            yield node
+
+    # -- ranges of the random variables ---------------------------------------
+
+    def init_ranges(self):
+        for name, spec in self.variables.items():
+            var_type = spec.get('type')
+            if var_type == 'random_int':
+                self.ranges[name] = Interval(spec.get('min', 0), spec.get('max', 100))
+                self.integral.add(name)
+            elif var_type == 'random_float':
+                self.ranges[name] = Interval(spec.get('min', 0.0), spec.get('max', 100.0))
+            elif var_type == 'random_choice':
+                choices = spec.get('choices', [])
+                if choices and all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in choices):
+                    self.ranges[name] = Interval(min(choices), max(choices))
+                    if all(isinstance(c, int) for c in choices):
+                        self.integral.add(name)
+            if name in self.ranges:
+                self.forms[name] = {name: 1.0, '': 0.0}
+
+    def set_range(self, name: str, lo: float, hi: float) -> bool:
+        """Narrow a random variable's range; returns whether it changed."""
+        current = self.ranges[name]
+        if name in self.integral:
+            lo = math.ceil(lo - 1e-9) if lo > -INF else lo
+            hi = math.floor(hi + 1e-9) if hi < INF else hi
+        spec = self.variables[name]
+        if spec.get('type') == 'random_choice':
+            inside = [c for c in spec['choices'] if max(lo, current.lo) <= c <= min(hi, current.hi)]
+            lo, hi = (min(inside), max(inside)) if inside else (1, 0)
+        new = Interval(max(current.lo, lo), min(current.hi, hi))
+        if new == current:
+            return False
+        self.ranges[name] = new
+        return True
+
+    # -- linear forms and facts ------------------------------------------------
+
+    def linear(self, node) -> Optional[Dict[str, float]]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return {'': float(node.value)}
+        if isinstance(node, ast.Name):
+            return self.forms.get(node.id)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            form = self.linear(node.operand)
+            if form is None:
+                return None
+            return form if isinstance(node.op, ast.UAdd) else _linear_sub({'': 0.0}, form)
+        if isinstance(node, ast.BinOp):
+            left, right = self.linear(node.left), self.linear(node.right)
+            if left is None or right is None:
+                return None
+            if isinstance(node.op, ast.Add):
+                return _linear_sub(left, right, -1.0)
+            if isinstance(node.op, ast.Sub):
+                return _linear_sub(left, right)
+            constant = lambda form: set(form) == {''}
+            if isinstance(node.op, ast.Mult) and (constant(left) or constant(right)):
+                factor, form = (left[''], right) if constant(left) else (right[''], left)
+                return {name: c * factor for name, c in form.items() if c * factor or name == ''}
+            if isinstance(node.op, ast.Div) and constant(right) and right['']:
+                return {name: c / right[''] for name, c in left.items()}
+        return None
+
+    def relations(self, node):
+        """(form, op) pairs meaning `form op 0` for a linear comparison, op one of > >= == !=."""
+        if not isinstance(node, ast.Compare):
+            return
+        operands = [node.left] + list(node.comparators)
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            lf, rf = self.linear(left), self.linear(right)
+            if lf is None or rf is None:
+                continue
+            if isinstance(op, (ast.Gt, ast.GtE)):
+                yield _linear_sub(lf, rf), '>' if isinstance(op, ast.Gt) else '>='
+            elif isinstance(op, (ast.Lt, ast.LtE)):
+                yield _linear_sub(rf, lf), '>' if isinstance(op, ast.Lt) else '>='
+            elif isinstance(op, ast.Eq):
+                yield _linear_sub(lf, rf), '=='
+            elif isinstance(op, ast.NotEq):
+                yield _linear_sub(lf, rf), '!='
+
+    def collect_facts(self):
+        flip = {'>': '<', '>=': '<=', '==': '==', '!=': '!='}
+        for _, node in self.constraints:
+            for form, op in self.relations(node):
+                key, scale = _normalize(form)
+                if key is not None:
+                    self.facts.setdefault(key, set()).add(op if scale > 0 else flip[op])
+
+    def known(self, node) -> Tuple[bool, Interval]:
+        """(known nonzero, sign bounds) of an expression from the constraints."""
+        form = self.linear(node)
+        if form is None:
+            return False, TOP
+        key, scale = _normalize(form)
+        nonzero, bounds = False, TOP
+        for fact in self.facts.get(key, ()):
+            # The normalized form n satisfies `n fact 0`; form == scale * n.
+            if scale < 0:
+                fact = {'>': '<', '<': '>', '>=': '<=', '<=': '>='}.get(fact, fact)
+            nonzero |= fact in ('>', '<', '!=')
+            bounds = {
+                '>': Interval(max(bounds.lo, 0), bounds.hi), '>=': Interval(max(bounds.lo, 0), bounds.hi),
+                '<': Interval(bounds.lo, min(bounds.hi, 0)), '<=': Interval(bounds.lo, min(bounds.hi, 0)),
+                '==': Interval(0, 0),
+            }.get(fact, bounds)
+        return nonzero, bounds
+
+    # -- interval evaluation ---------------------------------------------------
+
+    def warn(self, message: str):
+        message = f'{self.label}: {message}'
+        if message not in self.warnings:
+            self.warnings.append(message)
+
+    def interval(self, node) -> Interval:
+        result = self._interval(node)
+        if not isinstance(node, ast.Constant):
+            _, bounds = self.known(node)
+            narrowed = Interval(max(result.lo, bounds.lo), min(result.hi, bounds.hi))
+            if narrowed.lo <= narrowed.hi:
+                result = narrowed
+        return result
+
+    def _interval(self, node) -> Interval:
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, (int, float)):
+                return Interval(float(node.value), float(node.value))
+            return TOP
+        if isinstance(node, ast.Name):
+            if node.id in self.ranges:
+                return self.ranges[node.id]
+            return self.intervals.get(node.id, TOP)
+        if isinstance(node, ast.UnaryOp):
+            operand = self.interval(node.operand)
+            if isinstance(node.op, ast.USub):
+                return _neg(operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return Interval(0, 1) if isinstance(node.op, ast.Not) else TOP
+        if isinstance(node, ast.BinOp):
+            left, right = self.interval(node.left), self.interval(node.right)
+            if isinstance(node.op, ast.Add):
+                return _add(left, right)
+            if isinstance(node.op, ast.Sub):
+                return _add(left, _neg(right))
+            if isinstance(node.op, ast.Mult):
+                return _mul(left, right)
+            if isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)):
+                if right.contains(0) and not self.known(node.right)[0]:
+                    self.warn(f"possible division by zero in '{ast.unparse(node)}'")
+                if isinstance(node.op, ast.Mod):
+                    return Interval(0, right.hi) if right.lo > 0 else TOP
+                quotient = _div(left, right)
+                if isinstance(node.op, ast.FloorDiv):
+                    return _monotone(math.floor, quotient) if quotient != TOP else TOP
+                return quotient
+            if isinstance(node.op, ast.Pow):
+                return _pow(left, right)
+            return TOP
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            return self._call(node)
+        if isinstance(node, ast.IfExp):
+            body, orelse = self.interval(node.body), self.interval(node.orelse)
+            return Interval(min(body.lo, orelse.lo), max(body.hi, orelse.hi))
+        if isinstance(node, (ast.Compare, ast.BoolOp)):
+            for child in ast.iter_child_nodes(node):
+                self.interval(child)  # For the warnings
+            return Interval(0, 1)
+        return TOP
+
+    def _call(self, node) -> Interval:
+        name = node.func.id
+        args = [self.interval(arg) for arg in node.args]
+        if name in ('sqrt', 'log', 'log10') and len(args) == 1:
+            (arg,) = args
+            if name == 'sqrt' and arg.lo < 0:
+                self.warn(f"sqrt of a possibly negative value in '{ast.unparse(node)}'")
+                arg = Interval(0, max(arg.hi, 0))
+            elif name != 'sqrt' and arg.lo <= 0 and not (arg.lo == 0 and self.known(node.args[0])[0]):
+                self.warn(f"{name} of a possibly non-positive value in '{ast.unparse(node)}'")
+                return TOP
+            return _monotone({'sqrt': math.sqrt, 'log': math.log, 'log10': math.log10}[name], arg)
+        if name == 'log' and len(args) == 2:
+            if args[0].lo <= 0:
+                self.warn(f"log of a possibly non-positive value in '{ast.unparse(node)}'")
+            return TOP
+        if name == 'exp' and len(args) == 1:
+            return _monotone(lambda x: math.exp(x) if x < 700 else INF, args[0])
+        if name == 'abs' and len(args) == 1:
+            (arg,) = args
+            if arg.contains(0):
+                return Interval(0, max(-arg.lo, arg.hi))
+            return _hull([abs(arg.lo), abs(arg.hi)])
+        if name in ('sin', 'cos') and len(args) == 1:
+            return Interval(-1, 1)
+        if name == 'pow' and len(args) == 2:
+            return _pow(*args)
+        if name == 'round' and args:
+            return Interval(args[0].lo - 0.5, args[0].hi + 0.5)
+        if name in ('min', 'max') and len(args) > 1:
+            pick = min if name == 'min' else max
+            return Interval(pick(a.lo for a in args), pick(a.hi for a in args))
+        return TOP
+
+    # -- the analysis ------------------------------------------------------------
+
+    def propagate(self) -> str:
+        """Narrow the random ranges by the linear constraints; returns why the spec is unsatisfiable, if it is."""
+        relations = [(text, form, op) for text, node in self.constraints for form, op in self.relations(node)]
+        for _ in range(MAX_ROUNDS):
+            changed = False
+            for text, form, op in relations:
+                names = [name for name in form if name]
+                if not names:
+                    holds = {'>': form[''] > 0, '>=': form[''] >= 0, '==': form[''] == 0, '!=': form[''] != 0}[op]
+                    if not holds:
+                        return f"constraint '{text}' never holds"
+                    continue
+                whole = self.integer_valued(form)
+                for name in names:
+                    coefficient = form[name]
+                    # coefficient * name  op  -(constant + the other terms)
+                    rest = Interval(form.get('', 0.0), form.get('', 0.0))
+                    for other in names:
+                        if other != name:
+                            rest = _add(rest, _mul(Interval(form[other], form[other]), self.ranges[other]))
+                    rest = _neg(rest)
+                    if op in ('>', '>='):
+                        bound = rest.lo + (1 if op == '>' and whole else 0)
+                        lo, hi = (bound / coefficient, INF) if coefficient > 0 else (-INF, bound / coefficient)
+                    elif op == '==':
+                        lo, hi = sorted((rest.lo / coefficient, rest.hi / coefficient))
+                    else:
+                        current = self.ranges[name]
+                        if rest.lo != rest.hi or name not in self.integral:
+                            continue
+                        excluded = rest.lo / coefficient
+                        lo, hi = current
+                        if excluded == lo:
+                            lo += 1
+                        elif excluded == hi:
+                            hi -= 1
+                    changed |= self.set_range(name, lo, hi)
+                    if self.ranges[name].lo > self.ranges[name].hi:
+                        return f"no value of '{name}' satisfies '{text}'"
+            if not changed:
+                break
+        return ''
+
+    def run(self) -> SpecAnalysis:
+        self.init_ranges()
+        for name, bounds in self.ranges.items():
+            if bounds.lo > bounds.hi:
+                return SpecAnalysis({}, {}, (), False, f"'{name}' has min greater than max")
+        exact = set()
+        for name in self.order:
+            form = self.linear(ast.parse(self.variables[name]['formula'], mode='eval').body)
+            # Float results are rounded to the variable's precision, so only
+            # forms with integer values can stand in for the variable.
+            if form is not None and self.integer_valued(form):
+                self.forms[name] = form
+                exact.add(name)
+        self.collect_facts()
+        reason = self.propagate()
+        if reason:
+            return SpecAnalysis({}, {}, (), False, reason)
+
+        self.intervals = dict(self.ranges)
+        for name in self.order:
+            self.label = f"formula for '{name}'"
+            bounds = self.interval(ast.parse(self.variables[name]['formula'], mode='eval').body)
+            if name not in exact:
+                # Rounding moves a value by at most half a unit of its precision.
+                half = 0.5 * 10 ** -self.variables[name].get('precision', self.precision)
+                bounds = Interval(bounds.lo - half, bounds.hi + half)
+            self.intervals[name] = bounds
+
+        satisfiable = True
+        for text, node in self.constraints:
+            self.label = f"constraint '{text}'"
+            verdict = self.decide(node)
+            if verdict is False:
+                return SpecAnalysis({}, {}, (), False, f"constraint '{text}' never holds")
+            if verdict is None:
+                satisfiable = None
+        if self.warnings:
+            satisfiable = None  # Some draws may raise instead
+        ranges = {name: tuple(interval) for name, interval in self.ranges.items()}
+        return SpecAnalysis(ranges, self.intervals, tuple(self.warnings), satisfiable)
+
+    def integer_valued(self, form: Dict[str, float]) -> bool:
+        """Whether a linear form only takes integer values, so rounding cannot change it."""
+        return all(name in self.integral for name in form if name) and all(
+            float(c).is_integer() for c in form.values())
+
+    def decide(self, node) -> Optional[bool]:
+        """Whether a comparison holds for every draw (True), none (False) or some (None)."""
+        if not isinstance(node, ast.Compare):
+            self.interval(node)
+            return None
+        operands = [self.interval(operand) for operand in [node.left] + list(node.comparators)]
+        verdicts = []
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            if isinstance(op, (ast.Lt, ast.LtE)):
+                op, left, right = (ast.Gt() if isinstance(op, ast.Lt) else ast.GtE()), right, left
+            if isinstance(op, ast.Gt):
+                verdicts.append(True if left.lo > right.hi else False if left.hi <= right.lo else None)
+            elif isinstance(op, ast.GtE):
+                verdicts.append(True if left.lo >= right.hi else False if left.hi < right.lo else None)
+            elif isinstance(op, ast.Eq):
+                disjoint = left.hi < right.lo or right.hi < left.lo
+                point = left.lo == left.hi == right.lo == right.hi
+                verdicts.append(False if disjoint else True if point else None)
+            elif isinstance(op, ast.NotEq):
+                disjoint = left.hi < right.lo or right.hi < left.lo
+                point = left.lo == left.hi == right.lo == right.hi
+                verdicts.append(True if disjoint else False if point else None)
+            else:
+                verdicts.append(None)
+        if False in verdicts:
+            return False
+        return True if all(verdicts) else None
+
+
+def analyze_spec(variables: Dict[str, Dict[str, Any]], order: List[str], constraints: List[str],
+                 precision: int = 2) -> SpecAnalysis:
+    """
+    Bound a spec's variables and narrow its random ranges by its constraints.
+
+    Args:
+        variables: the spec's variables
+        order: names of the computed variables, dependencies first
+        constraints: the spec's constraint expressions
+        precision: decimal places computed floats are rounded to, unless
+            the variable sets its own
+
+    Returns:
+        SpecAnalysis; when `satisfiable` is False, `reason` says why and
+        the other fields are empty
+    """
+    return _Analyzer(variables, order, constraints, precision).run()
+
+
+def narrowed_spec(var_spec: Dict[str, Any], bounds: Tuple[float, float], precision: int) -> Dict[str, Any]:
+    """A random variable's spec restricted to its analysed bounds."""
+    lo, hi = bounds
+    var_type = var_spec.get('type')
+    if var_type == 'random_int':
+        return {**var_spec, 'min': int(lo), 'max': int(hi)}
+    if var_type == 'random_float':
+        # Round outwards so values rounded to the precision at the edges stay reachable.
+        scale = 10 ** var_spec.get('precision', precision)
+        return {**var_spec, 'min': math.floor(lo * scale) / scale, 'max': math.ceil(hi * scale) / scale}
+    return {**var_spec, 'choices': [c for c in var_spec['choices'] if lo <= c <= hi]}
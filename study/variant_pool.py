@@ -0,0 +1,187 @@
+"""Variants of parameterized cards.
+
+Generating a parameterized card compiles every formula and constraint and
+may retry up to ParameterGenerator.max_retries times, which is too slow to
+do for every card on every page. Instead each parameterized card keeps up
+to pool_size() pre-generated ParameterizedVariant rows.
+
+Inside a study session a card's variant is fixed by its seed,
+variant_seed(user id, card id, StudySession.variant_seed): seeded_variants
+picks the pool row the seed points at, and caches the rendered variant
+under the seed and the card's updated_at, as card_payloads does for
+payloads, so refreshing or re-opening the session shows the same numbers.
+Only a card with an empty pool is generated live, from the seed.
+
+Pages without a session (the Today queue) use take_variants, which hands
+out one random variant per card and deletes it, so a student does not keep
+seeing the same numbers, and the page generates live only when a card's
+pool is empty. When taking
+leaves a pool below low_water_mark(), take_variants marks the card instead
+of refilling it during the request; `fill_variant_pools --low`, run often
+from cron, refills just the marked cards, so busy cards do not drain to
+live generation between full fill_variant_pools runs. The post_save
+handler in signals.py empties a card's pool when its spec or templates
+change.
+"""
+import random
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Flashcard, ParameterizedVariant
+from .utils import ParameterGenerator, TemplateRenderer, generate_parameterized_card, variant_seed
+
+VARIANT_CACHE_SECONDS = 24 * 60 * 60
+LOW_POOLS_KEY = 'variant_pool:low'
+FILL_LOCK_SECONDS = 10 * 60
+
+
+def pool_size() -> int:
+    return getattr(settings, 'PARAMETERIZED_VARIANT_POOL_SIZE', 50)
+
+
+def low_water_mark() -> int:
+    return getattr(settings, 'PARAMETERIZED_VARIANT_LOW_WATER', 10)
+
+
+def parameterized_cards():
+    """Cards that get a variant pool."""
+    return Flashcard.objects.filter(question_type='parameterized', parameter_spec__isnull=False)
+
+
+def fill_pool(card, size=None):
+    """
+    Generate variants of `card` until its pool holds `size` (default pool_size()).
+
+    The values are drawn with ParameterGenerator.generate_batch, so a
+    whole pool costs about as much as one vectorised batch.
+
+    Returns:
+        Number of variants created; fewer than needed when the card's
+        constraints are too tight, and 0 when its spec cannot be satisfied
+        or another process is filling the same pool.
+    """
+    size = pool_size() if size is None else size
+    if not card.parameter_spec:
+        return 0
+    # Two concurrent fills would both count the same shortfall and overshoot.
+    lock = f'variant_pool:filling:{card.id}'
+    if not cache.add(lock, 1, FILL_LOCK_SECONDS):
+        return 0
+    try:
+        needed = size - card.variants.count()
+        if needed <= 0:
+            return 0
+        try:
+            rows = ParameterGenerator(card.parameter_spec).generate_batch(needed)
+        except ValueError:
+            return 0
+        renderer = TemplateRenderer()
+        ParameterizedVariant.objects.bulk_create([
+            ParameterizedVariant(
+                flashcard=card,
+                question=renderer.render(card.question_template, values),
+                answer=renderer.render(card.answer_template, values),
+                values=values,
+            )
+            for values in rows
+        ])
+        return len(rows)
+    finally:
+        cache.delete(lock)
+
+
+def pop_low_pools():
+    """Ids of the cards take_variants marked as running low, clearing the marks."""
+    card_ids = cache.get(LOW_POOLS_KEY, set())
+    cache.delete(LOW_POOLS_KEY)
+    return card_ids
+
+
+def take_variants(card_ids):
+    """
+    Take one random stored variant of each card in `card_ids`.
+
+    Cards whose pool is left below low_water_mark() are marked for
+    `fill_variant_pools --low` (see pop_low_pools).
+
+    Returns:
+        Dict of flashcard id to (question, answer). Cards with an empty pool
+        are missing from it. The returned variants are deleted.
+    """
+    by_card = defaultdict(list)
+    for variant_id, card_id in ParameterizedVariant.objects.filter(
+        flashcard_id__in=card_ids
+    ).values_list('id', 'flashcard_id'):
+        by_card[card_id].append(variant_id)
+    taken = {}
+    if by_card:
+        picked = ParameterizedVariant.objects.filter(id__in=[random.choice(ids) for ids in by_card.values()])
+        taken = {card_id: (question, answer) for card_id, question, answer in
+                 picked.values_list('flashcard_id', 'question', 'answer')}
+        picked.delete()
+
+    low = [card_id for card_id in card_ids if len(by_card.get(card_id, ())) - (card_id in taken) < low_water_mark()]
+    if low:
+        # Racing writers may drop each other's marks; the full cron run still fills those pools.
+        cache.set(LOW_POOLS_KEY, cache.get(LOW_POOLS_KEY, set()) | set(low), timeout=None)
+    return taken
+
+
+def _variant_cache_key(card_id, updated_at, seed):
+    return f'card_variant:{card_id}:{updated_at.timestamp()}:{seed}'
+
+
+def seeded_variants(payloads, user_id, session_seed):
+    """
+    The variant of each card in a study session, picked from its pool by its seed.
+
+    Args:
+        payloads: Dict of flashcard id to its card_payloads payload, for
+            parameterized cards
+        user_id: The student's id
+        session_seed: The session's StudySession.variant_seed
+
+    Returns:
+        Dict of flashcard id to (question, answer). Cards whose pool is
+        empty and whose spec cannot be generated are missing from it.
+    """
+    seeds = {card_id: variant_seed(user_id, card_id, session_seed) for card_id in payloads}
+    keys = {
+        card_id: _variant_cache_key(card_id, payload['updated_at'], seeds[card_id])
+        for card_id, payload in payloads.items()
+    }
+    cached = cache.get_many(keys.values())
+    variants = {card_id: tuple(cached[key]) for card_id, key in keys.items() if key in cached}
+
+    missing = [card_id for card_id in keys if card_id not in variants]
+    pools = defaultdict(list)
+    for card_id, variant_id in ParameterizedVariant.objects.filter(
+        flashcard_id__in=missing
+    ).order_by('id').values_list('flashcard_id', 'id'):
+        pools[card_id].append(variant_id)
+    generated = {}
+    if pools:
+        picked = [ids[seeds[card_id] % len(ids)] for card_id, ids in pools.items()]
+        for card_id, question, answer in ParameterizedVariant.objects.filter(
+            id__in=picked
+        ).values_list('flashcard_id', 'question', 'answer'):
+            generated[keys[card_id]] = (question, answer)
+
+    for card_id in missing:
+        # An empty pool, or the picked row was taken in the meantime.
+        if keys[card_id] not in generated:
+            parameterized = payloads[card_id]['parameterized']
+            try:
+                question, answer, _ = generate_parameterized_card(
+                    parameterized['spec'], parameterized['question_template'], parameterized['answer_template'],
+                    seed=seeds[card_id],
+                )
+            except Exception:
+                continue
+            generated[keys[card_id]] = (question, answer)
+        variants[card_id] = generated[keys[card_id]]
+    if generated:
+        cache.set_many(generated, VARIANT_CACHE_SECONDS)
+    return variants
@@ -2,16 +2,17 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, logout, authenticate
-from django.contrib.auth.models import User
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Count, Avg, Sum, Q, F, Subquery, OuterRef, IntegerField
+from django.db.models import Count, Avg, Sum, Q, F, Exists, Subquery, OuterRef, IntegerField
 from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
-from django.http import HttpResponseForbidden, JsonResponse
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
 from django.utils.http import url_has_allowed_host_and_scheme
+from django.utils.text import slugify
 from django.views.decorators.http import require_POST
 from functools import wraps
 from .models import (Course, Topic, Flashcard, StudySession, FlashcardProgress,
@@ -19,10 +20,23 @@ from .models import (Course, Topic, Flashcard, StudySession, FlashcardProgress,
                      AccountabilityLink, AccountabilityRelationship,
                      UserBadge, BADGE_DEFINITIONS, TopicScore,
                      FlashcardVote, FlashcardComment, CardSuggestion,
-                     SpacedRepetitionSettings)
+                     SpacedRepetitionSettings, random_session_seed)
 import datetime
 from .forms import CourseForm, TopicForm, FlashcardForm, CustomRegistrationForm
 from .utils import generate_parameterized_card
+from .utils.scheduling import reschedule_progress
+from .counters import NEW_STATE, card_state, due_today_by_course, get_topic_counters, record_transitions
+from .review_queue import decode_cursor, due_progress, today_queue_chunk
+from .review_log import log_review, log_reviews
+from .forecast import FORECAST_DAYS, least_loaded_interval, record_due_change, review_forecast
+from .progress_writes import previous_state, record_review
+from .step_progress import bump_step, compact_enabled, pack_steps, unpack_steps
+from .profile_bundle import get_profile_bundle, load_profile_bundle
+from .card_payloads import LIGHT_FIELDS, entry_keys, get_payloads
+from .variant_pool import seeded_variants, take_variants
+from .session_queue import IDLE_HOURS, apply_ratings, pack_queue, unpack_queue
+from .worksheets import (FORMATS as WORKSHEET_FORMATS, MAX_VARIANTS, MAX_VIEW_VARIANTS, generate_variants,
+                         worksheet_cards, worksheet_document)
 import random
 import json
 
@@ -34,12 +48,11 @@ VOTE_FLAG_THRESHOLD = -5  # Cards with net score at or below this are flagged fo
 SUGGESTION_MAX_QUESTION_LEN = 2000
 SUGGESTION_MAX_ANSWER_LEN = 2000
 SUGGESTION_MAX_HINT_LEN = 500
+REVIEW_BATCH_MAX_SIZE = 500  # Ratings accepted per /progress/batch/ request
+STUDY_CHUNK_SIZE = 10  # Cards per chunk of a study session; the page embeds only the first
+STUDY_DECKS_KEPT = 3  # Unrated decks kept in request.session until their first rating creates the session
 
 # Utility functions for public content
-def get_system_user():
-    """Get the system user for public content."""
-    return User.objects.filter(username='system').first()
-
 def get_public_content_filter(user, model_class):
     """
     Get a Q filter for accessing both user's own content and public content.
@@ -51,20 +64,16 @@ def get_public_content_filter(user, model_class):
     Returns:
         Q object that filters for user's content OR public content
     """
-    system_user = get_system_user()
-    
-    # Determine the field path based on the model
-    if model_class == Course:
-        field_path = 'created_by'
-    elif model_class == Topic:
-        field_path = 'course__created_by'
+    # Determine the path to the owning course based on the model
+    if model_class == Topic:
+        course_path = 'course__'
     elif model_class == Flashcard:
-        field_path = 'topic__course__created_by'
+        course_path = 'topic__course__'
     else:
-        field_path = 'created_by'  # Default
+        course_path = ''  # Course itself
     
-    # Build filter: user's content OR public content
-    return Q(**{field_path: user}) | (Q(**{field_path: system_user}) if system_user else Q(pk__in=[]))
+    # Build filter: user's content OR public content (Course.is_public is indexed)
+    return Q(**{f'{course_path}created_by': user}) | Q(**{f'{course_path}is_public': True})
 
 # Custom decorators
 def staff_required(view_func):
@@ -86,6 +95,7 @@ def home(request):
         context = {
             'courses': courses,
             'recent_sessions': recent_sessions,
+            'due_today': sum(due_today_by_course(request.user).values()),
         }
     return render(request, 'study/home.html', context)
 
@@ -101,14 +111,11 @@ def register(request):
             user = form.save()
             login(request, user, backend='django.contrib.auth.backends.ModelBackend')
             # Auto-enroll new users in all system courses
-            system_user = get_system_user()
-            if system_user:
-                system_courses = Course.objects.filter(created_by=system_user)
-                for course in system_courses:
-                    CourseEnrollment.objects.get_or_create(
-                        user=user, course=course,
-                        defaults={'status': 'studying'}
-                    )
+            for course in Course.objects.filter(is_public=True):
+                CourseEnrollment.objects.get_or_create(
+                    user=user, course=course,
+                    defaults={'status': 'studying'}
+                )
             messages.success(request, 'Welcome! Browse the course catalogue to get started.')
             return redirect('course_catalog')
     else:
@@ -173,20 +180,17 @@ def course_list(request):
 @login_required
 def course_catalog(request):
     """Course Catalog - Browse all public courses available for enrollment"""
-    system_user = get_system_user()
-    
-    if not system_user:
-        messages.warning(request, 'No public courses available yet.')
-        return redirect('course_list')
-    
     # Get all public courses
-    public_courses = Course.objects.filter(created_by=system_user).annotate(
+    public_courses = list(Course.objects.filter(is_public=True).annotate(
         topic_count=Count('topics', distinct=True),
         flashcard_count=Count('topics__flashcards', distinct=True)
-    ).order_by('name')
+    ).order_by('name'))
+    
+    if not public_courses:
+        messages.warning(request, 'No public courses available yet.')
+        return redirect('course_list')
     
-    # Get user's enrolled course IDs as a set for efficient membership checking
-    enrolled_course_ids = set(CourseEnrollment.objects.filter(user=request.user).values_list('course_id', flat=True))
+    enrolled_course_ids = get_profile_bundle(request).enrolled_course_ids
     
     # Mark which courses are enrolled
     for course in public_courses:
@@ -198,19 +202,24 @@ def course_catalog(request):
 @login_required
 def course_detail(request, course_id):
     """View details of a specific course (enrolled or catalog)"""
-    system_user = get_system_user()
-    
     # Check if user is enrolled in this course
-    enrollment = CourseEnrollment.objects.filter(user=request.user, course_id=course_id).first()
+    enrollment = None
+    if get_profile_bundle(request).is_enrolled(course_id):
+        enrollment = CourseEnrollment.objects.filter(user=request.user, course_id=course_id).first()
     
     if enrollment:
         # Show enrolled course details
         course = enrollment.course
     else:
         # Show catalog course (must be public)
-        course = get_object_or_404(Course, id=course_id, created_by=system_user)
+        course = get_object_or_404(Course, id=course_id, is_public=True)
     
-    topics = course.topics.all().annotate(flashcard_count=Count('flashcards')).order_by('code', 'name')
+    topics = list(course.topics.all().annotate(flashcard_count=Count('flashcards')).order_by('code', 'name'))
+    if enrollment:
+        counters = get_topic_counters(request.user, [t.id for t in topics])
+        for topic in topics:
+            topic.counts = counters[topic.id]
+            topic.due_count = topic.counts.due_count()
     
     return render(request, 'study/course_detail.html', {
         'course': course,
@@ -224,10 +233,8 @@ def course_detail(request, course_id):
 @require_POST
 def enroll_course(request, course_id):
     """Enroll in a public course"""
-    system_user = get_system_user()
-    
     # Only allow enrolling in public courses
-    course = get_object_or_404(Course, id=course_id, created_by=system_user)
+    course = get_object_or_404(Course, id=course_id, is_public=True)
     
     # Create enrollment if it doesn't exist
     enrollment, created = CourseEnrollment.objects.get_or_create(
@@ -297,14 +304,13 @@ def topic_detail(request, topic_id):
     """View details of a specific topic."""
     topic = get_object_or_404(Topic.objects.select_related('course__created_by'), id=topic_id)
 
-    system_user = get_system_user()
     is_owner = topic.course.created_by == request.user
-    enrollment = CourseEnrollment.objects.filter(user=request.user, course=topic.course).first()
+    is_enrolled = get_profile_bundle(request).is_enrolled(topic.course_id)
 
     # Only block access to privately-owned courses that the user has no relation to.
     # System (public) course topics are viewable by any authenticated user; the template
     # restricts interactive actions (voting, studying, suggesting) to enrolled users.
-    if not enrollment and not is_owner and topic.course.created_by != system_user:
+    if not is_enrolled and not is_owner and not topic.course.is_public:
         messages.error(request, 'You must be enrolled in this course to view topics.')
         return redirect('course_catalog')
 
@@ -316,24 +322,165 @@ def topic_detail(request, topic_id):
     )
 
     # Count cards due for review today
-    today = datetime.date.today()
-    due_count = FlashcardProgress.objects.filter(
-        user=request.user,
-        flashcard__topic=topic,
-        next_review_date__lte=today,
-        step_index=-1,
-    ).count()
+    due_count = get_topic_counters(request.user, [topic.id])[topic.id].due_count()
 
     return render(request, 'study/topic_detail.html', {
         'topic': topic,
         'flashcards': flashcards,
-        'is_enrolled': enrollment is not None,
+        'is_enrolled': is_enrolled,
         'flag_threshold': VOTE_FLAG_THRESHOLD,
-        'is_system_course': topic.course.created_by == system_user,
+        'is_system_course': topic.course.is_public,
         'due_count': due_count,
     })
 
 
+def _build_flashcards_data(flashcards, progress_map, variant_seeds=None):
+    """Build the per-card dicts the study page renders.
+
+    step_by_step cards are expanded into one virtual card per step and
+    parameterized cards get a freshly generated question/answer pair. The
+    static part of each card comes from card_payloads; only the votes and
+    SR fields are filled in per request, so `flashcards` need only
+    card_payloads.LIGHT_FIELDS and the vote annotations loaded.
+    `progress_map` maps flashcard id to its whole-card FlashcardProgress.
+    With `variant_seeds`, a (user id, StudySession.variant_seed) pair,
+    parameterized cards show the pool variant their seed picks (see
+    variant_pool), the same every time the session is shown, or their raw
+    templates when no seeded variant can be found or generated. Otherwise they take a pre-generated
+    variant from their pool and only generate one live when the pool is
+    empty.
+    """
+    payloads = get_payloads(flashcards)
+    parameterized_payloads = {card_id: payload for card_id, payload in payloads.items() if payload['parameterized']}
+    if variant_seeds is None:
+        variants = take_variants(list(parameterized_payloads))
+    else:
+        variants = seeded_variants(parameterized_payloads, *variant_seeds)
+    flashcards_data = []
+    for fc in flashcards:
+        payload = payloads.get(fc.id)
+        if payload is None:  # deleted since the caller loaded it
+            continue
+        prog = progress_map.get(fc.id)
+        overlay = {
+            'net_votes': fc.net_votes,
+            'upvotes': fc.upvotes,
+            'downvotes': fc.downvotes,
+            'user_vote': fc.user_vote,
+            # SR metadata for display
+            'next_review_date': prog.next_review_date.isoformat() if prog and prog.next_review_date else None,
+            'interval_days': prog.interval_days if prog else 0,
+            'sm2_repetitions': prog.sm2_repetitions if prog else 0,
+            'easiness_factor': prog.easiness_factor if prog else 2.5,
+        }
+        parameterized = payload['parameterized']
+        if parameterized and fc.id in variants:
+            question, answer = variants[fc.id]
+            overlay.update(question=question, answer=answer)
+        elif parameterized:
+            question = None
+            if variant_seeds is None:
+                try:
+                    question, answer, _ = generate_parameterized_card(
+                        parameterized['spec'], parameterized['question_template'], parameterized['answer_template']
+                    )
+                except Exception:
+                    pass
+            if question is None:
+                # Also when seeded generation failed: an unseeded variant
+                # would change every time the session is shown.
+                question = parameterized['question_template'] or payload['entries'][0]['question']
+                answer = parameterized['answer_template'] or payload['entries'][0]['answer']
+            overlay.update(question=question, answer=answer)
+        flashcards_data.extend(dict(entry, **overlay) for entry in payload['entries'])
+    return flashcards_data
+
+
+
+
+def _resumable_session(user, topic, is_review_mode):
+    """The user's latest unfinished session of `topic` with entries left to study, or None."""
+    session = StudySession.objects.filter(
+        user=user, topic=topic, is_review=is_review_mode, ended_at__isnull=True,
+        queue__isnull=False,
+        last_review_at__gte=timezone.now() - datetime.timedelta(hours=IDLE_HOURS),
+    ).first()
+    if session is None or session.queue_cursor >= len(unpack_queue(session.queue)):
+        return None
+    return session
+
+
+def _deck_key(topic_id, is_review_mode):
+    return f'{topic_id}:{int(is_review_mode)}'
+
+
+def _pending_deck(request, deck_key):
+    """
+    (queue entries, variant seed) of the unrated deck stored under `deck_key`
+    in request.session, or (None, None).
+    """
+    deck = request.session.get('study_decks', {}).get(deck_key)
+    if deck is None:
+        return None, None
+    if parse_datetime(deck['created_at']) < timezone.now() - datetime.timedelta(hours=IDLE_HOURS):
+        return None, None
+    return [tuple(entry) for entry in deck['queue']], deck.get('variant_seed', 0)
+
+
+def _store_pending_deck(request, deck_key, entries):
+    """Store a new deck; returns its variant seed, which the session created from it keeps."""
+    decks = request.session.get('study_decks', {})
+    decks.pop(deck_key, None)
+    seed = random_session_seed()
+    decks[deck_key] = {'queue': entries, 'created_at': timezone.now().isoformat(), 'variant_seed': seed}
+    request.session['study_decks'] = dict(list(decks.items())[-STUDY_DECKS_KEPT:])
+    return seed
+
+
+def _start_session_from_deck(request, deck_key):
+    """Create the StudySession of the unrated deck `deck_key` (at its first rating), or None if it is gone."""
+    entries, seed = _pending_deck(request, deck_key)
+    if entries is None:
+        return None
+    decks = request.session['study_decks']
+    del decks[deck_key]
+    request.session['study_decks'] = decks
+    topic_id, is_review = deck_key.split(':')
+    return StudySession.objects.create(
+        user=request.user, topic_id=int(topic_id), is_review=is_review == '1',
+        queue=pack_queue(entries), variant_seed=seed,
+    )
+
+
+def _random_sample(queryset, limit):
+    """Up to `limit` rows of `queryset` in random_key order from a random start, wrapping around."""
+    start = random.random()
+    rows = list(queryset.filter(random_key__gte=start).order_by('random_key')[:limit])
+    if len(rows) < limit:
+        rows += queryset.filter(random_key__lt=start).order_by('random_key')[:limit - len(rows)]
+    return rows
+
+
+def _assemble_deck(user, topic, is_review_mode, daily_new_cap, today):
+    """
+    The cards of a new study deck, shuffled, with only id and question_type loaded.
+
+    Review decks hold the cards due by `today`. Other decks hold every card
+    the user has seen plus up to `daily_new_cap` new ones; the new ones are
+    a random sample taken by the database (see Flashcard.random_key), so a
+    large topic's unseen cards are never all read.
+    """
+    progress = FlashcardProgress.objects.filter(user=user, flashcard__topic=topic, step_index=-1)
+    if is_review_mode:
+        progress = progress.filter(next_review_date__lte=today)
+    cards = topic.flashcards.only('id', 'question_type')
+    flashcards = list(cards.filter(id__in=progress.values('flashcard_id')))
+    if daily_new_cap > 0:
+        new_cards = cards.exclude(Exists(progress.filter(flashcard=OuterRef('pk'))))
+        flashcards += _random_sample(new_cards, daily_new_cap)
+    # Shuffle for variety; only the picked cards are in memory.
+    random.shuffle(flashcards)
+    return flashcards
 
 
 @login_required
@@ -341,160 +488,76 @@ def study_session(request, topic_id):
     """Start a study session for a topic - user must be enrolled.
 
     When ?review=1 is passed, only cards due for review today are included.
+    An unfinished session of the same topic and kind is resumed from its
+    stored queue instead of assembling a new deck. The StudySession row is
+    only created by the first rating (see update_flashcard_progress_batch);
+    until then the deck waits in request.session, so refreshes and mode
+    switches reuse it without adding sessions.
     """
     topic = get_object_or_404(Topic.objects.select_related('course'), id=topic_id)
 
     # Check if user is enrolled in this course
-    enrollment = CourseEnrollment.objects.filter(user=request.user, course=topic.course).first()
-
-    if not enrollment:
+    profile = get_profile_bundle(request)
+    if not profile.is_enrolled(topic.course_id):
         messages.error(request, 'You must be enrolled in this course to study.')
         return redirect('course_catalog')
 
     # Get user's study mode preference
-    preference, _ = StudyPreference.objects.get_or_create(user=request.user)
     valid_modes = {choice[0] for choice in StudyPreference.STUDY_MODES}
     mode_param = request.GET.get('mode')
     if mode_param in valid_modes:
         study_mode = mode_param
     else:
-        study_mode = preference.study_mode
+        study_mode = profile.preference.study_mode
 
     is_review_mode = request.GET.get('review') == '1'
     today = datetime.date.today()
+    sr_settings = profile.sr_settings
 
-    if is_review_mode:
-        # Only cards due today
-        due_ids = set(
-            FlashcardProgress.objects.filter(
-                user=request.user,
-                flashcard__topic=topic,
-                next_review_date__lte=today,
-                step_index=-1,
-            ).values_list('flashcard_id', flat=True)
-        )
-        base_qs = topic.flashcards.filter(id__in=due_ids).prefetch_related('skills')
+    session = _resumable_session(request.user, topic, is_review_mode)
+    deck_key = _deck_key(topic.id, is_review_mode)
+    if session:
+        entries, seed = unpack_queue(session.queue), session.variant_seed
     else:
-        base_qs = topic.flashcards.prefetch_related('skills')
-
-    flashcards = list(_annotate_with_votes(base_qs, request.user))
-
-    if not flashcards:
-        if is_review_mode:
-            messages.info(request, 'No cards are due for review right now. Great work!')
-        else:
-            messages.warning(request, 'No flashcards available for this topic.')
-        return redirect('topic_detail', topic_id=topic_id)
-
-    # Fetch SR progress for all cards in one query
-    progress_map = {
-        p.flashcard_id: p
-        for p in FlashcardProgress.objects.filter(
-            user=request.user,
-            flashcard__in=flashcards,
-            step_index=-1,
-        )
+        entries, seed = _pending_deck(request, deck_key)
+    if entries is None:
+        # Cap new (never-SM2-reviewed) cards to the user's daily_new_cards setting.
+        # This only applies in normal study mode; review mode already shows only due cards.
+        daily_new_cap = 0
+        if not is_review_mode:
+            daily_new_cap = (
+                sr_settings.daily_new_cards
+                if sr_settings
+                else SpacedRepetitionSettings.DEFAULT_DAILY_NEW_CARDS
+            )
+        flashcards = _assemble_deck(request.user, topic, is_review_mode, daily_new_cap, today)
+
+        if not flashcards:
+            if is_review_mode:
+                messages.info(request, 'No cards are due for review right now. Great work!')
+            else:
+                messages.warning(request, 'No flashcards available for this topic.')
+            return redirect('topic_detail', topic_id=topic_id)
+
+        # The deck is served, in this order, a chunk at a time and becomes
+        # the session's queue when the first rating arrives.
+        entries = entry_keys(flashcards)
+        seed = _store_pending_deck(request, deck_key, entries)
+
+    offset = session.queue_cursor if session else 0
+    flashcards_data, next_cursor = _queue_chunk(request.user, entries, offset, seed)
+
+    # One query for the scores of this topic and its prerequisites.
+    prerequisites = list(topic.prerequisites.all())
+    scores = {
+        s.topic_id: s
+        for s in TopicScore.objects.filter(user=request.user, topic_id__in=[topic.id] + [p.id for p in prerequisites])
     }
-
-    # Shuffle for variety (due cards first when in review mode is not strictly needed)
-    random.shuffle(flashcards)
-
-    # Cap new (never-SM2-reviewed) cards to the user's daily_new_cards setting.
-    # This only applies in normal study mode; review mode already shows only due cards.
-    if not is_review_mode:
-        sr_settings = SpacedRepetitionSettings.objects.filter(user=request.user).first()
-        daily_new_cap = (
-            sr_settings.daily_new_cards
-            if sr_settings
-            else SpacedRepetitionSettings.DEFAULT_DAILY_NEW_CARDS
-        )
-        seen = [f for f in flashcards if progress_map.get(f.id) is not None]
-        new_cards = [f for f in flashcards if progress_map.get(f.id) is None]
-        if len(new_cards) > daily_new_cap:
-            flashcards = seen + new_cards[:daily_new_cap]
-
-    # Create study session
-    session = StudySession.objects.create(user=request.user, topic=topic)
-
-    # Process flashcards - expand step_by_step cards into virtual cards
-    flashcards_data = []
-    for fc in flashcards:
-        prog = progress_map.get(fc.id)
-        base = {
-            'id': fc.id,
-            'hint': fc.hint,
-            'difficulty': fc.difficulty,
-            'question_type': fc.question_type,
-            'uses_latex': fc.uses_latex,
-            'diagram_code': fc.diagram_code,
-            'diagram_type': fc.diagram_type,
-            'code_snippet': fc.code_snippet,
-            'code_language': fc.code_language,
-            'graph_image_url': fc.generated_graph_image.url if fc.generated_graph_image else None,
-            'question_image': fc.question_image.url if fc.question_image else None,
-            'answer_image': fc.answer_image.url if fc.answer_image else None,
-            'teacher_explanation': fc.teacher_explanation,
-            'net_votes': fc.net_votes,
-            'upvotes': fc.upvotes,
-            'downvotes': fc.downvotes,
-            'user_vote': fc.user_vote,
-            # SR metadata for display
-            'next_review_date': prog.next_review_date.isoformat() if prog and prog.next_review_date else None,
-            'interval_days': prog.interval_days if prog else 0,
-            'sm2_repetitions': prog.sm2_repetitions if prog else 0,
-        }
-
-        if fc.question_type == 'step_by_step' and fc.steps:
-            steps = fc.steps
-            for k, step in enumerate(steps):
-                virtual = dict(base)
-                virtual.update({
-                    'step_index': k,
-                    'step_total': len(steps),
-                    'question': fc.question,
-                    'context_steps': steps[:k],
-                    'answer': step['move'],
-                    'answer_detail': step.get('detail', ''),
-                    'is_parameterized': False,
-                })
-                flashcards_data.append(virtual)
-
-        elif fc.question_type == 'parameterized' and fc.parameter_spec:
-            try:
-                question, answer, _ = generate_parameterized_card(
-                    fc.parameter_spec, fc.question_template, fc.answer_template
-                )
-            except Exception:
-                question = fc.question_template or fc.question
-                answer = fc.answer_template or fc.answer
-            base.update({
-                'step_index': -1,
-                'step_total': None,
-                'question': question,
-                'answer': answer,
-                'answer_detail': '',
-                'context_steps': [],
-                'is_parameterized': True,
-            })
-            flashcards_data.append(base)
-
-        else:
-            base.update({
-                'step_index': -1,
-                'step_total': None,
-                'question': fc.question,
-                'answer': fc.answer,
-                'answer_detail': '',
-                'context_steps': [],
-                'is_parameterized': False,
-            })
-            flashcards_data.append(base)
-
     nudge_topics = []
-    my_score = TopicScore.objects.filter(user=request.user, topic=topic).first()
+    my_score = scores.get(topic.id)
     if my_score and my_score.score < 0.4 and my_score.attempt_count >= 10:
-        for prereq in topic.prerequisites.all():
-            prereq_score = TopicScore.objects.filter(user=request.user, topic=prereq).first()
+        for prereq in prerequisites:
+            prereq_score = scores.get(prereq.id)
             if prereq_score is None or prereq_score.score < 0.7:
                 nudge_topics.append({
                     'topic': prereq,
@@ -503,17 +566,86 @@ def study_session(request, topic_id):
 
     return render(request, 'study/study_session.html', {
         'topic': topic,
-        'flashcards': flashcards,
         'flashcards_data': flashcards_data,
         'session': session,
         'study_mode': study_mode,
         'study_modes': StudyPreference.STUDY_MODES,
         'nudge_topics': nudge_topics,
         'is_review_mode': is_review_mode,
-        'prerequisites': topic.prerequisites.all(),
+        'prerequisites': prerequisites,
+        # Lets the page preview the next interval while ratings are buffered.
+        'sr_params': {
+            'min_ef': sr_settings.get_min_easiness() if sr_settings else 1.3,
+            'max_interval': sr_settings.max_interval_days if sr_settings else 365,
+        },
+        'queue': {
+            'chunk_url': (
+                reverse('study_session_cards', args=[session.id]) if session
+                else reverse('study_deck_cards', args=[topic.id]) + ('?review=1' if is_review_mode else '')
+            ),
+            'next_cursor': next_cursor,
+            'total': len(entries),
+            # Ratings report their queue position (offset + index on the
+            # page) so the stored cursor and relearn copies follow the page.
+            'session_id': session.id if session else None,
+            'deck': None if session else deck_key,
+            'offset': offset,
+        },
     })
 
 
+def _queue_chunk(user, entries, offset, variant_seed):
+    """
+    flashcards_data for entries[offset:offset + STUDY_CHUNK_SIZE] and the next
+    cursor (None at the end). `variant_seed` is the session's (or pending
+    deck's) seed for parameterized cards.
+    """
+    chunk = entries[offset:offset + STUDY_CHUNK_SIZE]
+    chunk_ids = {card_id for card_id, _ in chunk}
+    flashcards = list(_annotate_with_votes(Flashcard.objects.filter(id__in=chunk_ids).only(*LIGHT_FIELDS), user))
+    progress_map = {
+        p.flashcard_id: p
+        for p in FlashcardProgress.objects.filter(user=user, flashcard_id__in=chunk_ids, step_index=-1)
+    }
+    by_entry = {
+        (card['id'], card['step_index']): card
+        for card in _build_flashcards_data(flashcards, progress_map, (user.id, variant_seed))
+    }
+    # Keep the queue order; a card deleted (or a step removed) in between is skipped.
+    end = offset + len(chunk)
+    flashcards_data = [dict(by_entry[entry]) for entry in chunk if entry in by_entry]
+    return flashcards_data, (str(end) if end < len(entries) else None)
+
+
+def _chunk_response(request, entries, variant_seed):
+    try:
+        offset = int(request.GET.get('cursor', '0'))
+        if offset < 0:
+            raise ValueError
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    flashcards_data, next_cursor = _queue_chunk(request.user, entries, offset, variant_seed)
+    return JsonResponse({'cards': flashcards_data, 'next_cursor': next_cursor})
+
+
+@login_required
+def study_session_cards(request, session_id):
+    """JSON chunk of a study session's queue starting at ?cursor= (from the previous chunk)."""
+    session = get_object_or_404(StudySession, id=session_id, user=request.user)
+    if session.queue is None:
+        return JsonResponse({'error': 'Unknown session queue'}, status=404)
+    return _chunk_response(request, unpack_queue(session.queue), session.variant_seed)
+
+
+@login_required
+def study_deck_cards(request, topic_id):
+    """JSON chunk of a topic's unrated deck (?review=1 for the review deck) starting at ?cursor=."""
+    entries, seed = _pending_deck(request, _deck_key(topic_id, request.GET.get('review') == '1'))
+    if entries is None:
+        return JsonResponse({'error': 'Unknown deck'}, status=404)
+    return _chunk_response(request, entries, seed)
+
+
 @login_required
 def end_study_session(request, session_id):
     """End a study session"""
@@ -547,7 +679,7 @@ def end_study_session(request, session_id):
 # SM-2 spaced repetition algorithm
 # ---------------------------------------------------------------------------
 
-def _apply_sm2(progress, quality, settings=None):
+def _apply_sm2(progress, quality, settings=None, today=None):
     """Apply the SM-2 algorithm to a FlashcardProgress record.
 
     quality: integer 0–5
@@ -558,6 +690,12 @@ def _apply_sm2(progress, quality, settings=None):
         4 = correct after brief hesitation  ← "Got it / Good"
         5 = perfect, no hesitation          ← "Easy"
 
+    today: date the review happened on (defaults to today); the next review
+        date is counted from it.
+
+    When settings.load_balance is on, a passing review's interval may move
+    to the least busy day nearby (see forecast.least_loaded_interval).
+
     The record is mutated but NOT saved — the caller must call .save().
     """
     min_ef = settings.get_min_easiness() if settings else 1.3
@@ -582,12 +720,14 @@ def _apply_sm2(progress, quality, settings=None):
         else:
             new_interval = round(progress.interval_days * ef)
         new_interval = min(new_interval, max_interval)
+        if getattr(settings, 'load_balance', False):
+            new_interval = least_loaded_interval(progress.user_id, new_interval, max_interval, today)
         progress.sm2_repetitions = reps + 1
 
     progress.easiness_factor = round(ef, 4)
     progress.interval_days = new_interval
     progress.next_review_date = (
-        datetime.date.today() + datetime.timedelta(days=new_interval)
+        (today or datetime.date.today()) + datetime.timedelta(days=new_interval)
     )
 
 
@@ -604,11 +744,9 @@ def update_flashcard_progress(request, flashcard_id):
     flashcard = get_object_or_404(Flashcard, id=flashcard_id)
 
     course = flashcard.topic.course
-    is_owner = (course.created_by == request.user)
-    has_enrollment = CourseEnrollment.objects.filter(
-        user=request.user, course=course
-    ).exists()
-    if not (is_owner or has_enrollment):
+    profile = get_profile_bundle(request)
+    is_owner = (course.created_by_id == request.user.id)
+    if not (is_owner or profile.is_enrolled(course.id)):
         return JsonResponse({'error': 'No access'}, status=403)
 
     # Resolve quality (0-5).  Legacy "correct" boolean mapped to 4 / 1.
@@ -630,41 +768,18 @@ def update_flashcard_progress(request, flashcard_id):
     except (ValueError, TypeError):
         step_index = -1
 
-    progress, _ = FlashcardProgress.objects.get_or_create(
-        user=request.user,
-        flashcard=flashcard,
-        step_index=step_index,
+    # One upsert computes the counters and SM-2 fields in SQL (two for a step:
+    # the step row counts the review, the whole-card row holds the schedule so
+    # due_count and review mode, which filter by step_index=-1, see it).
+    progress, sr_progress = record_review(request.user.id, flashcard.id, quality, profile.sr_settings, step_index)
+    state_before = card_state(previous_state(sr_progress))
+    record_transitions(request.user, [(flashcard.topic_id, state_before, card_state(sr_progress))])
+    log_review(
+        user_id=request.user.id, flashcard_id=flashcard.id, step_index=step_index,
+        quality=quality, previous_interval=sr_progress.previous_interval_days,
+        new_interval=sr_progress.interval_days,
     )
 
-    # Classic confidence tracking (kept for backwards compatibility)
-    progress.times_reviewed = F('times_reviewed') + 1
-    if quality >= 3:
-        progress.times_correct = F('times_correct') + 1
-        progress.confidence_level = min(5, progress.confidence_level + 1)
-    else:
-        progress.confidence_level = max(0, progress.confidence_level - 1)
-
-    # SM-2 scheduling is always on the whole-card (step_index=-1) record so that
-    # due_count and review mode (which filter by step_index=-1) see step-by-step cards.
-    settings = SpacedRepetitionSettings.objects.filter(user=request.user).first()
-    if step_index == -1:
-        _apply_sm2(progress, quality, settings)
-        progress.save()
-        progress.refresh_from_db()
-        sr_progress = progress
-    else:
-        # Save stats-only record for the individual step; apply SM-2 to the whole-card record.
-        progress.save()
-        sr_progress, _ = FlashcardProgress.objects.get_or_create(
-            user=request.user,
-            flashcard=flashcard,
-            step_index=-1,
-        )
-        _apply_sm2(sr_progress, quality, settings)
-        sr_progress.save()
-        sr_progress.refresh_from_db()
-        progress.refresh_from_db()
-
     return JsonResponse({
         'confidence_level': progress.confidence_level,
         'times_reviewed': progress.times_reviewed,
@@ -676,6 +791,223 @@ def update_flashcard_progress(request, flashcard_id):
     })
 
 
+def _parse_review_batch(body):
+    """Validate a /progress/batch/ body and return a list of review dicts.
+
+    Raises ValueError with a user-facing message on malformed input.
+    """
+    try:
+        entries = json.loads(body or b'{}').get('reviews')
+    except (ValueError, AttributeError):
+        raise ValueError('Body must be a JSON object with a "reviews" list.')
+    if not isinstance(entries, list):
+        raise ValueError('Body must be a JSON object with a "reviews" list.')
+    if len(entries) > REVIEW_BATCH_MAX_SIZE:
+        raise ValueError(f'At most {REVIEW_BATCH_MAX_SIZE} reviews per batch.')
+
+    now = timezone.now()
+    reviews = []
+    for entry in entries:
+        try:
+            flashcard_id = int(entry['flashcard_id'])
+            quality = int(entry['quality'])
+            step_index = int(entry.get('step_index', -1))
+            reviewed_at = parse_datetime(entry.get('reviewed_at') or '')
+            position = entry.get('position')
+            position = None if position is None else int(position)
+        except (KeyError, ValueError, TypeError, AttributeError):
+            raise ValueError('Each review needs an integer flashcard_id and quality.')
+        if not (0 <= quality <= 5):
+            raise ValueError('quality must be 0–5')
+        if step_index < -1:
+            raise ValueError('step_index must be -1 or a step number.')
+        if reviewed_at is None:
+            reviewed_at = now
+        elif timezone.is_naive(reviewed_at):
+            reviewed_at = timezone.make_aware(reviewed_at)
+        reviews.append({
+            'flashcard_id': flashcard_id,
+            'step_index': step_index,
+            'quality': quality,
+            # Client clocks can run ahead; never schedule from a future review.
+            'reviewed_at': min(reviewed_at, now),
+            'position': position,
+        })
+    return reviews
+
+
+@login_required
+@require_POST
+def update_flashcard_progress_batch(request):
+    """Apply a buffered list of ratings in one transaction. Returns JSON.
+
+    Body (JSON): {"reviews": [{"flashcard_id": 12, "step_index": -1,
+    "quality": 4, "reviewed_at": "<ISO 8601>"}, ...]}
+
+    Access is checked once per course, SM-2 runs in memory in reviewed_at order
+    (so a card rated twice in one batch compounds correctly) and every touched
+    FlashcardProgress row is written with a single bulk upsert.
+
+    Ratings from a study session page also send "session": <StudySession id>
+    (or, before the session exists, "deck": <key of the unrated deck>) and
+    each review's queue "position"; the session's stored cursor and relearn
+    copies are updated from them (see study.session_queue). A "deck" batch
+    creates the session, and the response's "session" tells the page where
+    its queue now lives.
+
+    Ratings of cards that no longer exist or that the user cannot access are
+    skipped and listed in the response's "rejected"; the others are saved.
+    Only a malformed body fails the whole batch.
+    """
+    try:
+        reviews = _parse_review_batch(request.body)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    try:
+        body = json.loads(request.body)
+        session_id = None if body.get('session') is None else int(body['session'])
+        deck_key = body.get('deck')
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'session must be a study session id.'}, status=400)
+    if not reviews:
+        return JsonResponse({'saved': 0, 'results': [], 'rejected': []})
+
+    profile = get_profile_bundle(request)
+    card_topics = {}
+    denied = set()
+    for card_id, topic_id, course_id, owner_id in Flashcard.objects.filter(
+        id__in={r['flashcard_id'] for r in reviews}
+    ).values_list('id', 'topic_id', 'topic__course_id', 'topic__course__created_by_id'):
+        card_topics[card_id] = topic_id
+        if owner_id != request.user.id and course_id not in profile.enrolled_course_ids:
+            denied.add(card_id)
+    # One stale or foreign card must not cost the rest of the batch.
+    rejected = [
+        {'flashcard_id': r['flashcard_id'], 'error': 'No access' if r['flashcard_id'] in denied else 'Unknown flashcard'}
+        for r in reviews if r['flashcard_id'] in denied or r['flashcard_id'] not in card_topics
+    ]
+    rated = reviews
+    reviews = [r for r in reviews if r['flashcard_id'] in card_topics and r['flashcard_id'] not in denied]
+    card_ids = {r['flashcard_id'] for r in reviews}
+
+    settings = profile.sr_settings
+
+    with transaction.atomic():
+        rows = {
+            (p.flashcard_id, p.step_index): p
+            for p in FlashcardProgress.objects.select_for_update().filter(
+                user=request.user, flashcard_id__in=card_ids,
+            )
+        }
+
+        touched = {}
+        states_before = {}
+        events = []
+
+        def row_for(flashcard_id, step_index):
+            key = (flashcard_id, step_index)
+            if key not in rows:
+                rows[key] = FlashcardProgress(
+                    user=request.user, flashcard_id=flashcard_id, step_index=step_index,
+                )
+            if step_index == -1 and key not in states_before:
+                states_before[key] = card_state(rows[key])
+            touched[key] = rows[key]
+            return rows[key]
+
+        compact_steps = compact_enabled()
+        for review in sorted(reviews, key=lambda r: r['reviewed_at']):
+            quality = review['quality']
+            if compact_steps and review['step_index'] >= 0:
+                # Steps are counted on the whole-card row (see study.step_progress).
+                progress = row_for(review['flashcard_id'], -1)
+                progress.step_state = pack_steps(
+                    bump_step(unpack_steps(progress.step_state), review['step_index'], quality)
+                )
+            else:
+                progress = row_for(review['flashcard_id'], review['step_index'])
+            progress.times_reviewed += 1
+            if quality >= 3:
+                progress.times_correct += 1
+                progress.confidence_level = min(5, progress.confidence_level + 1)
+            else:
+                progress.confidence_level = max(0, progress.confidence_level - 1)
+
+            # As in update_flashcard_progress, SM-2 lives on the whole-card record.
+            sr_progress = row_for(review['flashcard_id'], -1)
+            sr_progress.previous_interval_days = sr_progress.interval_days
+            sr_progress.previous_repetitions = sr_progress.sm2_repetitions
+            sr_progress.previous_review_date = sr_progress.next_review_date
+            _apply_sm2(sr_progress, quality, settings,
+                       today=timezone.localdate(review['reviewed_at']))
+            record_due_change(request.user.id, sr_progress.previous_review_date, sr_progress.next_review_date)
+            events.append({
+                'user_id': request.user.id,
+                'flashcard_id': review['flashcard_id'],
+                'step_index': review['step_index'],
+                'quality': quality,
+                'reviewed_at': review['reviewed_at'],
+                'previous_interval': sr_progress.previous_interval_days,
+                'new_interval': sr_progress.interval_days,
+            })
+
+        FlashcardProgress.objects.bulk_create(
+            touched.values(),
+            update_conflicts=True,
+            unique_fields=['user', 'flashcard', 'step_index'],
+            update_fields=[
+                'times_reviewed', 'times_correct', 'confidence_level', 'last_reviewed',
+                'easiness_factor', 'interval_days', 'sm2_repetitions', 'next_review_date',
+                'previous_interval_days', 'previous_repetitions', 'previous_review_date',
+                'step_state',
+            ],
+        )
+        record_transitions(request.user, [
+            (card_topics[flashcard_id], before, card_state(touched[(flashcard_id, -1)]))
+            for (flashcard_id, _), before in states_before.items()
+        ])
+
+        session = started = None
+        if session_id is not None:
+            session = StudySession.objects.select_for_update().filter(
+                id=session_id, user=request.user, queue__isnull=False,
+            ).first()
+        elif isinstance(deck_key, str):
+            session = started = _start_session_from_deck(request, deck_key)
+        if session is not None:
+            # In the order the page rated them, which is the order it spliced relearn
+            # copies; rejected ratings still moved the page past their entries.
+            entries, session.queue_cursor = apply_ratings(
+                unpack_queue(session.queue), session.queue_cursor,
+                [(r['position'], r['quality']) for r in rated if r['position'] is not None],
+            )
+            session.queue = pack_queue(entries)
+            session.review_count += len(reviews)
+            session.last_review_at = timezone.now()
+            session.save(update_fields=['queue', 'queue_cursor', 'review_count', 'last_review_at'])
+    log_reviews(events)
+
+    response = {
+        'saved': len(reviews),
+        'results': [
+            {
+                'flashcard_id': flashcard_id,
+                'next_review_date': p.next_review_date.isoformat() if p.next_review_date else None,
+                'interval_days': p.interval_days,
+            }
+            for (flashcard_id, step_index), p in touched.items() if step_index == -1
+        ],
+        'rejected': rejected,
+    }
+    if started is not None:
+        response['session'] = {
+            'id': started.id,
+            'chunk_url': reverse('study_session_cards', args=[started.id]),
+            'end_url': reverse('end_study_session', args=[started.id]),
+        }
+    return JsonResponse(response)
+
+
 @login_required
 @require_POST
 def mark_card_never_seen(request, flashcard_id):
@@ -686,13 +1018,13 @@ def mark_card_never_seen(request, flashcard_id):
     """
     flashcard = get_object_or_404(Flashcard, id=flashcard_id)
     course = flashcard.topic.course
-    is_owner = (course.created_by == request.user)
-    has_enrollment = CourseEnrollment.objects.filter(
-        user=request.user, course=course
-    ).exists()
-    if not (is_owner or has_enrollment):
+    is_owner = (course.created_by_id == request.user.id)
+    if not (is_owner or get_profile_bundle(request).is_enrolled(course.id)):
         return JsonResponse({'error': 'No access'}, status=403)
 
+    state_before = card_state(
+        FlashcardProgress.objects.filter(user=request.user, flashcard=flashcard, step_index=-1).first()
+    )
     FlashcardProgress.objects.filter(
         user=request.user,
         flashcard=flashcard,
@@ -704,7 +1036,9 @@ def mark_card_never_seen(request, flashcard_id):
         interval_days=0,
         sm2_repetitions=0,
         next_review_date=None,
+        step_state=None,
     )
+    record_transitions(request.user, [(flashcard.topic_id, state_before, NEW_STATE)])
 
     return JsonResponse({'status': 'reset'})
 
@@ -718,23 +1052,13 @@ def review_session(request, topic_id):
     )
     course = topic.course
 
-    is_owner = (course.created_by == request.user)
-    has_enrollment = CourseEnrollment.objects.filter(
-        user=request.user, course=course,
-    ).exists()
-    if not (is_owner or has_enrollment):
+    is_owner = (course.created_by_id == request.user.id)
+    if not (is_owner or get_profile_bundle(request).is_enrolled(course.id)):
         messages.warning(request, 'You must be enrolled to review this topic.')
         return redirect('topic_detail', topic_id=topic_id)
 
-    today = datetime.date.today()
-
     # Check if any cards are actually due
-    due_count = FlashcardProgress.objects.filter(
-        user=request.user,
-        flashcard__topic=topic,
-        next_review_date__lte=today,
-        step_index=-1,
-    ).count()
+    due_count = get_topic_counters(request.user, [topic.id])[topic.id].due_count()
 
     if not due_count:
         messages.info(request, 'No cards are due for review in this topic right now. Great work!')
@@ -743,12 +1067,84 @@ def review_session(request, topic_id):
     return redirect(reverse('study_session', kwargs={'topic_id': topic_id}) + '?review=1')
 
 
+def _today_queue_payload(user, cursor=None):
+    """Next chunk of the Today queue as (flashcards_data, next_cursor)."""
+    rows, next_cursor = today_queue_chunk(user, cursor)
+    progress_map = {p.flashcard_id: p for p in rows}
+    by_id = {
+        fc.id: fc
+        for fc in _annotate_with_votes(
+            Flashcard.objects.filter(id__in=progress_map).select_related('topic')
+            .only(*LIGHT_FIELDS, 'topic__name'), user,
+        )
+    }
+    # Keep the queue's priority order; a card deleted in between is skipped.
+    flashcards = [by_id[p.flashcard_id] for p in rows if p.flashcard_id in by_id]
+    flashcards_data = _build_flashcards_data(flashcards, progress_map)
+    for card in flashcards_data:
+        card['topic_name'] = by_id[card['id']].topic.name
+    return flashcards_data, next_cursor
+
+
+@login_required
+def review_today(request):
+    """Review every card due today across all enrolled courses, most overdue first.
+
+    Only the first chunk is rendered; the page fetches the rest from
+    review_today_cards as the student works through it.
+    """
+    total = due_progress(request.user).count()
+    if not total:
+        messages.info(request, 'No cards are due for review right now. Great work!')
+        return redirect('home')
+
+    profile = get_profile_bundle(request)
+    valid_modes = {choice[0] for choice in StudyPreference.STUDY_MODES}
+    mode_param = request.GET.get('mode')
+    study_mode = mode_param if mode_param in valid_modes else profile.preference.study_mode
+
+    flashcards_data, next_cursor = _today_queue_payload(request.user)
+    sr_settings = profile.sr_settings
+
+    return render(request, 'study/study_session.html', {
+        'topic': None,
+        'flashcards_data': flashcards_data,
+        'session': None,
+        'study_mode': study_mode,
+        'study_modes': StudyPreference.STUDY_MODES,
+        'nudge_topics': [],
+        'is_review_mode': True,
+        'prerequisites': [],
+        'sr_params': {
+            'min_ef': sr_settings.get_min_easiness() if sr_settings else 1.3,
+            'max_interval': sr_settings.max_interval_days if sr_settings else 365,
+        },
+        'queue': {
+            'chunk_url': reverse('review_today_cards'),
+            'next_cursor': next_cursor,
+            'total': total,
+        },
+    })
+
+
+@login_required
+def review_today_cards(request):
+    """JSON chunk of the Today queue following ?cursor= (from the previous chunk)."""
+    cursor = request.GET.get('cursor') or None
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    flashcards_data, next_cursor = _today_queue_payload(request.user, cursor)
+    return JsonResponse({'cards': flashcards_data, 'next_cursor': next_cursor})
+
+
 @login_required
 def spaced_repetition_settings(request):
     """View and update the user's SM-2 spaced repetition settings."""
-    settings_obj, _ = SpacedRepetitionSettings.objects.get_or_create(user=request.user)
-
     if request.method == 'POST':
+        settings_obj, _ = SpacedRepetitionSettings.objects.get_or_create(user=request.user)
         try:
             ease_modifier = int(request.POST.get(
                 'ease_modifier', SpacedRepetitionSettings.DEFAULT_EASE_MODIFIER))
@@ -761,19 +1157,44 @@ def spaced_repetition_settings(request):
             return redirect('spaced_repetition_settings')
 
         # Clamp to model validator bounds
+        previous = (settings_obj.ease_modifier, settings_obj.max_interval_days)
         settings_obj.ease_modifier = max(-2, min(2, ease_modifier))
         settings_obj.max_interval_days = max(30, min(730, max_interval))
         settings_obj.daily_new_cards = max(1, min(100, daily_new))
+        settings_obj.load_balance = request.POST.get('load_balance') == 'on'
         settings_obj.save()
+        # Apply schedule-affecting changes to cards already in the deck.
+        if previous != (settings_obj.ease_modifier, settings_obj.max_interval_days):
+            reschedule_progress(user_ids=[request.user.id])
         messages.success(request, 'Spaced repetition settings saved.')
         return redirect('spaced_repetition_settings')
 
+    # Show the defaults until the user first saves; GET never creates the row.
+    settings_obj = get_profile_bundle(request).sr_settings or SpacedRepetitionSettings(user=request.user)
     return render(request, 'study/spaced_repetition_settings.html', {
         'settings': settings_obj,
         'speed_choices': SpacedRepetitionSettings.SPEED_CHOICES,
     })
 
 
+@login_required
+def review_forecast_api(request):
+    """JSON forecast of cards due per day, today first.
+
+    ?days=<1-90> shortens the window (default: 90).
+    """
+    try:
+        days = int(request.GET.get('days', FORECAST_DAYS))
+    except (ValueError, TypeError):
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    days = max(1, min(FORECAST_DAYS, days))
+    forecast = review_forecast(request.user.id, days)
+    return JsonResponse({
+        'days': forecast,
+        'total': sum(day['due'] for day in forecast),
+    })
+
+
 @login_required
 @require_POST
 def vote_flashcard(request, flashcard_id):
@@ -795,7 +1216,7 @@ def vote_flashcard(request, flashcard_id):
         return JsonResponse({'error': 'You cannot vote on your own cards.'}, status=403)
 
     # Require enrollment in the course to vote
-    if not CourseEnrollment.objects.filter(user=request.user, course=course).exists():
+    if not get_profile_bundle(request).is_enrolled(course.id):
         return JsonResponse({'error': 'You must be enrolled in this course to vote.'}, status=403)
 
     try:
@@ -852,7 +1273,7 @@ def comment_flashcard(request, flashcard_id):
     # Must be enrolled in or own the course
     course = flashcard.topic.course
     is_owner = course.created_by == request.user
-    has_enrollment = CourseEnrollment.objects.filter(user=request.user, course=course).exists()
+    has_enrollment = get_profile_bundle(request).is_enrolled(course.id)
     if not (is_owner or has_enrollment):
         return JsonResponse({'error': 'No access.'}, status=403)
 
@@ -877,7 +1298,7 @@ def suggest_card(request, topic_id):
     topic = get_object_or_404(Topic.objects.select_related('course__created_by'), id=topic_id)
 
     # Must be enrolled in this course (suggestions are for system courses; owners use add-flashcard)
-    if not CourseEnrollment.objects.filter(user=request.user, course=topic.course).exists():
+    if not get_profile_bundle(request).is_enrolled(topic.course_id):
         messages.error(request, 'You must be enrolled in this course to suggest a card.')
         return redirect('topic_detail', topic_id=topic_id)
 
@@ -1025,6 +1446,8 @@ def flashcard_create(request, topic_id=None):
         if form.is_valid():
             flashcard = form.save()
             messages.success(request, 'Flashcard created successfully!')
+            for warning in form.spec_warnings:
+                messages.warning(request, warning)
             return redirect('topic_detail', topic_id=flashcard.topic.id)
     else:
         initial = {}
@@ -1046,6 +1469,8 @@ def flashcard_edit(request, flashcard_id):
         if form.is_valid():
             form.save()
             messages.success(request, 'Flashcard updated successfully!')
+            for warning in form.spec_warnings:
+                messages.warning(request, warning)
             return redirect('topic_detail', topic_id=flashcard.topic.id)
     else:
         form = FlashcardForm(instance=flashcard, user=request.user)
@@ -1053,6 +1478,48 @@ def flashcard_edit(request, flashcard_id):
     return render(request, 'study/flashcard_form.html', {'form': form, 'title': 'Edit Flashcard', 'flashcard': flashcard})
 
 
+@staff_required
+def worksheet_download(request, topic_id=None, course_id=None):
+    """Stream a worksheet of a topic's or course's parameterized cards.
+
+    ?variants= (default 10), ?format=html|latex, ?seed= (the same seed gives
+    the same worksheet) and ?answers=1 for the answer key. Rendering runs in
+    this process before the response starts, so cards x variants is capped at
+    MAX_VIEW_VARIANTS; the generate_worksheets command takes larger runs and
+    spreads them over a process pool.
+    """
+    if topic_id is not None:
+        scope = get_object_or_404(Topic, id=topic_id)
+        cards = worksheet_cards(topic_id=topic_id)
+    else:
+        scope = get_object_or_404(Course, id=course_id)
+        cards = worksheet_cards(course_id=course_id)
+    try:
+        count = min(max(int(request.GET.get('variants', 10)), 1), MAX_VARIANTS)
+        seed = int(request.GET.get('seed', 0))
+    except ValueError:
+        return HttpResponseBadRequest('variants and seed must be integers')
+    fmt = request.GET.get('format', 'html')
+    if fmt not in WORKSHEET_FORMATS:
+        return HttpResponseBadRequest(f'format must be one of {", ".join(WORKSHEET_FORMATS)}')
+    answers = request.GET.get('answers') == '1'
+    cards = list(cards)
+    if len(cards) * count > MAX_VIEW_VARIANTS:
+        return HttpResponseBadRequest(
+            f'{len(cards)} card(s) x {count} variant(s) is more than {MAX_VIEW_VARIANTS} variants; '
+            'request fewer variants or use the generate_worksheets command'
+        )
+
+    results = generate_variants(cards, count, seed, processes=1)
+    response = StreamingHttpResponse(
+        worksheet_document(results, scope.name, fmt, answers=answers),
+        content_type='text/html; charset=utf-8' if fmt == 'html' else 'application/x-tex; charset=utf-8',
+    )
+    filename = f"worksheet-{slugify(scope.name)}-{seed}{'-answers' if answers else ''}.{'tex' if fmt == 'latex' else 'html'}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 
 @login_required
 @require_POST
@@ -1079,12 +1546,12 @@ def update_study_mode(request):
 # ── Accountability & Motivation ──────────────────────────────────────────────
 
 def _calculate_streak(user):
-    """Return the current consecutive-day study streak for a user."""
+    """Return the current consecutive-day study streak for a user (days with a session that has reviews)."""
     today = timezone.now().date()
     streak = 0
     check_date = today
     while True:
-        if StudySession.objects.filter(user=user, started_at__date=check_date).exists():
+        if StudySession.objects.filter(user=user, started_at__date=check_date, review_count__gt=0).exists():
             streak += 1
             check_date -= datetime.timedelta(days=1)
         else:
@@ -1094,7 +1561,7 @@ def _calculate_streak(user):
 
 def _get_user_stats(user):
     """Return a dict of aggregated stats used by multiple views."""
-    session_agg = StudySession.objects.filter(user=user).aggregate(
+    session_agg = StudySession.objects.filter(user=user, review_count__gt=0).aggregate(
         total_sessions=Count('id'),
         total_cards=Sum('cards_studied'),
     )
@@ -1201,7 +1668,7 @@ def accountability_settings(request):
 
         return redirect('accountability_settings')
 
-    goal, _ = StudyGoal.objects.get_or_create(user=request.user)
+    goal = get_profile_bundle(request).goal or StudyGoal(user=request.user)
     links = AccountabilityLink.objects.filter(sharer=request.user, is_active=True).prefetch_related('observers__observer')
     observing = AccountabilityRelationship.objects.filter(
         observer=request.user, link__is_active=True
@@ -1270,7 +1737,7 @@ def observer_dashboard(request, code):
         'topic', 'topic__course'
     )[:10]
     badges = _enrich_badges(sharer)
-    goal, _ = StudyGoal.objects.get_or_create(user=sharer)
+    goal = load_profile_bundle(sharer.id).goal or StudyGoal(user=sharer)
 
     today = timezone.now().date()
     cards_today = StudySession.objects.filter(
@@ -0,0 +1,149 @@
+"""Printable worksheets of parameterized cards.
+
+generate_variants renders `count` variants of every parameterized card of a
+topic or course. Each card is drawn with one seeded ParameterGenerator.
+generate_batch call (topped up with seeded generate() calls when tight
+constraints leave the batch short) and rendered with TemplateRenderer, so a
+card's spec is compiled once per process (see compile_spec) whatever the
+count. With processes > 1 the cards are spread over a process pool.
+
+Variants are seeded by variant_seed('worksheet', seed, card id): the same
+seed reproduces the same worksheet and answer key.
+
+worksheet_document yields a document a piece at a time: variant n holds
+question n of every card, and with answers=True the same layout holds the
+answers. Documents are HTML (with MathJax, for cards written in LaTeX
+math) or plain LaTeX. The generate_worksheets command writes them to files;
+the staff worksheet_download view streams them, up to MAX_VIEW_VARIANTS
+variants in all, since every variant is rendered before the first byte.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from django.utils.html import escape
+
+from .models import Flashcard
+from .utils import ParameterGenerator, TemplateRenderer, variant_seed
+
+FORMATS = ('html', 'latex')
+MAX_VARIANTS = 500  # Per card, for the staff view
+# Cards x variants the staff view renders before its response starts; larger
+# worksheets go through the generate_worksheets command.
+MAX_VIEW_VARIANTS = 2000
+
+
+class CardVariants(NamedTuple):
+    card_id: int
+    label: str
+    variants: List[Tuple[str, str]]  # (question, answer); empty when the spec cannot be generated
+    error: str = ''
+    uses_latex: bool = False  # Variants are LaTeX source rather than plain text
+
+
+def worksheet_cards(topic_id=None, course_id=None):
+    """Parameterized cards of a topic or course, in course order."""
+    cards = Flashcard.objects.filter(question_type='parameterized', parameter_spec__isnull=False)
+    if topic_id is not None:
+        cards = cards.filter(topic_id=topic_id)
+    if course_id is not None:
+        cards = cards.filter(topic__course_id=course_id)
+    return cards.select_related('topic').order_by('topic__order', 'topic_id', 'id')
+
+
+def _card_variants(job) -> CardVariants:
+    """Worker: render `count` seeded variants of one card (runs in the process pool)."""
+    card_id, label, spec, question_template, answer_template, uses_latex, count, seed = job
+    try:
+        generator = ParameterGenerator(spec, seed=variant_seed('worksheet', seed, card_id))
+        rows = generator.generate_batch(count)
+        while len(rows) < count:
+            rows.append(generator.generate())
+    except ValueError as exc:
+        return CardVariants(card_id, label, [], str(exc), uses_latex=uses_latex)
+    renderer = TemplateRenderer()
+    return CardVariants(card_id, label, [
+        (renderer.render(question_template, values), renderer.render(answer_template, values))
+        for values in rows
+    ], uses_latex=uses_latex)
+
+
+def generate_variants(cards, count: int, seed: int = 0, processes: Optional[int] = None) -> List[CardVariants]:
+    """
+    Render `count` variants of each card.
+
+    Args:
+        cards: Parameterized Flashcards (see worksheet_cards)
+        count: Variants per card
+        seed: Worksheet seed; the same seed gives the same variants
+        processes: Worker processes (default os.cpu_count()); 1 renders
+            in this process
+
+    Returns:
+        CardVariants per card, in the order of `cards`
+    """
+    jobs = [
+        (card.id, f'{card.topic.name} #{card.id}', card.parameter_spec,
+         card.question_template, card.answer_template, card.uses_latex, count, seed)
+        for card in cards
+    ]
+    processes = min(processes or os.cpu_count() or 1, len(jobs))
+    if processes <= 1:
+        return [_card_variants(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_card_variants, jobs))
+
+
+_LATEX_SPECIAL = str.maketrans({
+    '\\': r'\textbackslash{}', '{': r'\{', '}': r'\}', '$': r'\$', '&': r'\&',
+    '#': r'\#', '^': r'\textasciicircum{}', '_': r'\_', '%': r'\%', '~': r'\textasciitilde{}',
+})
+
+
+def _latex_escape(text: str) -> str:
+    """Plain text as LaTeX source that typesets it literally."""
+    return text.translate(_LATEX_SPECIAL)
+
+
+def worksheet_document(results: List[CardVariants], title: str, fmt: str = 'html',
+                       answers: bool = False) -> Iterator[str]:
+    """
+    Yield a worksheet (or, with answers=True, its answer key) a piece at a time.
+
+    Cards that could not be generated are left out. In LaTeX documents,
+    cards marked uses_latex are copied as they are and plain-text cards
+    are escaped.
+    """
+    results = [result for result in results if result.variants]
+    count = max((len(result.variants) for result in results), default=0)
+    heading = f'{title} - answer key' if answers else title
+    if fmt == 'latex':
+        yield ('\\documentclass{article}\n\\usepackage{amsmath}\n\\begin{document}\n'
+               f'\\section*{{{_latex_escape(heading)}}}\n')
+        for n in range(count):
+            yield f'\\subsection*{{Variant {n + 1}}}\n\\begin{{enumerate}}\n'
+            for result in results:
+                question, answer = result.variants[n]
+                text = answer if answers else question
+                # Cards written in LaTeX are already LaTeX source.
+                yield f'  \\item {text if result.uses_latex else _latex_escape(text)}\n'
+            yield '\\end{enumerate}\n' + ('\\newpage\n' if n + 1 < count else '')
+        yield '\\end{document}\n'
+        return
+
+    yield (
+        '<!DOCTYPE html>\n<html><head><meta charset="utf-8">'
+        f'<title>{escape(heading)}</title>\n'
+        '<script>MathJax = {tex: {inlineMath: [["$", "$"], ["\\\\(", "\\\\)"]]}};</script>\n'
+        '<script src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js" async></script>\n'
+        '<style>section { page-break-after: always; } section:last-child { page-break-after: auto; }'
+        ' li { margin-bottom: 1.5em; }</style>\n'
+        f'</head><body>\n<h1>{escape(heading)}</h1>\n'
+    )
+    for n in range(count):
+        yield f'<section>\n<h2>Variant {n + 1}</h2>\n<ol>\n'
+        for result in results:
+            question, answer = result.variants[n]
+            yield f'<li>{escape(answer if answers else question)}</li>\n'
+        yield '</ol>\n</section>\n'
+    yield '</body></html>\n'
@@ -107,6 +107,29 @@ DATABASES = {
     )
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Profile bundles and card payloads must be shared by every worker process:
+# production uses Redis (REDIS_URL) or, without it, the database cache table
+# (manage.py createcachetable). Review events are only buffered with Redis.
+# The per-process default cache is only for development.
+
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif not DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -201,6 +224,29 @@ GOOGLE_OAUTH_ENABLED = bool(_google_id and _google_secret)
 GRAPH_TIMEOUT = 3  # seconds
 GRAPH_MAX_SIZE = (800, 600)  # pixels
 ENABLE_GRAPH_GENERATION = True
+# Graphs render in a pool of worker processes (study/utils/graph_pool.py); 0 renders in-process
+GRAPH_WORKERS = int(os.getenv('GRAPH_WORKERS', '2'))
+GRAPH_WORKER_MAX_JOBS = int(os.getenv('GRAPH_WORKER_MAX_JOBS', '50'))  # jobs before a worker is replaced
+GRAPH_WORKER_MEMORY_MB = int(os.getenv('GRAPH_WORKER_MEMORY_MB', '512'))  # address space a worker may add
+GRAPH_WORKER_CPU_SECONDS = int(os.getenv('GRAPH_WORKER_CPU_SECONDS', '5'))  # CPU time per job
+
+# Parameter specs are profiled on save (study/spec_profile.py): SAMPLES attempts are
+# drawn; a spec is rejected below MIN_ACCEPTANCE or above MAX_ERROR_RATE, and
+# warned about below WARN_ACCEPTANCE or above WARN_ERROR_RATE.
+PARAMETER_SPEC_SAMPLES = int(os.getenv('PARAMETER_SPEC_SAMPLES', '2000'))
+PARAMETER_SPEC_MIN_ACCEPTANCE = float(os.getenv('PARAMETER_SPEC_MIN_ACCEPTANCE', '0.02'))
+PARAMETER_SPEC_WARN_ACCEPTANCE = float(os.getenv('PARAMETER_SPEC_WARN_ACCEPTANCE', '0.2'))
+PARAMETER_SPEC_MAX_ERROR_RATE = float(os.getenv('PARAMETER_SPEC_MAX_ERROR_RATE', '0.5'))
+PARAMETER_SPEC_WARN_ERROR_RATE = float(os.getenv('PARAMETER_SPEC_WARN_ERROR_RATE', '0.01'))
+
+# Store step_by_step progress packed in the whole-card row (study/step_progress.py).
+# Run `manage.py convert_step_progress` after changing it.
+COMPACT_STEP_PROGRESS = os.getenv('COMPACT_STEP_PROGRESS', 'False') == 'True'
+
+# Review event log: buffered in Redis and written in batches, or inserted directly
+# without Redis (study/review_log.py)
+REVIEW_EVENT_FLUSH_SIZE = int(os.getenv('REVIEW_EVENT_FLUSH_SIZE', '100'))
+REVIEW_EVENT_FLUSH_SECONDS = int(os.getenv('REVIEW_EVENT_FLUSH_SECONDS', '60'))
 
 # GitHub Integration for Issue Reporting
 # Set GITHUB_REPO to enable "Report Issue" and "Feedback" buttons